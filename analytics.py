@@ -0,0 +1,72 @@
+import numpy
+import pandas
+
+
+def explode_sprints(sprints):
+    """
+    Splits comma separated sprint strings into one categorical value per (issue, sprint)
+    :param sprints: pandas series of comma separated sprint names (e.g. the sprints column)
+    :return: categorical pandas series indexed by row position in sprints, categories in first-appearance order
+    """
+    return explode_list(sprints, name='sprint')
+
+
+def explode_list(values, name=None):
+    """
+    Splits a comma separated list column (sprints, components, fix_versions, labels) into one categorical value
+    per (issue, list item). Only the distinct strings are split in python; rows are expanded with numpy, so the
+    cost is linear in rows.
+    :param values: pandas series of comma separated strings
+    :param name: name of the returned series
+    :return: categorical pandas series indexed by row position in values, categories in first-appearance order
+    """
+    codes, combos = pandas.factorize(values)
+    item_codes = {}
+    combo_items = [
+        [item_codes.setdefault(item, len(item_codes)) for item in str(combo).split(',') if item]
+        for combo in combos
+    ]
+    # trailing empty combo for missing values, which factorize codes as -1
+    combo_lengths = numpy.array([len(items) for items in combo_items] + [0], dtype=numpy.int64)
+    combo_offsets = numpy.concatenate([[0], numpy.cumsum(combo_lengths)[:-1]])
+    flat_codes = numpy.array([code for items in combo_items for code in items], dtype=numpy.int64)
+
+    row_lengths = combo_lengths[codes]
+    rows = numpy.repeat(numpy.arange(len(codes)), row_lengths)
+    row_starts = numpy.cumsum(row_lengths) - row_lengths
+    within_row = numpy.arange(len(rows)) - numpy.repeat(row_starts, row_lengths)
+    exploded_codes = flat_codes[numpy.repeat(combo_offsets[codes], row_lengths) + within_row]
+    return pandas.Series(pandas.Categorical.from_codes(exploded_codes, list(item_codes)), index=rows, name=name)
+
+
+def bugs_by_sprint(data_frame):
+    """
+    Counts bugs per sprint; an issue carried over several sprints counts once in each
+    :param data_frame: pandas data frame with sprints and issue_type columns
+    :return: pandas series of bug counts indexed by sprint name, every sprint in first-appearance order
+    """
+    sprints = explode_sprints(data_frame['sprints'])
+    is_bug = (data_frame['issue_type'] == 'Bug').to_numpy(dtype=bool, na_value=False)
+    counts = numpy.bincount(sprints.cat.codes[is_bug[sprints.index]], minlength=len(sprints.cat.categories))
+    return pandas.Series(counts, index=pandas.Index(sprints.cat.categories, name='sprint'), name='bugs')
+
+
+def estimate_accuracy(data_frame):
+    """
+    Summarizes how original estimates compare to time spent, over issues that have both
+    :param data_frame: pandas data frame with original_estimate and time_spent columns in seconds
+    :return: dict of issue counts and averages in minutes
+    """
+    estimate = pandas.to_numeric(data_frame['original_estimate'], errors='coerce')
+    time_spent = pandas.to_numeric(data_frame['time_spent'], errors='coerce')
+    tracked = (estimate > 0) & (time_spent > 0)
+    diff = (estimate - time_spent)[tracked]
+    return {
+        'overestimated': int((diff > 0).sum()),
+        'underestimated': int((diff < 0).sum()),
+        'spot_on': int((diff == 0).sum()),
+        'time_tracked_issues': int(tracked.sum()),
+        'average_estimate_minutes': estimate.mean() / 60,
+        'average_actual_minutes': time_spent.mean() / 60,
+        'average_diff_minutes': diff.mean() / 60,
+    }
@@ -1,96 +1,824 @@
 import base64
+import collections
+import datetime
+import email.utils
+import functools
 import getpass
+import itertools
 import json
+import os
+import queue
+import random
 import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from constants import HEADER, FIELD_MAP, EXCLUDED_ISSUE_TYPES
+from constants import HEADER, FIELD_MAP, EXCLUDED_ISSUE_TYPES, FLAGGED_FIELD, SEARCH_FIELDS
+from telemetry import count, observe, stage
+
+# pandas and numpy are imported where data frames are built, so a crawl is not held up loading them
+
+DEFAULT_BASE_URL = 'https://farmobile.atlassian.net'
+DEFAULT_PROJECT = 'FARM'
+ISSUE_PATH = '/rest/api/2/issue/{}'
+SEARCH_PATH = '/rest/api/2/search'
+CHANGELOG_PATH = '/rest/api/2/issue/{}/changelog'
+WORKLOG_PATH = '/rest/api/2/issue/{}/worklog'
+SEARCH_URL = DEFAULT_BASE_URL + SEARCH_PATH
+STATE_FILE = 'state.json'
+# JQL dates are interpreted in the JIRA user's timezone while checkpoints are UTC, so incremental syncs
+# re-read a window before the checkpoint. Upserts are idempotent, so the overlap only costs a few requests.
+SYNC_OVERLAP = datetime.timedelta(days=1)
+# issue numbers probed past each point when searching is unavailable, so a deleted issue or two doesn't
+# end range discovery early
+PROBE_WINDOW = 3
+# issue numbers per key range searched in parallel by a bulk crawl
+BULK_CHUNK_SIZE = 2000
+# columns whose values repeat from issue to issue; IssueRecord interns them so records share one copy
+INTERNED_COLUMNS = frozenset([
+    'issue_type', 'components', 'fix_versions', 'reporter', 'assignee', 'status', 'labels', 'sprints',
+    'sprint_start_datetime', 'sprint_end_datetime', 'sprint_states', 'priority', 'flagged', 'customfield_10614',
+])
+FIELD_INDEX = {field: i for i, field in enumerate(HEADER)}
+
+Sprint = collections.namedtuple('Sprint', ['id', 'name', 'state', 'start_date', 'end_date', 'complete_date'])
+SPRINT_ATTRIBUTES = {
+    'id': 'id',
+    'name': 'name',
+    'state': 'state',
+    'startDate': 'start_date',
+    'endDate': 'end_date',
+    'completeDate': 'complete_date',
+}
+# Splits 'Sprint@5a1b0835[id=56,...,name=Total pkg, v2,goal=,...]' on the commas that start a known attribute,
+# so commas inside names and goals survive
+SPRINT_SEPARATOR = re.compile(
+    r',(?=(?:id|rapidViewId|state|name|goal|startDate|endDate|completeDate|activatedDate|sequence)=)')
+
+
+class JiraApiError(Exception):
+    pass
 
 
 class JirApi(object):
-    def __init__(self, basic_auth=True, start_issue=1, end_issue=None):
+    def __init__(self, basic_auth=True, start_issue=1, end_issue=None, concurrency=1, rate_limit=20.0, cache=None,
+                 base_url=DEFAULT_BASE_URL, project=DEFAULT_PROJECT, credentials=None, rate_limiter=None,
+                 history=False):
+        """
+        :param base_url: JIRA instance (e.g. https://example.atlassian.net)
+        :param project: project key to crawl
+        :param credentials: (username, password) to use instead of prompting
+        :param rate_limiter: RateLimiter shared with other clients of the same instance; rate_limit is ignored if set
+        :param history: also fetch every issue's full changelog and worklogs
+        """
+        self.headers = {'Content-Type': 'application/json'}
         if basic_auth:
-            username = input('Username: ')
-            password = getpass.getpass('Password: ')
-            self.access_token = base64.b64encode('{}:{}'.format(username, password).encode('ascii'))
-            self.headers = {
-                'Authorization': 'Basic {}'.format(self.access_token),
-                'Content-Type': 'application/json',
-            }
+            username, password = credentials or prompt_credentials()
+            self.access_token = base64.b64encode('{}:{}'.format(username, password).encode('ascii')).decode('ascii')
+            self.headers['Authorization'] = 'Basic {}'.format(self.access_token)
 
-        self.start_issue = start_issue
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+        self.start_issue = start_issue or 1
         self.end_issue = end_issue
-        self.domain = 'https://farmobile.atlassian.net/rest/api/2/issue/{}'
-        self.project = 'FARM'
+        self.base_url = base_url
+        self.domain = base_url + ISSUE_PATH
+        self.search_url = base_url + SEARCH_PATH
+        self.project = project
+        self.history = history
+        self.search_fields = SEARCH_FIELDS + ['worklog'] if history else SEARCH_FIELDS
         self.more_to_pull = True
         self.found_ticket = False
+        self.missing_issues = 0
+        self.last_key = None
+        self.last_updated = None
+        self.concurrency = concurrency
+        self.cache = cache
+        self.updated_index = None
+        self.session = create_session(pool_size=concurrency, rate_limiter=rate_limiter or RateLimiter(rate=rate_limit))
 
     def all_issues(self):
         """
         Generator that yields issue json for each issue in a project
         :return: yields JIRA issue JSON
         """
-        issue_num = self.start_issue
-        while self.more_to_pull:
-            if self.end_issue and issue_num > self.end_issue:
+        self.resolve_range()
+        if self.cache is not None:
+            try:
+                self.updated_index = self.get_updated_index()
+            except (requests.HTTPError, ValueError) as e:
+                print('Searching {} failed ({}), fetching every issue instead of using the cache'.format(
+                    self.project, e))
+        if self.concurrency > 1:
+            return self.all_issues_concurrent()
+        return self.all_issues_sequential()
+
+    def resolve_range(self):
+        """
+        Sets end_issue to the project's highest issue number if it wasn't given, so the crawl knows where the
+        project ends and treats every 404 before that as a deleted or moved issue
+        """
+        if self.end_issue is None:
+            self.end_issue = self.discover_range() or 0
+            print('{} issues end at {}-{}'.format(self.project, self.project, self.end_issue))
+
+    def discover_range(self):
+        """
+        Finds the project's highest issue number with a single JQL search, or (when searching is forbidden or
+        fails) by probing issue numbers
+        :return: highest issue number, or None if the project has no issues
+        """
+        try:
+            result = execute_jql_query(
+                'project = {} ORDER BY key DESC'.format(self.project),
+                max_results=1,
+                fields=['key'],
+                headers=self.headers,
+                session=self.session,
+                url=self.search_url,
+            )
+        except (requests.HTTPError, ValueError) as e:
+            print('Searching {} failed ({}), probing issue numbers instead'.format(self.project, e))
+            return self.probe_range()
+        issues = result.get('issues', [])
+        return get_issue_num(issues[0]) if issues else None
+
+    def probe_range(self, window=PROBE_WINDOW):
+        """
+        Finds the highest issue number with exponential then binary probing, in O(log n) requests. A point
+        counts as taken if any of the window issue numbers from it exists, so gaps shorter than the window
+        are stepped over.
+        :param window: issue numbers checked per probe
+        :return: highest issue number found, or None if the project has no issues
+        """
+        def probe(issue_num):
+            return any(self.issue_exists(num) for num in range(issue_num, issue_num + window))
+
+        low, high = 0, 1
+        while probe(high):
+            low, high = high, high * 2
+        while high - low > 1:
+            middle = (low + high) // 2
+            if probe(middle):
+                low = middle
+            else:
+                high = middle
+        if low == 0:
+            return None
+        # the window from low holds an issue but the window from low + 1 doesn't, so low itself exists
+        return low
+
+    def issue_exists(self, issue_num):
+        """
+        :param issue_num: issue number in the project
+        :return: True if the issue exists (or was moved to another project), False on a 404
+        """
+        resp = self.session.get(
+            self.domain.format('{}-{}'.format(self.project, issue_num)), params={'fields': 'key'},
+            headers=self.headers)
+        if resp.status_code == 404:
+            return False
+        if resp.status_code == 401:
+            raise JiraApiError('Unauthorized')
+        if resp.status_code != 200:
+            raise JiraApiError('Probing {}-{} failed with HTTP {}'.format(self.project, issue_num, resp.status_code))
+        return True
+
+    def all_issues_sequential(self):
+        """
+        Generator that fetches and yields issue json one issue at a time
+        :return: yields JIRA issue JSON
+        """
+        for issue_key in self.issue_keys():
+            if not self.more_to_pull:
+                break
+            cached = self.get_cached_issue(issue_key)
+            if cached is not None:
+                yield cached
+            else:
+                yield self.get_issue_json(issue_key)
+
+    def all_issues_concurrent(self):
+        """
+        Generator that fetches issues on a bounded thread pool and yields them in issue number order.
+        Requests run speculatively up to 2 * concurrency issues ahead; responses are handled in order so
+        end-of-project detection behaves exactly as in the sequential crawl and speculative results past
+        the last issue are discarded. Issues served from the cache take no worker.
+        :return: yields JIRA issue JSON
+        """
+        issue_keys = self.issue_keys()
+        pending = collections.deque()
+        max_in_flight = self.concurrency * 2
+        in_flight = 0
+
+        def fill(executor):
+            # queue keys in order until max_in_flight requests are outstanding or the keys run out
+            nonlocal in_flight
+            while in_flight < max_in_flight:
+                issue_key = next(issue_keys, None)
+                if issue_key is None:
+                    return
+                cached = self.get_cached_issue(issue_key, count_found=False)
+                if cached is not None:
+                    pending.append((issue_key, None, cached))
+                else:
+                    pending.append((issue_key, executor.submit(self.request_issue, issue_key), None))
+                    in_flight += 1
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            fill(executor)
+            try:
+                while pending and self.more_to_pull:
+                    issue_key, future, cached = pending.popleft()
+                    if cached is not None:
+                        self.found_ticket = True
+                        yield cached
+                        continue
+                    in_flight -= 1
+                    issue_json = self.handle_issue_response(issue_key, future.result())
+                    if self.more_to_pull:
+                        fill(executor)
+                    yield issue_json
+            finally:
+                for _, future, _ in pending:
+                    if future is not None:
+                        future.cancel()
+
+    def get_updated_index(self, jql_query=None):
+        """
+        Fetches the updated timestamp of every issue in range with a cheap search, so unchanged issues can
+        be served from the cache
+        :param jql_query: JQL query for the issues, or None for project_jql()
+        :return: dict of issue key to JIRA updated timestamp
+        """
+        updated_index = {}
+        jql_query = jql_query or self.project_jql()
+        for batch in self.search_issues(jql_query, batch_size=1000, fields=['updated'], cache=False):
+            for issue in batch:
+                updated_index[issue['key']] = issue.get('fields', {}).get('updated')
+        return updated_index
+
+    def get_cached_issue(self, issue_key, count_found=True):
+        """
+        Returns the cached payload for an issue if it is unchanged since it was cached
+        :param issue_key: JIRA issue key (e.g. EX-123)
+        :param count_found: mark the issue as found for end-of-project detection
+        :return: issue JSON or None if the issue must be fetched
+        """
+        if self.cache is None or not self.updated_index or issue_key not in self.updated_index:
+            return None
+        cached = self.get_cached(issue_key, self.updated_index[issue_key])
+        if cached is not None and count_found:
+            self.found_ticket = True
+        return cached
+
+    def get_cached(self, issue_key, updated):
+        """
+        Reads the issue cache, treating payloads cached without a changelog when history is fetched, or without
+        a field added to SEARCH_FIELDS since they were cached, as misses
+        :param issue_key: JIRA issue key (e.g. EX-123)
+        :param updated: JIRA updated timestamp the payload must match
+        :return: issue JSON or None
+        """
+        cached = self.cache.get(issue_key, updated)
+        if cached is None:
+            return None
+        if self.history and 'changelog' not in cached:
+            return None
+        fields = cached.get('fields', {})
+        if any(field not in fields for field in SEARCH_FIELDS):
+            return None
+        return cached
+
+    def issue_keys(self):
+        """
+        Generator of issue keys from start_issue to end_issue (unbounded if end_issue is not set)
+        :return: yields JIRA issue keys
+        """
+        if self.end_issue is not None:
+            issue_nums = range(self.start_issue, self.end_issue + 1)
+        else:
+            issue_nums = itertools.count(self.start_issue)
+        for issue_num in issue_nums:
+            yield '{}-{}'.format(self.project, issue_num)
+
+    def all_issues_bulk(self, batch_size=100):
+        """
+        Generator that yields batches of issue json for a project using the search endpoint, in key order
+        :param batch_size: number of issues to request per search page
+        :return: yields lists of JIRA issue JSON
+        """
+        if self.concurrency > 1:
+            return self.all_issues_bulk_chunked(batch_size=batch_size)
+        return self.search_bulk(self.project_jql(), batch_size=batch_size)
+
+    def search_bulk(self, jql_query, batch_size=100):
+        """
+        Generator that yields batches of the issues matching a key ordered query, revalidated against the issue
+        cache if there is one
+        :param jql_query: JQL query string ordered by key
+        :param batch_size: number of issues to request per search page
+        :return: yields lists of JIRA issue JSON
+        """
+        if self.cache is not None:
+            return self.all_issues_bulk_revalidated(batch_size=batch_size, jql_query=jql_query)
+        return self.search_issues(jql_query, batch_size=batch_size)
+
+    def all_issues_bulk_chunked(self, batch_size=100, chunk_size=BULK_CHUNK_SIZE, max_pending_pages=2):
+        """
+        Generator that searches the project's key range in chunks of chunk_size issue numbers, concurrency
+        chunks at a time, and yields their batches in key order. Each search stays shallow, unlike paging
+        one search over the whole project. Pages are yielded as they arrive: each chunk's worker hands its pages
+        over a queue of max_pending_pages and blocks while it is full, so at most
+        concurrency * (max_pending_pages + 1) pages are held in memory. With an issue cache each chunk is
+        revalidated on its own, see all_issues_bulk_revalidated.
+        :param batch_size: number of issues to request per search page
+        :param chunk_size: issue numbers per chunk
+        :param max_pending_pages: pages a chunk may fetch ahead of the consumer
+        :return: yields lists of JIRA issue JSON
+        """
+        self.resolve_range()
+        chunks = iter(plan_chunks(self.start_issue, self.end_issue, chunk_size))
+        pending = collections.deque()
+        stopped = threading.Event()
+        chunk_done = object()
+
+        def put(pages, item):
+            # gives up once the consumer has stopped, so a worker never blocks on a queue nobody reads
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def search_chunk(first, last, pages):
+            try:
+                for batch in self.search_bulk(self.project_jql(first, last), batch_size=batch_size):
+                    if not put(pages, batch):
+                        return
+                put(pages, chunk_done)
+            except Exception as e:
+                put(pages, e)
+
+        def submit(executor, chunk):
+            pages = queue.Queue(maxsize=max_pending_pages)
+            executor.submit(search_chunk, chunk[0], chunk[1], pages)
+            pending.append(pages)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                for chunk in itertools.islice(chunks, self.concurrency):
+                    submit(executor, chunk)
+                while pending:
+                    page = pending[0].get()
+                    if page is chunk_done:
+                        pending.popleft()
+                        chunk = next(chunks, None)
+                        if chunk is not None:
+                            submit(executor, chunk)
+                    elif isinstance(page, Exception):
+                        raise page
+                    else:
+                        yield page
+            finally:
+                stopped.set()
+
+    def all_issues_bulk_revalidated(self, batch_size=100, jql_query=None):
+        """
+        Generator that yields batches of issue json in key order, serving unchanged issues from the cache and
+        searching only for issues that changed since they were cached. Each batch covers the next batch_size keys,
+        so the pipeline's flushed key checkpoint never passes a changed issue that has not been fetched yet.
+        :param batch_size: number of issues per batch
+        :param jql_query: JQL query for the issues, or None for project_jql()
+        :return: yields lists of JIRA issue JSON
+        """
+        updated_index = self.get_updated_index(jql_query)
+        issue_keys = sorted(updated_index, key=lambda issue_key: get_issue_num({'key': issue_key}))
+        for start in range(0, len(issue_keys), batch_size):
+            keys = issue_keys[start:start + batch_size]
+            issues = {}
+            stale_keys = []
+            for issue_key in keys:
+                cached = self.get_cached(issue_key, updated_index[issue_key])
+                if cached is None:
+                    stale_keys.append(issue_key)
+                else:
+                    issues[issue_key] = cached
+            if stale_keys:
+                jql_query = 'key in ({}) ORDER BY key ASC'.format(','.join(stale_keys))
+                for batch in self.search_issues(jql_query, batch_size=batch_size):
+                    issues.update((issue['key'], issue) for issue in batch)
+            batch = [issues[issue_key] for issue_key in keys if issue_key in issues]
+            if batch:
+                yield batch
+
+    def search_issues(self, jql_query, batch_size=100, fields=None, cache=True):
+        """
+        Generator that pages through the results of a JQL query with startAt/maxResults
+        :param jql_query: JQL query string
+        :param batch_size: number of issues to request per search page
+        :param fields: list of fields to request, or None for the fields parsed into the issue store (plus the
+            changelog and worklogs when fetching history)
+        :param cache: store the returned payloads in the issue cache, if there is one
+        :return: yields lists of JIRA issue JSON, one list per page
+        """
+        expand = 'changelog' if self.history and fields is None else None
+        start_at = 0
+        while True:
+            result = execute_jql_query(
+                jql_query,
+                start_at=start_at,
+                max_results=batch_size,
+                fields=fields or self.search_fields,
+                headers=self.headers,
+                session=self.session,
+                url=self.search_url,
+                expand=expand,
+            )
+            issues = result.get('issues', [])
+            if not issues:
+                break
+            if expand:
+                for issue in issues:
+                    self.complete_history(issue)
+            if cache and self.cache is not None:
+                for issue in issues:
+                    self.cache.put(issue)
+            print('Fetched Issues: {}-{} of {}'.format(start_at + 1, start_at + len(issues), result.get('total')))
+            yield issues
+            start_at += len(issues)
+            if start_at >= result.get('total', 0):
                 break
-            issue_key = '{}-{}'.format(self.project, issue_num)
-            if issue_num % 50 == 0:
-                print('Fetching Issue: {}'.format(issue_key))
-            issue_num += 1
-            issue_json = self.get_issue_json(issue_key)
-            yield issue_json
+
+    def updated_issues(self, since, batch_size=100):
+        """
+        Generator that yields batches of issues created or updated since a checkpoint
+        :param since: timezone aware datetime of the last sync
+        :param batch_size: number of issues to request per search page
+        :return: yields lists of JIRA issue JSON
+        """
+        return self.search_issues(self.updated_jql(since), batch_size=batch_size)
+
+    def updated_jql(self, since):
+        """
+        Builds a JQL query for issues in the project updated since a checkpoint
+        :param since: timezone aware datetime of the last sync
+        :return: JQL query string
+        """
+        since = since.astimezone(datetime.timezone.utc) - SYNC_OVERLAP
+        return 'project = {} AND updated >= "{}" ORDER BY updated ASC'.format(
+            self.project, since.strftime('%Y/%m/%d %H:%M'))
+
+    def project_jql(self, first=None, last=None):
+        """
+        Builds a JQL query for all issues in the project between first and last
+        :param first: first issue number, or None for start_issue
+        :param last: last issue number, or None for end_issue
+        :return: JQL query string
+        """
+        first = first or self.start_issue
+        last = last or self.end_issue
+        clauses = ['project = {}'.format(self.project)]
+        if first:
+            clauses.append('key >= {}-{}'.format(self.project, first))
+        if last:
+            clauses.append('key <= {}-{}'.format(self.project, last))
+        return '{} ORDER BY key ASC'.format(' AND '.join(clauses))
 
     def get_issue_json(self, issue_key):
         """
-        Returns json for a given issue if able or sets self.more_to_pull to False when done
+        Returns json for a given issue if able. A 404 inside a known range (end_issue set) is counted as a gap;
+        without one, a 404 after an issue was found ends the crawl by setting self.more_to_pull to False
         :param issue_key: JIRA issue key (e.g. EX-123)
         :return: response JSON
         """
+        resp = self.request_issue(issue_key)
+        return self.handle_issue_response(issue_key, resp)
+
+    def request_issue(self, issue_key):
+        """
+        Requests a single issue over the shared session. Safe to call from worker threads.
+        :param issue_key: JIRA issue key (e.g. EX-123)
+        :return: requests Response
+        """
         url = self.domain.format(issue_key)
-        resp = requests.get(url, headers=self.headers)
+        params = {'expand': 'changelog'} if self.history else None
+        return self.session.get(url, params=params, headers=self.headers)
+
+    def handle_issue_response(self, issue_key, resp):
+        """
+        Updates crawl state from an issue response and returns its json.
+        Must be called in issue number order.
+        :param issue_key: JIRA issue key (e.g. EX-123)
+        :param resp: requests Response for issue_key
+        :return: response JSON
+        """
+        if int(issue_key.split('-')[-1]) % 50 == 0:
+            print('Fetched Issue: {}'.format(issue_key))
         if resp.status_code == 200:
             self.found_ticket = True
+        elif resp.status_code == 404 and self.end_issue is not None:
+            # a deleted or moved issue inside the known range
+            self.missing_issues += 1
         elif resp.status_code == 404 and self.found_ticket:
             self.more_to_pull = False
-            store_state_json(issue_key)
         elif resp.status_code == 401:
-            raise Exception('Unauthorized')
+            raise JiraApiError('Unauthorized')
 
         try:
             result = resp.json()
-        except Exception as e:
-            print(resp.text)
-            raise
+        except ValueError:
+            raise JiraApiError('Invalid JSON for {} (HTTP {}): {}'.format(issue_key, resp.status_code, resp.text[:200]))
+        if resp.status_code == 200 and self.history:
+            self.complete_history(result)
+        if resp.status_code == 200 and self.cache is not None:
+            self.cache.put(result)
         return result
 
-    def collect_issues(self, data_frame):
+    def complete_history(self, issue):
+        """
+        Replaces the changelog and worklogs embedded in an issue payload with every page of them when JIRA
+        truncated the embedded copies (it returns at most 100 histories and 20 worklogs)
+        :param issue: issue JSON fetched with expand=changelog, updated in place
+        :return: issue
+        """
+        changelog = issue.get('changelog')
+        if changelog and changelog.get('total', 0) > len(changelog.get('histories', [])):
+            histories = list(self.get_pages(CHANGELOG_PATH.format(issue['key']), 'values'))
+            issue['changelog'] = {'startAt': 0, 'maxResults': len(histories), 'total': len(histories),
+                                  'histories': histories}
+        worklog = issue.get('fields', {}).get('worklog')
+        if worklog and worklog.get('total', 0) > len(worklog.get('worklogs', [])):
+            worklogs = list(self.get_pages(WORKLOG_PATH.format(issue['key']), 'worklogs'))
+            issue['fields']['worklog'] = {'startAt': 0, 'maxResults': len(worklogs), 'total': len(worklogs),
+                                          'worklogs': worklogs}
+        return issue
+
+    def get_pages(self, path, items_key, page_size=100):
+        """
+        Generator that pages through a startAt/maxResults list endpoint of the JIRA instance
+        :param path: endpoint path (e.g. /rest/api/2/issue/EX-1/worklog)
+        :param items_key: response key holding each page's items
+        :param page_size: number of items to request per page
+        :return: yields items
+        """
+        start_at = 0
+        while True:
+            resp = self.session.get(
+                self.base_url + path, params={'startAt': start_at, 'maxResults': page_size}, headers=self.headers)
+            resp.raise_for_status()
+            page = resp.json()
+            items = page.get(items_key, [])
+            yield from items
+            start_at += len(items)
+            if not items or page.get('isLast') or start_at >= page.get('total', 0):
+                break
+
+    def request_stats(self):
+        """
+        Request counters for the crawl so far
+        :return: dict of retries, throttle waits, requests/sec etc.
+        """
+        return self.session.stats.as_dict()
+
+    def collect_issues(self, data_frame, bulk=False, events=None):
         """
         Compile all issues from a given board into a pandas dataframe
-        :param jirapi_conn: JirApi object
         :param data_frame: pandas data_frame in which to store JIRA issue data
+        :param bulk: fetch issues in pages from the search endpoint instead of one request per issue
+        :param events: history.EventCollector to gather changelog and worklog events into
         :return: pandas data_frame with all JIRA issue data
         """
-        for issue in self.all_issues():
-            row_index = get_issue_num(issue)
-            row_dict = parse_issue_json(issue)
-            if row_dict['issue_type'] not in EXCLUDED_ISSUE_TYPES:
-                row = [row_dict[field] for field in HEADER]
-                data_frame.loc[row_index] = row
+        if bulk:
+            issues = (issue for batch in self.all_issues_bulk() for issue in batch)
+        else:
+            issues = self.all_issues()
+        return self.store_issues(data_frame, issues, events=events)
 
-        return data_frame
+    def sync_issues(self, data_frame, since, events=None):
+        """
+        Upserts issues created or updated since a checkpoint into a pandas dataframe
+        :param data_frame: pandas data_frame holding previously synced JIRA issue data, or None for none
+        :param since: timezone aware datetime of the last sync
+        :param events: history.EventCollector to gather changelog and worklog events into
+        :return: pandas data_frame with new and updated issues replacing their old rows, or None if
+            data_frame was None and nothing changed
+        """
+        issues = (issue for batch in self.updated_issues(since) for issue in batch)
+        return self.store_issues(data_frame, issues, events=events)
+
+    def store_issues(self, data_frame, issues, batch_size=1000, events=None):
+        """
+        Upserts issues into a pandas dataframe and tracks the sync checkpoint.
+        Each batch is parsed column by column into buffers that are turned into a dataframe once,
+        and the batches are merged into data_frame in a single concat at the end.
+        :param data_frame: pandas data_frame in which to store JIRA issue data, or None to start a new one
+        :param issues: iterable of JIRA issue JSON
+        :param batch_size: number of issues to buffer per dataframe batch
+        :param events: history.EventCollector to gather changelog and worklog events into, so raw payloads
+            are not kept around for a second pass
+        :return: pandas data_frame with all JIRA issue data, or None if data_frame was None and there were
+            no issues
+        """
+        if events is not None:
+            issues = events.collect(issues)
+        extract_updated = FIELD_EXTRACTORS['updated_datetime']
+        batches = []
+        pending = []
+        for issue in issues:
+            if 'key' not in issue:
+                # error body for a missing issue (e.g. the 404 that ends the crawl)
+                continue
+            self.update_checkpoint(issue['key'], extract_updated(issue))
+            pending.append(compact_issue(issue))
+            if len(pending) >= batch_size:
+                batches.append(parse_records(pending).to_data_frame())
+                pending = []
+        if pending:
+            batches.append(parse_records(pending).to_data_frame())
+        if self.cache is not None:
+            self.cache.flush()
+
+        return upsert_rows(data_frame, batches)
+
+    def update_checkpoint(self, issue_key, updated):
+        """
+        Records the last issue key seen and the latest updated timestamp
+        :param issue_key: JIRA issue key (e.g. EX-123)
+        :param updated: JIRA updated timestamp string
+        """
+        self.last_key = issue_key
+        updated = parse_jira_datetime(updated)
+        if updated and (self.last_updated is None or updated > self.last_updated):
+            self.last_updated = updated
+
+    def checkpoint(self):
+        """
+        Sync state to persist with store_state_json once the collected data has been saved
+        :return: dict of last_key and last_updated
+        """
+        return {'last_key': self.last_key, 'last_updated': self.last_updated}
+
+
+class IssueColumns(object):
+    """
+    Per-column value buffers for a batch of parsed issues, indexed by issue key
+    """
+    def __init__(self):
+        self.index = []
+        self.columns = {field: [] for field in HEADER}
+
+    def __len__(self):
+        return len(self.index)
+
+    def to_data_frame(self):
+        import pandas
+        return pandas.DataFrame(self.columns, index=self.index, columns=HEADER)
+
+
+class IssueRecord(object):
+    """
+    What an in-flight issue shrinks to once its fields are extracted: the HEADER values in a tuple, with
+    INTERNED_COLUMNS strings interned, plus the issue's changelog and worklog event rows when history is
+    fetched. A few hundred bytes against several KB or more for the JSON payload, which can then be dropped.
+    """
+    __slots__ = ('values', 'events')
+
+    def __init__(self, values, events=None):
+        self.values = values
+        self.events = events
+
+    @property
+    def key(self):
+        return self.values[0]
+
+    def get(self, field):
+        return self.values[FIELD_INDEX[field]]
+
+
+def compact_issue(issue, extract_events=None):
+    """
+    Extracts an issue payload into an IssueRecord
+    :param issue: issue JSON from JirApi
+    :param extract_events: history.extract_events to keep the issue's events too, or None
+    :return: IssueRecord
+    """
+    values = tuple([intern_value(extract(issue)) if interned else extract(issue)
+                    for extract, interned in COMPACT_EXTRACTORS])
+    return IssueRecord(values, extract_events(issue) if extract_events is not None else None)
+
+
+def intern_value(value):
+    return sys.intern(value) if value.__class__ is str else value
+
+
+def parse_records(records, columns=None):
+    """
+    Transposes a batch of IssueRecords into column buffers, skipping EXCLUDED_ISSUE_TYPES
+    :param records: list of IssueRecord
+    :param columns: IssueColumns to append to, or None for new buffers
+    :return: IssueColumns
+    """
+    if columns is None:
+        columns = IssueColumns()
+    type_index = FIELD_INDEX['issue_type']
+    with stage('parse', rows=len(records)):
+        rows = [record.values for record in records if record.values[type_index] not in EXCLUDED_ISSUE_TYPES]
+        columns.index.extend([row[0] for row in rows])
+        if rows:
+            for field, values in zip(HEADER, zip(*rows)):
+                columns.columns[field].extend(values)
+    return columns
 
 
 def parse_issue_json(issue):
     """
-    Create a dict of values to be inserted into pandas data_frame
+    Create a dict of values to be inserted into pandas data_frame. Batches go through compact_issue and
+    parse_records instead.
     :param issue: issue JSON from JirApi
-    :return: unordered dict of row values
+    :return: dict of HEADER values
+    """
+    return dict(zip(HEADER, compact_issue(issue).values))
+
+
+def compile_field_extractor(keys):
     """
-    row_dict = {key: get_leaf_value(issue, FIELD_MAP[key]) for key in HEADER if key != 'sprints'}
-    row_dict['sprints'] = get_sprint_info(issue, 'name')
-    return row_dict
+    Builds a function equivalent to get_leaf_value(issue_json, keys) with the path unrolled,
+    for paths of up to three keys, which covers FIELD_MAP
+    :param keys: list of keys in order from outermost to innermost
+    :return: function taking issue JSON and returning the leaf value
+    """
+    if len(keys) == 1:
+        key_1, = keys
+
+        def extract(issue_json):
+            return finalize_leaf_value(issue_json.get(key_1))
+    elif len(keys) == 2:
+        key_1, key_2 = keys
+
+        def extract(issue_json):
+            result = issue_json.get(key_1)
+            if not result:
+                return None
+            return finalize_leaf_value(result.get(key_2))
+    elif len(keys) == 3:
+        key_1, key_2, key_3 = keys
+
+        def extract(issue_json):
+            result = issue_json.get(key_1)
+            if not result:
+                return None
+            result = result.get(key_2)
+            if not result:
+                return None
+            return finalize_leaf_value(result.get(key_3))
+    else:
+        def extract(issue_json):
+            return get_leaf_value(issue_json, keys)
+    return extract
+
+
+def finalize_leaf_value(result):
+    """
+    Joins list leaves as get_leaf_value does: lists of strings are joined directly,
+    lists of objects by their names, and empty lists become None
+    :param result: leaf value
+    :return: leaf value with lists joined into strings
+    """
+    if result.__class__ is list:
+        if not result:
+            return None
+        if isinstance(result[0], str):
+            return ','.join(result)
+        if isinstance(result[0], dict):
+            return ','.join([obj.get('name') for obj in result])
+    return result
+
+
+def upsert_rows(data_frame, batches):
+    """
+    Replaces rows of data_frame with matching rows from batches and appends the rest
+    :param data_frame: pandas data_frame of existing JIRA issue data, or None
+    :param batches: list of pandas data_frames of new rows
+    :return: pandas data_frame sorted by issue key, or data_frame itself if there are no batches
+    """
+    if not batches:
+        return data_frame
+    import pandas
+    new_rows = pandas.concat(batches)
+    new_rows = new_rows[~new_rows.index.duplicated(keep='last')]
+    if data_frame is None or data_frame.empty:
+        return sort_by_issue_key(new_rows)
+    existing_rows = data_frame.drop(new_rows.index, errors='ignore')
+    return sort_by_issue_key(pandas.concat([existing_rows, new_rows]))
 
 
 def get_leaf_value(issue_json, keys):
@@ -116,41 +844,472 @@ def get_leaf_value(issue_json, keys):
     return result
 
 
-def execute_jql_query(jql_query):
-    url = 'https://farmobile.atlassian.net/rest/api/2/search'
+class RateLimiter(object):
+    """
+    Thread-safe token bucket. The rate backs off multiplicatively when the server throttles us and
+    creeps back up on success, and a Retry-After pauses every worker, not just the one that got the 429.
+    """
+    def __init__(self, rate=20.0, burst=None, min_rate=0.5, recovery=0.1):
+        if rate <= 0:
+            raise ValueError('rate must be greater than 0')
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.recovery = recovery
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent
+        :return: tuple of (seconds waited for the token bucket, seconds waited on a server throttle)
+        """
+        paced = 0.0
+        throttled = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return paced, throttled
+                if self.blocked_until > now:
+                    wait = self.blocked_until - now
+                    throttled += wait
+                else:
+                    wait = (1 - self.tokens) / self.rate
+                    paced += wait
+            time.sleep(wait)
+
+    def throttled(self, retry_after):
+        """
+        Slows down after a 429: halves the rate and holds all requests for retry_after seconds
+        :param retry_after: seconds to pause
+        """
+        with self.lock:
+            self.rate = min(self.max_rate, max(self.min_rate, self.rate / 2))
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery)
+
+
+class RetryPolicy(object):
+    """
+    Exponential backoff with full jitter for failed requests, capped per request and by a retry budget
+    shared across the crawl. 429s that carry a Retry-After are the server pacing us rather than failures,
+    so they are not charged to the budget and have their own, larger, per-request cap.
+    """
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, max_retries=5, max_throttled_retries=20, backoff_base=0.5, backoff_max=60.0,
+                 retry_budget=500):
+        self.max_retries = max_retries
+        self.max_throttled_retries = max_throttled_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget
+        self.lock = threading.Lock()
+
+    def should_retry(self, resp):
+        return resp is None or resp.status_code in self.RETRY_STATUSES
+
+    def consume(self, attempt):
+        """
+        Takes one retry from the budget
+        :param attempt: number of failed retries already made for this request
+        :return: True if the request may be retried
+        """
+        with self.lock:
+            if attempt >= self.max_retries or self.retry_budget <= 0:
+                return False
+            self.retry_budget -= 1
+            return True
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+class RequestStats(object):
+    """
+    Request counters. Pacing waits are the token bucket doing its job; throttle waits are time lost
+    to the server telling us to slow down (429/Retry-After).
+    """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.retries = 0
+        self.throttled_responses = 0
+        self.pacing_waits = 0
+        self.pacing_wait_seconds = 0.0
+        self.throttle_waits = 0
+        self.throttle_wait_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, paced=0.0, throttled=0.0, retried=False):
+        with self.lock:
+            self.requests += 1
+            if retried:
+                self.retries += 1
+            if paced:
+                self.pacing_waits += 1
+                self.pacing_wait_seconds += paced
+            if throttled:
+                self.throttle_waits += 1
+                self.throttle_wait_seconds += throttled
+
+    def record_throttled(self):
+        with self.lock:
+            self.throttled_responses += 1
+
+    def as_dict(self):
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'throttled_responses': self.throttled_responses,
+                'pacing_waits': self.pacing_waits,
+                'pacing_wait_seconds': round(self.pacing_wait_seconds, 3),
+                'throttle_waits': self.throttle_waits,
+                'throttle_wait_seconds': round(self.throttle_wait_seconds, 3),
+                'requests_per_sec': round(self.requests / elapsed, 2) if elapsed else 0.0,
+            }
+
+
+class ThrottledSession(requests.Session):
+    """
+    requests Session that rate limits every request and retries 429s, 5xxs, timeouts and connection errors
+    """
+    def __init__(self, rate_limiter=None, retry_policy=None, timeout=(10, 60)):
+        super(ThrottledSession, self).__init__()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeout = timeout
+        self.stats = RequestStats()
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        throttled_attempt = 0
+        while True:
+            paced, throttled = self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                resp = super(ThrottledSession, self).request(method, url, *args, **kwargs)
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                resp, error = None, e
+            self.stats.record(paced=paced, throttled=throttled, retried=attempt + throttled_attempt > 0)
+            record_response(resp, time.perf_counter() - started)
+
+            if not self.retry_policy.should_retry(resp):
+                self.rate_limiter.succeeded()
+                return resp
+
+            retry_after = get_retry_after(resp)
+            if retry_after is not None:
+                retry_after = min(retry_after, self.retry_policy.backoff_max)
+            if resp is not None and resp.status_code == 429:
+                self.stats.record_throttled()
+                if retry_after is not None and throttled_attempt < self.retry_policy.max_throttled_retries:
+                    self.rate_limiter.throttled(retry_after)
+                    throttled_attempt += 1
+                    continue
+
+            if not self.retry_policy.consume(attempt):
+                reason = error or 'HTTP {}'.format(resp.status_code)
+                raise JiraApiError('Giving up on {} after {} retries: {}'.format(
+                    url, attempt + throttled_attempt, reason))
+
+            delay = retry_after if retry_after is not None else self.retry_policy.backoff(attempt)
+            if resp is not None and resp.status_code == 429:
+                self.rate_limiter.throttled(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+
+def record_response(resp, seconds):
+    """
+    Adds a response to the request telemetry: latency histogram, status counts and bytes downloaded
+    :param resp: requests Response, or None if the request failed to connect or timed out
+    :param seconds: time from sending the request to reading the response body
+    """
+    observe('request_seconds', seconds)
+    if resp is None:
+        count('responses', status='error')
+        return
+    count('responses', status=resp.status_code)
+    count('downloaded_bytes', len(resp.content))
+
+
+def get_retry_after(resp):
+    """
+    Parses a Retry-After header given either as seconds or an HTTP date
+    :param resp: requests Response or None
+    :return: seconds to wait or None if no usable header
+    """
+    value = resp.headers.get('Retry-After') if resp is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def create_session(pool_size=1, rate_limiter=None, retry_policy=None):
+    """
+    Creates a rate limited requests session that keeps connections alive across requests
+    :param pool_size: maximum number of connections to keep open per host
+    :param rate_limiter: RateLimiter shared by all requests on the session
+    :param retry_policy: RetryPolicy for throttled and failed requests
+    :return: ThrottledSession
+    """
+    session = ThrottledSession(rate_limiter=rate_limiter, retry_policy=retry_policy)
+    adapter = HTTPAdapter(pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def execute_jql_query(jql_query, start_at=0, max_results=50, fields='all', headers=None, session=None,
+                      url=SEARCH_URL, expand=None):
+    """
+    Runs a single page of a JQL search
+    :param jql_query: JQL query string
+    :param start_at: index of the first issue to return
+    :param max_results: maximum number of issues to return
+    :param fields: list of field names to return, or 'all'
+    :param headers: request headers (e.g. auth)
+    :param session: requests Session to reuse connections from
+    :param url: search endpoint of the JIRA instance
+    :param expand: comma separated entities to expand (e.g. changelog)
+    :return: search response JSON
+    """
+    if isinstance(fields, (list, tuple)):
+        fields = ','.join(fields)
     params = {
         'jql': jql_query,
-        'fields': 'all',
+        'startAt': start_at,
+        'maxResults': max_results,
+        'fields': fields,
     }
-    response = requests.get(url, params=params)
+    if expand:
+        params['expand'] = expand
+    response = (session or requests).get(url, params=params, headers=headers)
     response.raise_for_status()
     return response.json()
 
 
-def store_state_json(issue_key):
-    with open('state.json', 'w+') as state_file:
-        state_json = json.loads(state_file)
-        state_json['last_ticket_retrieved'] = issue_key
+def load_state_json(state_path=STATE_FILE):
+    """
+    Reads the sync checkpoint
+    :param state_path: path of the state file
+    :return: dict with last_ticket_retrieved and last_updated (as a datetime), empty if never synced
+    """
+    try:
+        with open(state_path) as state_file:
+            state_json = json.load(state_file)
+    except FileNotFoundError:
+        return {}
+    if state_json.get('last_updated'):
+        state_json['last_updated'] = datetime.datetime.fromisoformat(state_json['last_updated'])
+    return state_json
+
+
+def store_state_json(last_key=None, last_updated=None, last_flushed_key=None, clear_flushed_key=False,
+                     state_path=STATE_FILE):
+    """
+    Atomically updates the sync checkpoint. The previous state is kept for values that are not given,
+    and last_updated never moves backwards.
+    :param last_key: last JIRA issue key retrieved
+    :param last_updated: timezone aware datetime of the most recently updated issue retrieved
+    :param last_flushed_key: issue key every issue up to which has been written to the issue store
+    :param clear_flushed_key: drop last_flushed_key, when a crawl completes or a fresh one starts
+    :param state_path: path of the state file
+    """
+    state_json = load_state_json(state_path)
+    if last_key:
+        state_json['last_ticket_retrieved'] = last_key
+    if clear_flushed_key:
+        state_json.pop('last_flushed_key', None)
+    if last_flushed_key:
+        state_json['last_flushed_key'] = last_flushed_key
+    if last_updated and (not state_json.get('last_updated') or last_updated > state_json['last_updated']):
+        state_json['last_updated'] = last_updated
+    if state_json.get('last_updated'):
+        state_json['last_updated'] = state_json['last_updated'].isoformat()
+
+    state_dir = os.path.dirname(os.path.abspath(state_path))
+    with tempfile.NamedTemporaryFile('w', dir=state_dir, suffix='.tmp', delete=False) as state_file:
         json.dump(state_json, state_file)
+        state_file.flush()
+        os.fsync(state_file.fileno())
+    os.replace(state_file.name, state_path)
 
 
-def get_sprint_info(issue, val_name):
-    if val_name not in {'name', 'startDate', 'endDate'}:
-        raise ValueError('val_name must be one of "name", "startDate", or "endDate"')
+def parse_jira_datetime(value):
+    """
+    Parses a JIRA timestamp (e.g. 2017-10-23T14:09:09.683-0500)
+    :param value: JIRA timestamp string
+    :return: timezone aware datetime or None
+    """
+    if not value:
+        return None
     try:
-        sprints_string = issue['fields']['customfield_10004']
-    except KeyError:
+        return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z')
+    except ValueError:
         return None
-    regex_map = {
-        'name': r'name=(.+),goal=',
-        'startDate': r'startDate=(.+),endDate',
-        'endDate': r'endDate=(.+),completedDate',
-    }
-    regex = regex_map[val_name]
-    sprints = ','.join([re.search(regex, sprint).group(1) for sprint in sprints_string])
 
-    return sprints
+
+def get_sprint_info(issue, val_name):
+    if val_name not in {'name', 'state', 'startDate', 'endDate'}:
+        raise ValueError('val_name must be one of "name", "state", "startDate", or "endDate"')
+    sprints = get_sprints(issue)
+    if sprints is None:
+        return None
+    attribute = SPRINT_ATTRIBUTES[val_name]
+    return ','.join([getattr(sprint, attribute) or '' for sprint in sprints])
+
+
+def get_sprints(issue):
+    """
+    Parses the GreenHopper sprint field of an issue
+    :param issue: issue JSON from JirApi
+    :return: list of Sprint records in field order, or None if the issue has no sprint field. The list is
+        shared between issues with the same sprints and must not be modified.
+    """
+    sprint_strings = issue.get('fields', {}).get('customfield_10004')
+    if sprint_strings is None:
+        return None
+    return parse_sprint_strings(tuple(sprint_strings))
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_sprint_strings(sprint_strings):
+    return [parse_sprint_string(sprint_string) for sprint_string in sprint_strings]
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_sprint_string(sprint_string):
+    """
+    Tokenizes one GreenHopper sprint string in a single pass. Memoized, since every issue in a sprint
+    carries the same string.
+    :param sprint_string: e.g. 'com.atlassian.greenhopper.service.sprint.Sprint@5a1b0835[id=56,...]'
+    :return: Sprint record; missing and <null> attributes are None
+    """
+    body = sprint_string[sprint_string.find('[') + 1:]
+    if body.endswith(']'):
+        body = body[:-1]
+    values = dict.fromkeys(Sprint._fields)
+    for token in SPRINT_SEPARATOR.split(body):
+        name, _, value = token.partition('=')
+        if name in SPRINT_ATTRIBUTES and value != '<null>':
+            values[SPRINT_ATTRIBUTES[name]] = value
+    if values['id'] is not None:
+        values['id'] = int(values['id'])
+    return Sprint(**values)
+
+
+def get_last_sprint_date(issue, attribute):
+    """
+    Returns a date of the most recent sprint an issue was in
+    :param issue: issue JSON from JirApi
+    :param attribute: Sprint attribute, e.g. 'start_date'
+    :return: ISO timestamp string or None
+    """
+    sprints = get_sprints(issue)
+    if not sprints:
+        return None
+    return getattr(sprints[-1], attribute)
+
+
+def get_option_ids(issue, field):
+    """
+    Reads a custom field the way JQL compares it to a number: select and checkbox options by id, numbers
+    without a trailing .0
+    :param issue: issue JSON from JirApi
+    :param field: custom field id, e.g. 'customfield_10614'
+    :return: string, comma separated for several options, or None
+    """
+    value = issue.get('fields', {}).get(field)
+    if value.__class__ is not list:
+        value = [] if value is None else [value]
+    ids = []
+    for item in value:
+        if isinstance(item, dict):
+            item = item.get('id')
+        elif isinstance(item, float) and item.is_integer():
+            item = int(item)
+        if item is not None:
+            ids.append(str(item))
+    return ','.join(ids) or None
+
+
+def plan_chunks(start_issue, end_issue, chunk_size):
+    """
+    Splits an issue number range into chunks that can be fetched independently
+    :param start_issue: first issue number
+    :param end_issue: last issue number, inclusive
+    :param chunk_size: issue numbers per chunk
+    :return: list of (first, last) issue numbers, inclusive
+    """
+    return [(first, min(first + chunk_size - 1, end_issue)) for first in range(start_issue, end_issue + 1, chunk_size)]
 
 
 def get_issue_num(issue):
-    return issue['key'].split('-')[-1]
+    return int(issue['key'].split('-')[-1])
+
+
+def sort_by_issue_key(data_frame):
+    """
+    Sorts rows indexed by issue key by project, then numerically by issue number (FARM-2 before FARM-10)
+    :param data_frame: pandas data frame indexed by issue key
+    :return: sorted pandas data frame
+    """
+    import numpy
+    import pandas
+    parts = pandas.Series(data_frame.index.astype(str)).str.rsplit('-', n=1, expand=True).reindex(columns=[0, 1])
+    issue_nums = pandas.to_numeric(parts[1], errors='coerce').fillna(-1).to_numpy()
+    return data_frame.iloc[numpy.lexsort((issue_nums, parts[0].fillna('').to_numpy()))]
+
+
+def prompt_credentials(base_url=None):
+    """
+    Asks for JIRA credentials on the terminal
+    :param base_url: JIRA instance the credentials are for, shown when crawling several instances
+    :return: (username, password)
+    """
+    prefix = '{} '.format(base_url) if base_url else ''
+    return input('{}Username: '.format(prefix)), getpass.getpass('{}Password: '.format(prefix))
+
+
+SPRINT_EXTRACTORS = {
+    'sprints': functools.partial(get_sprint_info, val_name='name'),
+    'sprint_states': functools.partial(get_sprint_info, val_name='state'),
+    'sprint_start_datetime': functools.partial(get_last_sprint_date, attribute='start_date'),
+    'sprint_end_datetime': functools.partial(get_last_sprint_date, attribute='end_date'),
+}
+
+OPTION_EXTRACTORS = {
+    'flagged': functools.partial(get_option_ids, field=FLAGGED_FIELD),
+    'customfield_10614': functools.partial(get_option_ids, field='customfield_10614'),
+}
+
+FIELD_EXTRACTORS = {
+    key: SPRINT_EXTRACTORS.get(key) or OPTION_EXTRACTORS.get(key) or compile_field_extractor(FIELD_MAP[key])
+    for key in HEADER
+}
+COMPACT_EXTRACTORS = [(extract, key in INTERNED_COLUMNS) for key, extract in FIELD_EXTRACTORS.items()]
@@ -0,0 +1,98 @@
+"""
+Benchmark for estimate accuracy and sprint bug analytics: the original iterrows loops against the
+vectorized analytics module. The legacy loops are timed on a smaller slice since they take minutes on 1M rows.
+
+    python benchmarks/bench_analytics.py [-n 1000000] [--legacy-rows 50000]
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+import numpy
+import pandas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import analytics  # noqa: E402
+
+ISSUE_TYPES = ['Bug', 'Task', 'Story', 'Sub-task']
+
+
+def make_issues(issue_count, rand):
+    sprint_nums = pandas.Series(numpy.arange(issue_count) // 500)
+    sprints = sprint_nums.map('Sprint {}'.format)
+    # a fifth of issues are carried over into the next sprint, a tenth were never in one
+    next_sprints = (sprint_nums + 1).map('Sprint {}'.format)
+    sprints = sprints.where(rand.random_sample(issue_count) > 0.2, sprints + ',' + next_sprints)
+    sprints = sprints.astype(object).where(rand.random_sample(issue_count) > 0.1, None)
+    return pandas.DataFrame({
+        'sprints': sprints,
+        'issue_type': rand.choice(ISSUE_TYPES, issue_count),
+        'original_estimate': numpy.where(rand.random_sample(issue_count) > 0.3,
+                                         rand.choice([1800, 3600, 7200, 14400], issue_count), numpy.nan),
+        'time_spent': numpy.where(rand.random_sample(issue_count) > 0.2,
+                                  rand.randint(1, 20000, issue_count), numpy.nan),
+    })
+
+
+def tally_bugs_by_sprint_legacy(data_frame):
+    """The original plotter._tally_bugs_by_sprint, guarded against the NaN iterrows gives for missing sprints"""
+    tally = {}
+    sprint_list = []
+    for i, row in data_frame.iterrows():
+        sprints = row['sprints'].split(',') if isinstance(row['sprints'], str) and row['sprints'] else None
+        if sprints:
+            for sprint in sprints:
+                if sprint not in sprint_list:
+                    sprint_list.append(sprint)
+        if row['issue_type'] == 'Bug' and sprints:
+            tally.update({sprint: tally.setdefault(sprint, 0) + 1 for sprint in sprints})
+    return tally, sprint_list
+
+
+def estimate_accuracy_legacy(data_frame):
+    """The original plotter.calc_average_time_est_error loop, without printing"""
+    counts = [0, 0, 0]
+    total_diff = 0
+    for i, row in data_frame.iterrows():
+        original_estimate = row['original_estimate'] if pandas.notnull(row['original_estimate']) else None
+        time_spent = row['time_spent'] if pandas.notnull(row['time_spent']) else None
+        if original_estimate and time_spent:
+            counts[int(numpy.sign(original_estimate - time_spent)) + 1] += 1
+            total_diff += original_estimate - time_spent
+    return counts, total_diff
+
+
+def vectorized(data_frame):
+    analytics.bugs_by_sprint(data_frame)
+    analytics.estimate_accuracy(data_frame)
+
+
+def legacy(data_frame):
+    tally_bugs_by_sprint_legacy(data_frame)
+    estimate_accuracy_legacy(data_frame)
+
+
+def time_it(func, data_frame):
+    started = time.perf_counter()
+    func(data_frame)
+    return time.perf_counter() - started
+
+
+def main(issue_count, legacy_rows):
+    data_frame = make_issues(issue_count, numpy.random.RandomState(0))
+    results = {}
+    for name, func, rows in (('legacy', legacy, legacy_rows), ('vectorized', vectorized, issue_count)):
+        elapsed = time_it(func, data_frame.iloc[:rows])
+        results[name] = rows / elapsed
+        print('{:<10} {:>8} rows {:>7.3f}s {:>12.0f} rows/sec'.format(name, rows, elapsed, results[name]))
+    print('speedup    {:>10.0f}x'.format(results['vectorized'] / results['legacy']))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--issues', type=int, default=1000000, help='Number of synthetic issues')
+    parser.add_argument('--legacy-rows', type=int, default=50000, help='Number of issues timed with the legacy loops')
+    args = parser.parse_args()
+    main(args.issues, args.legacy_rows)
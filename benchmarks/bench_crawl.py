@@ -0,0 +1,160 @@
+"""
+End-to-end crawl benchmark against the local fake JIRA (benchmarks/fake_jira.py): runs main.fetch_data('all')
+per scenario in a fresh process and reports issues/sec, wall time and peak RSS, plus what the server saw.
+Each run is appended to benchmarks/results/crawl.jsonl and compared with the previous run of the same scenario.
+
+    python benchmarks/bench_crawl.py [-n 5000] [--scenarios bulk per_issue ...] [--latency 0.002] [--no-record]
+"""
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+
+from constants import EXCLUDED_ISSUE_TYPES  # noqa: E402
+from fake_jira import FakeJira, start_server  # noqa: E402
+
+RESULTS_PATH = os.path.join(BENCH_DIR, 'results', 'crawl.jsonl')
+PROJECT = 'FARM'
+# fetch_data arguments and server failure injection per scenario
+SCENARIOS = {
+    'bulk': ({'bulk': True}, {}),
+    'bulk_chunked': ({'bulk': True, 'concurrency': 4}, {}),
+    'per_issue': ({'concurrency': 8}, {}),
+    'bulk_throttled': ({'bulk': True}, {'throttle_rate': 0.05, 'error_rate': 0.02}),
+    'per_issue_throttled': ({'concurrency': 8}, {'throttle_rate': 0.05, 'error_rate': 0.02}),
+    'bulk_history': ({'bulk': True, 'history': True}, {}),
+}
+
+
+def crawl(base_url, options, results):
+    """
+    Runs in a spawned process so peak RSS covers this crawl alone
+    """
+    import crawler
+    import main
+
+    crawler.prompt_credentials = lambda base_url=None: ('bench', 'bench')
+    with open('instances.json', 'w') as instances_file:
+        json.dump([{'base_url': base_url, 'projects': [PROJECT], 'rate_limit': 100000}], instances_file)
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        # no end issue, so the crawl has to discover where the project ends
+        data_frame = main.fetch_data('all', 1, None, **options)
+    results.put({
+        'seconds': time.perf_counter() - started,
+        'issues': len(data_frame),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    })
+
+
+def expected_issues(jira):
+    """
+    Number of fake issues the store should end up with: every existing issue but EXCLUDED_ISSUE_TYPES
+    """
+    return sum(
+        jira.issue(PROJECT, num, fields={'issuetype'})['fields']['issuetype']['name'] not in EXCLUDED_ISSUE_TYPES
+        for _, num in jira.updated_index[PROJECT]
+    )
+
+
+def run_scenario(jira, base_url, name):
+    options, failures = SCENARIOS[name]
+    jira.throttle_rate = failures.get('throttle_rate', 0.0)
+    jira.error_rate = failures.get('error_rate', 0.0)
+    for stat in jira.stats:
+        jira.stats[stat] = 0
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        try:
+            process = context.Process(target=crawl, args=(base_url, options, results))
+            process.start()
+            process.join()
+        finally:
+            os.chdir(cwd)
+    if process.exitcode:
+        raise RuntimeError('{} crawl failed with exit code {}'.format(name, process.exitcode))
+    metrics = results.get()
+    metrics['issues_per_sec'] = metrics['issues'] / metrics['seconds']
+    metrics['expected_issues'] = expected_issues(jira)
+    metrics['server'] = dict(jira.stats)
+    return options, failures, metrics
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_results(path):
+    previous = {}
+    if os.path.exists(path):
+        with open(path) as results_file:
+            for line in results_file:
+                record = json.loads(line)
+                previous[(record['scenario'], record['issue_count'], record['latency'])] = record
+    return previous
+
+
+def main(issue_count, scenarios, latency, gap_rate, record):
+    jira = FakeJira({PROJECT: issue_count}, gap_rate=gap_rate, latency=latency, retry_after=0.05)
+    server = start_server(jira)
+    base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+    previous = previous_results(RESULTS_PATH)
+    commit = git_commit()
+    print('{} issue numbers, {} existing, {:.1f}ms latency'.format(
+        issue_count, len(jira.updated_index[PROJECT]), latency * 1000))
+    print('{:<20} {:>8} {:>9} {:>10} {:>9} {:>9} {:>10}'.format(
+        'scenario', 'issues', 'seconds', 'issues/s', 'rss MB', 'requests', 'vs last'))
+    try:
+        for name in scenarios:
+            options, failures, metrics = run_scenario(jira, base_url, name)
+            last = previous.get((name, issue_count, latency))
+            change = ''
+            if last:
+                change = '{:+.1%}'.format(metrics['issues_per_sec'] / last['metrics']['issues_per_sec'] - 1)
+            print('{:<20} {:>8} {:>9.2f} {:>10.0f} {:>9.1f} {:>9} {:>10}'.format(
+                name, '{}/{}'.format(metrics['issues'], metrics['expected_issues']), metrics['seconds'],
+                metrics['issues_per_sec'], metrics['peak_rss_mb'], metrics['server']['requests'], change))
+            if record:
+                os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+                with open(RESULTS_PATH, 'a') as results_file:
+                    results_file.write(json.dumps({
+                        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                        'commit': commit,
+                        'scenario': name,
+                        'issue_count': issue_count,
+                        'latency': latency,
+                        'options': options,
+                        'failures': failures,
+                        'metrics': metrics,
+                    }, sort_keys=True) + '\n')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--issues', type=int, default=5000, help='Highest issue number in the fake project')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--latency', type=float, default=0.002, help='Seconds the server waits per request')
+    parser.add_argument('--gap-rate', type=float, default=0.02, help='Fraction of issue numbers that are missing')
+    parser.add_argument('--no-record', action='store_true', help="Don't append the results to " + RESULTS_PATH)
+    args = parser.parse_args()
+    main(args.issues, args.scenarios, args.latency, args.gap_rate, not args.no_record)
@@ -0,0 +1,70 @@
+"""
+Benchmark for the changelog event store: writes synthetic status histories, then times a full-history
+time-in-status and cycle-time pass and a single-issue lookup.
+
+    python benchmarks/bench_history.py [-n 100000] [--transitions 8]
+"""
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy
+import pandas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import history  # noqa: E402
+
+STATUSES = ['Open', 'In Progress', 'Review', 'Done']
+
+
+def make_changelog(issue_count, transitions, rand):
+    keys = numpy.repeat(['FARM-{}'.format(i) for i in range(1, issue_count + 1)], transitions)
+    created = pandas.Timestamp('2015-01-01', tz='UTC') + pandas.to_timedelta(
+        numpy.arange(issue_count) * 3600, unit='s')
+    steps = pandas.to_timedelta(rand.randint(60, 5 * 86400, issue_count * transitions), unit='s')
+    offsets = pandas.Series(steps).groupby(numpy.repeat(numpy.arange(issue_count), transitions)).cumsum()
+    status_codes = numpy.tile(numpy.arange(transitions), issue_count) % len(STATUSES)
+    changelog = history.normalize_events(pandas.DataFrame({
+        'key': keys,
+        'timestamp': numpy.repeat(created, transitions) + offsets.to_numpy(),
+        'author': rand.choice(['alice', 'bob', 'carol'], len(keys)),
+        'field': 'status',
+        'from': numpy.array(STATUSES)[status_codes],
+        'to': numpy.array(STATUSES)[(status_codes + 1) % len(STATUSES)],
+    }), history.CHANGELOG)
+    issues = pandas.DataFrame({
+        'created_datetime': created,
+        'status': 'Open',
+    }, index=['FARM-{}'.format(i) for i in range(1, issue_count + 1)])
+    return changelog, issues
+
+
+def time_it(label, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    print('{:<24} {:>8.3f}s'.format(label, time.perf_counter() - started))
+    return result
+
+
+def main(issue_count, transitions):
+    changelog, issues = make_changelog(issue_count, transitions, numpy.random.RandomState(0))
+    print('{} issues, {} status events'.format(issue_count, len(changelog)))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = history.EventStore(os.path.join(temp_dir, 'events_store'))
+        time_it('save', store.save, issues.index.tolist(), changelog, changelog.iloc[:0].reindex(
+            columns=history.TABLE_COLUMNS[history.WORKLOG]))
+        loaded = time_it('load', store.load, history.CHANGELOG)
+        time_it('time in status', history.time_in_status, loaded, issues)
+        time_it('cycle time', history.cycle_time, loaded)
+        time_it('single issue lookup', store.load, history.CHANGELOG, keys=['FARM-{}'.format(issue_count // 2)])
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--issues', type=int, default=100000, help='Number of synthetic issues')
+    parser.add_argument('--transitions', type=int, default=8, help='Status changes per issue')
+    args = parser.parse_args()
+    main(args.issues, args.transitions)
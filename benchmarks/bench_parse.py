@@ -0,0 +1,98 @@
+"""
+Micro-benchmark for issue parsing: the original per-issue get_leaf_value walk and regex sprint parsing
+against the compiled extractors, memoized sprint parser and the column-major batch API.
+
+    python benchmarks/bench_parse.py [-n 100000]
+"""
+import os
+import random
+import re
+import sys
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import api  # noqa: E402
+from constants import EXCLUDED_ISSUE_TYPES, FIELD_MAP, HEADER  # noqa: E402
+
+STATUSES = ['To Do', 'In Progress', 'Code Review', 'Done']
+ISSUE_TYPES = ['Bug', 'Task', 'Sub-task', 'Story']
+PEOPLE = ['alice', 'bob', 'carol', 'dave', 'erin']
+# HEADER before sprint dates were added; the legacy parser could only pull sprint names
+LEGACY_HEADER = [field for field in HEADER if field not in ('sprint_start_datetime', 'sprint_end_datetime')]
+SPRINT = (
+    'com.atlassian.greenhopper.service.sprint.Sprint@5a1b0835[id={0},rapidViewId=37,state=CLOSED,'
+    'name=Sprint {0},goal=,startDate=2017-10-23T14:09:09.683Z,endDate=2017-10-30T14:09:00.000Z,'
+    'completeDate=2017-10-30T17:05:27.549Z,sequence={0}]'
+)
+
+
+def make_issue(issue_num, rand):
+    sprint_num = issue_num // 200
+    return {
+        'key': 'FARM-{}'.format(issue_num),
+        'fields': {
+            'summary': 'Synthetic issue {}'.format(issue_num),
+            'issuetype': {'name': rand.choice(ISSUE_TYPES), 'iconUrl': 'https://example.invalid/icon.png'},
+            'components': [{'name': 'api', 'id': '1'}, {'name': 'web', 'id': '2'}][:rand.randint(0, 2)],
+            'fixVersions': [{'name': '1.{}'.format(sprint_num), 'id': '3'}],
+            'reporter': {'name': rand.choice(PEOPLE), 'displayName': 'Someone'},
+            'assignee': {'name': rand.choice(PEOPLE), 'displayName': 'Someone'} if rand.random() > 0.2 else None,
+            'created': '2017-10-23T14:09:09.683-0500',
+            'updated': '2017-10-24T14:09:09.683-0500',
+            'resolutiondate': None,
+            'status': {'name': rand.choice(STATUSES)},
+            'labels': ['prodsup'] if rand.random() > 0.7 else [],
+            'timetracking': {'originalEstimateSeconds': 3600, 'timeSpentSeconds': rand.randint(0, 7200)},
+            'customfield_10004': [SPRINT.format(sprint_num), SPRINT.format(sprint_num + 1)],
+            'description': 'Lorem ipsum ' * 20,
+        },
+    }
+
+
+def get_sprint_names_legacy(issue):
+    """The original get_sprint_info(issue, 'name'): an uncompiled, greedy regex per sprint string"""
+    try:
+        sprints_string = issue['fields']['customfield_10004']
+    except KeyError:
+        return None
+    return ','.join([re.search(r'name=(.+),goal=', sprint).group(1) for sprint in sprints_string])
+
+
+def parse_legacy(issues):
+    """The parsing path before compiled extractors: one generic walk per issue per column"""
+    rows = []
+    for issue in issues:
+        row_dict = {key: api.get_leaf_value(issue, FIELD_MAP[key]) for key in LEGACY_HEADER if key != 'sprints'}
+        row_dict['sprints'] = get_sprint_names_legacy(issue)
+        if row_dict['issue_type'] not in EXCLUDED_ISSUE_TYPES:
+            rows.append([row_dict[field] for field in LEGACY_HEADER])
+    return rows
+
+
+def parse_compiled(issues):
+    return api.parse_records([api.compact_issue(issue) for issue in issues])
+
+
+def time_it(func, issues):
+    started = time.perf_counter()
+    func(issues)
+    return time.perf_counter() - started
+
+
+def main(issue_count):
+    rand = random.Random(0)
+    issues = [make_issue(issue_num, rand) for issue_num in range(1, issue_count + 1)]
+    results = {}
+    for name, func in (('legacy', parse_legacy), ('compiled', parse_compiled)):
+        elapsed = time_it(func, issues)
+        results[name] = issue_count / elapsed
+        print('{:<10} {:>10.0f} issues/sec ({:.2f}s)'.format(name, results[name], elapsed))
+    print('speedup    {:>10.2f}x'.format(results['compiled'] / results['legacy']))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--issues', type=int, default=100000, help='Number of synthetic issues')
+    main(parser.parse_args().issues)
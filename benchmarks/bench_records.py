@@ -0,0 +1,72 @@
+"""
+Memory per in-flight issue: decoded JSON payloads (as the crawl receives them from benchmarks/fake_jira.py)
+against the IssueRecords the pipeline queues instead, with and without changelog and worklog events, plus
+the time to compact and parse them.
+
+    python benchmarks/bench_records.py [-n 20000] [--history]
+"""
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+
+import api  # noqa: E402
+import history  # noqa: E402
+from fake_jira import FakeJira  # noqa: E402
+
+PROJECT = 'FARM'
+
+
+def measure(label, build, count):
+    """
+    Builds a list of objects and reports how much memory it holds on to
+    :return: the objects
+    """
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    objects = build()
+    seconds = time.perf_counter() - started
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('{:<28} {:>10.0f} bytes/issue {:>10.2f}s'.format(label, size / count, seconds))
+    return objects, size
+
+
+def main(issue_count, with_history):
+    fake = FakeJira({PROJECT: issue_count}, gap_rate=0.0)
+    # encoded as the server sends them, so decoding creates fresh strings as in a real crawl
+    encoded = [json.dumps(fake.issue(PROJECT, num, expand_changelog=with_history))
+               for num in range(1, issue_count + 1)]
+    print('{} issues, {:.0f} bytes of JSON per issue'.format(issue_count, sum(map(len, encoded)) / issue_count))
+    extract = history.extract_events if with_history else None
+
+    payloads, payload_size = measure('JSON payloads', lambda: [json.loads(text) for text in encoded], issue_count)
+    del payloads
+    # each payload is dropped as soon as it is compacted, as in the pipeline's fetch thread
+    records, record_size = measure(
+        'IssueRecords', lambda: [api.compact_issue(json.loads(text), extract) for text in encoded], issue_count)
+    print('{:<28} {:>10.1f}x smaller'.format('', payload_size / record_size))
+
+    started = time.perf_counter()
+    api.parse_records(records).to_data_frame()
+    print('{:<28} {:>10.0f} issues/sec'.format('parse records', issue_count / (time.perf_counter() - started)))
+    payloads = [json.loads(text) for text in encoded]
+    started = time.perf_counter()
+    api.parse_records([api.compact_issue(payload) for payload in payloads]).to_data_frame()
+    print('{:<28} {:>10.0f} issues/sec'.format('parse payloads', issue_count / (time.perf_counter() - started)))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--issues', type=int, default=20000, help='Number of synthetic issues')
+    parser.add_argument('--history', action='store_true', help='Include changelogs and keep events on the records')
+    args = parser.parse_args()
+    main(args.issues, args.history)
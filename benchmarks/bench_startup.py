@@ -0,0 +1,126 @@
+"""
+Command line startup time. Times `main.py <command> --help` for every command and, for fetch and sync, how long
+after launching `main.py` its first request reaches the local fake JIRA (benchmarks/fake_jira.py), against
+TARGET_MS. The bare interpreter is timed too, since no command can start faster than it. Each run is appended
+to benchmarks/results/startup.jsonl.
+
+    python benchmarks/bench_startup.py [-n 5] [--no-record]
+"""
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, os.pardir))
+
+from bench_crawl import git_commit  # noqa: E402
+from fake_jira import FakeJira, start_server  # noqa: E402
+from main import COMMANDS  # noqa: E402
+
+MAIN_PATH = os.path.join(BENCH_DIR, os.pardir, 'main.py')
+RESULTS_PATH = os.path.join(BENCH_DIR, 'results', 'startup.jsonl')
+PROJECT = 'FARM'
+ISSUE_COUNT = 200
+# budget for launching fetch or sync until their first request goes out
+TARGET_MS = 200
+# crawl arguments; fetch is given an end issue so it finishes quickly, sync reads state.json
+CRAWLS = {
+    'fetch': ['fetch', '--bulk', '--end-issue', str(ISSUE_COUNT)],
+    'sync': ['sync'],
+}
+
+
+def time_command(argv):
+    """
+    :return: wall seconds to run argv to completion
+    """
+    started = time.perf_counter()
+    subprocess.run(argv, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def time_first_request(jira, base_url, argv):
+    """
+    Runs main.py in a fresh directory with instances.json pointing at the fake JIRA
+    :return: (seconds until the first request, seconds until main.py exited)
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(os.path.join(temp_dir, 'instances.json'), 'w') as instances_file:
+            json.dump([{'base_url': base_url, 'projects': [PROJECT], 'rate_limit': 100000}], instances_file)
+        # sync picks up the last few updated issues
+        last_updated = jira.updated_index[PROJECT][-10][0]
+        with open(os.path.join(temp_dir, 'state.json'), 'w') as state_file:
+            json.dump({'last_updated': last_updated.isoformat()}, state_file)
+        jira.first_request = None
+        started = time.perf_counter()
+        # a new session has no terminal, so the credential prompts read the piped input
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(MAIN_PATH)] + argv,
+            input=b'bench\nbench\n',
+            cwd=temp_dir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        finished = time.perf_counter()
+    if process.returncode:
+        raise RuntimeError('{} failed:\n{}'.format(' '.join(argv), process.stderr.decode()))
+    return jira.first_request - started, finished - started
+
+
+def summarize(samples):
+    return {'median_ms': round(statistics.median(samples) * 1000, 1), 'min_ms': round(min(samples) * 1000, 1)}
+
+
+def main(runs, record):
+    jira = FakeJira({PROJECT: ISSUE_COUNT})
+    server = start_server(jira)
+    base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+    results = {}
+    try:
+        results['python -c pass'] = summarize([time_command([sys.executable, '-c', 'pass']) for _ in range(runs)])
+        for command in [None] + list(COMMANDS):
+            argv = [sys.executable, MAIN_PATH] + ([command] if command else []) + ['--help']
+            name = ' '.join(['main.py'] + argv[2:])
+            results[name] = summarize([time_command(argv) for _ in range(runs)])
+        for command, argv in CRAWLS.items():
+            timings = [time_first_request(jira, base_url, argv) for _ in range(runs)]
+            results['{} first request'.format(command)] = summarize([first for first, _ in timings])
+            results['{} total'.format(command)] = summarize([total for _, total in timings])
+    finally:
+        server.shutdown()
+
+    interpreter_ms = results['python -c pass']['median_ms']
+    print('{:<30} {:>10} {:>10} {:>14} {:>8}'.format('', 'median ms', 'min ms', 'over python', 'target'))
+    for name, timing in results.items():
+        target = ''
+        if name.endswith('first request'):
+            target = 'ok' if timing['median_ms'] < TARGET_MS else 'over'
+        print('{:<30} {:>10.1f} {:>10.1f} {:>14.1f} {:>8}'.format(
+            name, timing['median_ms'], timing['min_ms'], timing['median_ms'] - interpreter_ms, target))
+
+    if record:
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, 'a') as results_file:
+            results_file.write(json.dumps({
+                'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'commit': git_commit(),
+                'runs': runs,
+                'target_ms': TARGET_MS,
+                'results': results,
+            }, sort_keys=True) + '\n')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--runs', type=int, default=5, help='Times each command is run')
+    parser.add_argument('--no-record', action='store_true', help="Don't append the results to " + RESULTS_PATH)
+    args = parser.parse_args()
+    main(args.runs, not args.no_record)
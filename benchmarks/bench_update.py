@@ -0,0 +1,91 @@
+"""
+Benchmark for model training on growing synthetic issue sets: retraining from scratch on the whole history
+(fitted TF-IDF + decision tree, and the hashed SGD model) against an incremental partial_fit update that only
+sees the newly synced rows.
+
+    python benchmarks/bench_update.py [--sizes 10000 20000 40000 80000] [--delta 1000]
+"""
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+import numpy
+import pandas
+from sklearn.tree import DecisionTreeRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from constants import HEADER  # noqa: E402
+from features import FeatureBuilder, HashingFeatureBuilder  # noqa: E402
+from model import IncrementalRegressor, ModelArtifact  # noqa: E402
+
+WORDS = ['login', 'report', 'export', 'sync', 'crash', 'slow', 'api', 'map', 'field', 'upload', 'error', 'ui']
+STATUSES = ['To Do', 'In Progress', 'Code Review', 'Done']
+ISSUE_TYPES = ['Bug', 'Task', 'Story']
+PEOPLE = ['alice', 'bob', 'carol', 'dave', 'erin']
+START = pandas.Timestamp('2017-01-01', tz='UTC')
+
+
+def make_issues(start, count, rand):
+    """
+    Synthetic issue frame with HEADER columns; updated timestamps increase with the issue number
+    """
+    issue_nums = numpy.arange(start, start + count)
+    created = START + pandas.to_timedelta(issue_nums, unit='h')
+    data_frame = pandas.DataFrame({field: None for field in HEADER}, index=issue_nums)
+    data_frame['key'] = ['FARM-{}'.format(issue_num) for issue_num in issue_nums]
+    data_frame['summary'] = [' '.join(rand.choice(WORDS, 4)) for _ in issue_nums]
+    data_frame['issue_type'] = rand.choice(ISSUE_TYPES, count)
+    data_frame['status'] = rand.choice(STATUSES, count)
+    data_frame['reporter'] = rand.choice(PEOPLE, count)
+    data_frame['assignee'] = rand.choice(PEOPLE, count)
+    data_frame['labels'] = numpy.where(rand.random(count) > 0.7, 'prodsup', None)
+    data_frame['sprints'] = ['Sprint {}'.format(issue_num // 200) for issue_num in issue_nums]
+    data_frame['created_datetime'] = created
+    data_frame['updated_datetime'] = created + pandas.Timedelta(days=1)
+    data_frame['original_estimate'] = rand.choice([3600, 7200, 14400, 28800], count).astype(float)
+    data_frame['time_spent'] = data_frame['original_estimate'] * rand.uniform(0.5, 2.0, count)
+    return data_frame
+
+
+def retrain_tree(data_frame):
+    features = FeatureBuilder()
+    DecisionTreeRegressor(max_depth=8, random_state=100).fit(features.fit_transform(data_frame),
+                                                             data_frame['time_spent'])
+
+
+def retrain_incremental(data_frame):
+    ModelArtifact(HashingFeatureBuilder(), IncrementalRegressor()).update(data_frame)
+
+
+def time_it(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def main(sizes, delta):
+    rand = numpy.random.RandomState(0)
+    history = make_issues(0, max(sizes) + delta, rand)
+    print('{:>8} {:>14} {:>14} {:>14} {:>9}'.format('rows', 'retrain tree', 'retrain sgd', 'update sgd', 'speedup'))
+    for size in sizes:
+        existing = history.iloc[:size]
+        updated = history.iloc[:size + delta]
+        model = ModelArtifact(HashingFeatureBuilder(), IncrementalRegressor())
+        model.update(existing)
+
+        tree = time_it(retrain_tree, updated)
+        sgd = time_it(retrain_incremental, updated)
+        update = time_it(model.update, updated)
+        print('{:>8} {:>13.2f}s {:>13.2f}s {:>13.3f}s {:>8.1f}x'.format(
+            size, tree, sgd, update, min(tree, sgd) / update))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 20000, 40000, 80000],
+                        help='Number of issues already trained on')
+    parser.add_argument('--delta', type=int, default=1000, help='Number of newly synced issues per update')
+    args = parser.parse_args()
+    main(args.sizes, args.delta)
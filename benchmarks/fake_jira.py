@@ -0,0 +1,384 @@
+"""
+Local stand-in for the JIRA REST endpoints the crawler uses: single issues, JQL search, changelog and worklog
+pages. Issues are synthesized deterministically from (seed, project, issue number), so any project size costs
+only a small index in memory. Issue numbers have gaps (deleted or moved issues answer 404) and every request
+can be delayed, throttled (429 with Retry-After) or failed (503).
+
+    python benchmarks/fake_jira.py --projects FARM=50000 SB=2000 --gap-rate 0.02 --latency 0.005 --port 8080
+"""
+import datetime
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ISSUE_TYPES = ['Bug', 'Task', 'Sub-task', 'Bug', 'Task', 'Story', 'Epic']
+STATUSES = ['Open', 'In Progress', 'Review', 'Done']
+PRIORITIES = ['Blocker', 'Critical', 'Major', 'Minor']
+COMPONENTS = ['api', 'web', 'ios', 'android', 'data', 'infra']
+LABELS = ['prodsup', 'totalpkg', 'ui', 'backend', 'tech-debt', 'customer']
+PEOPLE = ['alice', 'bob', 'carol', 'dave', 'erin', 'frank', 'grace', 'heidi']
+ESTIMATES = [1800, 3600, 7200, 14400, 28800]
+SPRINT_DAYS = 14
+# created timestamps advance about this much per issue number
+ISSUE_INTERVAL = datetime.timedelta(hours=3)
+EPOCH = datetime.datetime(2015, 1, 5, 9, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=-5)))
+EMBEDDED_HISTORIES = 100
+EMBEDDED_WORKLOGS = 20
+JQL_CLAUSES = {
+    'project': re.compile(r'project\s*=\s*"?(\w+)"?', re.I),
+    'key_min': re.compile(r'key\s*>=\s*(\w+)-(\d+)', re.I),
+    'key_max': re.compile(r'key\s*<=\s*(\w+)-(\d+)', re.I),
+    'keys': re.compile(r'key\s+in\s*\(([^)]*)\)', re.I),
+    'updated': re.compile(r'updated\s*>=\s*"([^"]+)"', re.I),
+    'order': re.compile(r'ORDER\s+BY\s+(key|updated)\s*(ASC|DESC)?\s*$', re.I),
+}
+
+
+class FakeJira(object):
+    """
+    Synthetic JIRA data plus the knobs for latency and failures
+    """
+    def __init__(self, projects, seed=0, gap_rate=0.02, latency=0.0, jitter=0.0, throttle_rate=0.0,
+                 error_rate=0.0, retry_after=0.1):
+        """
+        :param projects: dict of project key to highest issue number
+        :param seed: seed for the synthetic data and injected failures
+        :param gap_rate: fraction of issue numbers that don't exist
+        :param latency: seconds added to every response
+        :param jitter: up to this many extra seconds added at random
+        :param throttle_rate: fraction of requests answered 429
+        :param error_rate: fraction of requests answered 503
+        :param retry_after: Retry-After seconds sent with 429s
+        """
+        self.projects = projects
+        self.seed = seed
+        self.gap_rate = gap_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'bytes': 0, 'throttled': 0, 'errors': 0, 'not_found': 0}
+        # time.perf_counter() of the first request since this was last set to None, for startup timing
+        self.first_request = None
+        # (updated, issue number) of every existing issue, for updated >= searches
+        self.updated_index = {
+            project: sorted((self.updated(project, num), num) for num in range(1, count + 1)
+                            if self.exists(project, num))
+            for project, count in projects.items()
+        }
+
+    def issue_random(self, project, num):
+        return random.Random('{}:{}:{}'.format(self.seed, project, num))
+
+    def exists(self, project, num):
+        return 1 <= num <= self.projects.get(project, 0) and self.issue_random(project, num).random() >= self.gap_rate
+
+    def created(self, num):
+        return EPOCH + ISSUE_INTERVAL * num
+
+    def updated(self, project, num):
+        rand = self.issue_random(project, num)
+        rand.random()
+        return self.created(num) + datetime.timedelta(hours=rand.randint(1, 24 * 60))
+
+    def issue(self, project, num, fields=None, expand_changelog=False, worklog_limit=EMBEDDED_WORKLOGS):
+        """
+        Builds an issue payload
+        :param fields: field names to include, or None for all
+        :param expand_changelog: embed the changelog like expand=changelog
+        :param worklog_limit: worklogs embedded in the worklog field, None for all of them
+        :return: issue JSON
+        """
+        rand = self.issue_random(project, num)
+        rand.random()
+        updated = self.created(num) + datetime.timedelta(hours=rand.randint(1, 24 * 60))
+        created = self.created(num)
+        status = rand.choice(STATUSES)
+        resolved = updated if status == 'Done' else None
+        estimate = rand.choice(ESTIMATES) if rand.random() < 0.7 else None
+        time_spent = int(estimate * rand.uniform(0.3, 2.5)) if estimate and rand.random() < 0.8 else None
+        remaining = max(0, estimate - time_spent) if estimate and time_spent else estimate
+        sprint_num = (created - EPOCH).days // SPRINT_DAYS + 1
+        sprint_nums = [sprint_num, sprint_num + 1] if rand.random() < 0.2 else [sprint_num]
+        worklog_count = rand.choice([0, 0, 1, 2, 3, 25]) if time_spent else 0
+        all_fields = {
+            'summary': 'Synthetic {} issue {} about {}'.format(project, num, rand.choice(COMPONENTS)),
+            'issuetype': {'name': rand.choice(ISSUE_TYPES)},
+            'components': [{'name': name} for name in rand.sample(COMPONENTS, rand.randint(0, 2))],
+            'fixVersions': [{'name': '{}.{}'.format(1 + num // 5000, num // 500 % 10)}] if rand.random() < 0.5 else [],
+            'reporter': {'name': rand.choice(PEOPLE)},
+            'assignee': {'name': rand.choice(PEOPLE)} if rand.random() < 0.9 else None,
+            'created': format_datetime(created),
+            'updated': format_datetime(updated),
+            'resolutiondate': format_datetime(resolved) if resolved else None,
+            'status': {'name': status},
+            'labels': rand.sample(LABELS, rand.randint(0, 2)),
+            'timetracking': {
+                key: value for key, value in (
+                    ('originalEstimateSeconds', estimate),
+                    ('remainingEstimateSeconds', remaining),
+                    ('timeSpentSeconds', time_spent),
+                ) if value is not None
+            },
+            'customfield_10004': [sprint_string(project, sprint) for sprint in sprint_nums] if rand.random() < 0.85
+            else None,
+            'description': 'Steps to reproduce:\n' + '\n'.join('{}. step'.format(i) for i in range(rand.randint(1, 8))),
+            'worklog': embedded(self.worklogs(project, num, worklog_count, time_spent), 'worklogs', worklog_limit),
+            'priority': {'name': rand.choice(PRIORITIES)},
+            # Flagged and Rank, as constants.FLAGGED_FIELD and RANK_FIELD
+            'customfield_10021': [{'id': '10000', 'value': 'Impediment'}] if rand.random() < 0.05 else None,
+            'customfield_10019': '0|i{:05x}:'.format(num),
+            'customfield_10614': {'id': '18', 'value': 'Production Support'} if rand.random() < 0.1 else None,
+        }
+        issue = {
+            'id': str(num),
+            'key': '{}-{}'.format(project, num),
+            'fields': {name: value for name, value in all_fields.items() if fields is None or name in fields},
+        }
+        if expand_changelog:
+            issue['changelog'] = embedded(self.histories(project, num), 'histories', EMBEDDED_HISTORIES)
+        return issue
+
+    def all_worklogs(self, project, num):
+        return self.issue(project, num, fields={'worklog'}, worklog_limit=None)['fields']['worklog']['worklogs']
+
+    def histories(self, project, num):
+        rand = self.issue_random(project, num)
+        created = self.created(num)
+        histories = []
+        for step, (from_status, to_status) in enumerate(zip(STATUSES, STATUSES[1:])):
+            if rand.random() < 0.3:
+                break
+            histories.append({
+                'id': str(num * 10 + step),
+                'author': {'name': rand.choice(PEOPLE)},
+                'created': format_datetime(created + datetime.timedelta(hours=step * rand.randint(1, 48) + 1)),
+                'items': [{'field': 'status', 'fromString': from_status, 'toString': to_status}],
+            })
+        return histories
+
+    def worklogs(self, project, num, count, time_spent):
+        rand = self.issue_random(project, num)
+        created = self.created(num)
+        return [{
+            'id': '{}{:03d}'.format(num, i),
+            'author': {'name': rand.choice(PEOPLE)},
+            'started': format_datetime(created + datetime.timedelta(hours=i + 1)),
+            'timeSpentSeconds': max(60, (time_spent or 0) // max(count, 1)),
+        } for i in range(count)]
+
+    def search(self, jql):
+        """
+        Evaluates the JQL shapes JirApi sends
+        :return: list of (project, issue number) in result order
+        :raises ValueError: for any other JQL
+        """
+        clauses = {name: pattern.search(jql) for name, pattern in JQL_CLAUSES.items()}
+        order = clauses['order']
+        if clauses['keys']:
+            keys = [key.strip().rsplit('-', 1) for key in clauses['keys'].group(1).split(',') if key.strip()]
+            matches = [(project, int(num)) for project, num in keys if self.exists(project, int(num))]
+        elif clauses['project']:
+            project = clauses['project'].group(1)
+            if project not in self.projects:
+                raise ValueError("The value '{}' does not exist for the field 'project'.".format(project))
+            low = int(clauses['key_min'].group(2)) if clauses['key_min'] else 1
+            high = int(clauses['key_max'].group(2)) if clauses['key_max'] else self.projects[project]
+            index = self.updated_index[project]
+            if clauses['updated']:
+                since = datetime.datetime.strptime(clauses['updated'].group(1), '%Y/%m/%d %H:%M').replace(
+                    tzinfo=datetime.timezone.utc)
+                index = [(updated, num) for updated, num in index if updated >= since]
+            if order and order.group(1).lower() == 'updated':
+                nums = [num for _, num in index]
+            else:
+                nums = sorted(num for _, num in index)
+            matches = [(project, num) for num in nums if low <= num <= high]
+        else:
+            raise ValueError('Unsupported JQL: {}'.format(jql))
+        if order and (order.group(2) or 'ASC').upper() == 'DESC':
+            matches.reverse()
+        return matches
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def inject(self):
+        """
+        Sleeps for the configured latency and picks a failure, if any
+        :return: 429, 503 or None
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.first_request is None:
+                self.first_request = time.perf_counter()
+            roll = self.random.random()
+            delay = self.latency + self.random.random() * self.jitter
+        if delay:
+            time.sleep(delay)
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    jira = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path == '/_stats':
+            return self.respond(200, dict(self.jira.stats), count=False)
+        failure = self.jira.inject()
+        if failure == 429:
+            self.jira.count('throttled')
+            return self.respond(429, {'errorMessages': ['Rate limit exceeded']},
+                                headers={'Retry-After': str(self.jira.retry_after)})
+        if failure == 503:
+            self.jira.count('errors')
+            return self.respond(503, {'errorMessages': ['Service unavailable']})
+
+        issue_match = re.match(r'^/rest/api/2/issue/(\w+)-(\d+)(/changelog|/worklog)?$', url.path)
+        if url.path == '/rest/api/2/search':
+            return self.search(params)
+        if issue_match:
+            project, num, resource = issue_match.group(1), int(issue_match.group(2)), issue_match.group(3)
+            if not self.jira.exists(project, num):
+                self.jira.count('not_found')
+                return self.respond(404, {'errorMessages': [
+                    'Issue does not exist or you do not have permission to see it.']})
+            if resource:
+                return self.page(project, num, resource, params)
+            expand = 'changelog' in params.get('expand', '').split(',')
+            return self.respond(200, self.jira.issue(project, num, expand_changelog=expand))
+        self.respond(404, {'errorMessages': ['No endpoint {}'.format(url.path)]})
+
+    def search(self, params):
+        try:
+            matches = self.jira.search(params.get('jql', ''))
+        except ValueError as e:
+            return self.respond(400, {'errorMessages': [str(e)]})
+        start_at = int(params.get('startAt', 0))
+        max_results = min(int(params.get('maxResults', 50)), 1000)
+        fields = params.get('fields')
+        fields = None if fields in (None, '*all', 'all') else set(fields.split(','))
+        expand = 'changelog' in params.get('expand', '').split(',')
+        issues = [self.jira.issue(project, num, fields, expand)
+                  for project, num in matches[start_at:start_at + max_results]]
+        self.respond(200, {'startAt': start_at, 'maxResults': max_results, 'total': len(matches), 'issues': issues})
+
+    def page(self, project, num, resource, params):
+        start_at = int(params.get('startAt', 0))
+        max_results = int(params.get('maxResults', 100))
+        if resource == '/changelog':
+            items = self.jira.histories(project, num)
+            items_key = 'values'
+        else:
+            items = self.jira.all_worklogs(project, num)
+            items_key = 'worklogs'
+        page = items[start_at:start_at + max_results]
+        self.respond(200, {
+            'startAt': start_at,
+            'maxResults': max_results,
+            'total': len(items),
+            'isLast': start_at + len(page) >= len(items),
+            items_key: page,
+        })
+
+    def respond(self, status, body, headers=None, count=True):
+        content = json.dumps(body).encode('utf-8')
+        if count:
+            self.jira.count('bytes', len(content))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def embedded(items, items_key, limit):
+    items_page = items[:limit]
+    return {'startAt': 0, 'maxResults': limit or len(items), 'total': len(items), items_key: items_page}
+
+
+def format_datetime(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000%z')
+
+
+def sprint_string(project, sprint_num):
+    start = EPOCH + datetime.timedelta(days=(sprint_num - 1) * SPRINT_DAYS)
+    end = start + datetime.timedelta(days=SPRINT_DAYS)
+    return (
+        'com.atlassian.greenhopper.service.sprint.Sprint@{:x}[id={},rapidViewId=12,state=CLOSED,'
+        'name={} Sprint {}, v{},goal=,startDate={},endDate={},completeDate={},sequence={}]'
+    ).format(
+        zlib.crc32('{}:{}'.format(project, sprint_num).encode()), sprint_num, project, sprint_num, 1 + sprint_num % 3,
+        start.strftime('%Y-%m-%dT%H:%M:%S.000Z'), end.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        end.strftime('%Y-%m-%dT%H:%M:%S.000Z'), sprint_num,
+    )
+
+
+def start_server(jira, port=0):
+    """
+    Serves a FakeJira on a background thread
+    :param jira: FakeJira
+    :param port: port to listen on, 0 for any free port
+    :return: ThreadingHTTPServer; its base url is http://127.0.0.1:<server.server_port>
+    """
+    handler = type('Handler', (FakeJiraHandler,), {'jira': jira})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_projects(values):
+    projects = {}
+    for value in values:
+        project, _, count = value.partition('=')
+        projects[project] = int(count)
+    return projects
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--projects', nargs='+', default=['FARM=50000'], help='PROJECT=HIGHEST_ISSUE_NUMBER')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--gap-rate', type=float, default=0.02)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=0.1)
+    args = parser.parse_args()
+    fake = FakeJira(
+        parse_projects(args.projects), seed=args.seed, gap_rate=args.gap_rate, latency=args.latency,
+        jitter=args.jitter, throttle_rate=args.throttle_rate, error_rate=args.error_rate, retry_after=args.retry_after,
+    )
+    server = start_server(fake, args.port)
+    print('Serving fake JIRA on http://127.0.0.1:{}'.format(server.server_port))
+    sys.stdout.flush()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
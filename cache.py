@@ -0,0 +1,177 @@
+import collections
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+CACHE_PATH = 'issue_cache'
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class IssueCache(object):
+    """
+    Local cache of raw issue JSON. Payloads are gzipped and stored content-addressed under
+    objects/<sha256[:2]>/<sha256>.json.gz; index.json maps each issue key to the `updated` timestamp and
+    digest of its cached payload. When the cache grows past max_bytes the least recently used issues
+    are evicted.
+    """
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(path, 'index.json')
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.index_path) as index_file:
+                self.index = json.load(index_file)
+        except FileNotFoundError:
+            self.index = {}
+        self.size = sum(entry['size'] for entry in self.index.values())
+        self.refs = collections.Counter(entry['digest'] for entry in self.index.values())
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, issue_key, updated=None):
+        """
+        Returns the cached payload for an issue
+        :param issue_key: JIRA issue key (e.g. EX-123)
+        :param updated: JIRA updated timestamp the payload must match, or None to accept any version
+        :return: issue JSON or None on a miss
+        """
+        with self.lock:
+            entry = self.index.get(issue_key)
+            if entry is None or (updated is not None and entry['updated'] != updated):
+                self.misses += 1
+                return None
+            entry['accessed'] = time.time()
+            self.hits += 1
+        issue = self.read_object(entry['digest'])
+        if issue is None:
+            with self.lock:
+                self.hits -= 1
+                self.misses += 1
+            self.drop(issue_key, entry)
+        return issue
+
+    def put(self, issue):
+        """
+        Caches an issue payload
+        :param issue: issue JSON from JirApi
+        """
+        content = gzip.compress(json.dumps(issue, sort_keys=True).encode('utf-8'), mtime=0)
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = self.object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            write_atomic(object_path, content)
+
+        updated = issue.get('fields', {}).get('updated')
+        with self.lock:
+            old_entry = self.index.get(issue['key'])
+            self.index[issue['key']] = {
+                'updated': updated,
+                'digest': digest,
+                'size': len(content),
+                'accessed': time.time(),
+            }
+            self.size += len(content)
+            self.refs[digest] += 1
+            if old_entry:
+                self.release(old_entry)
+            self.evict()
+
+    def issues(self):
+        """
+        Generator of every cached payload in issue key order, for reparsing offline. Entries whose object is
+        missing or unreadable are dropped from the index and skipped.
+        :return: yields issue JSON
+        """
+        with self.lock:
+            entries = sorted(self.index.items(), key=lambda item: split_issue_key(item[0]))
+        for issue_key, entry in entries:
+            issue = self.read_object(entry['digest'])
+            if issue is None:
+                self.drop(issue_key, entry)
+                continue
+            yield issue
+
+    def flush(self):
+        """
+        Persists the index
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with self.lock:
+            content = json.dumps(self.index).encode('utf-8')
+        write_atomic(self.index_path, content)
+
+    def drop(self, issue_key, entry):
+        """
+        Removes an issue whose cached object can't be read, unless it was replaced in the meantime
+        :param issue_key: JIRA issue key (e.g. EX-123)
+        :param entry: index entry the object was read for
+        """
+        with self.lock:
+            if self.index.get(issue_key) is entry:
+                del self.index[issue_key]
+                self.release(entry)
+
+    def evict(self):
+        """
+        Drops least recently used issues once the cache is over max_bytes, down to 90% of max_bytes so
+        eviction doesn't run on every put. Caller must hold the lock.
+        """
+        if self.size <= self.max_bytes:
+            return
+        for issue_key, entry in sorted(self.index.items(), key=lambda item: item[1]['accessed']):
+            if self.size <= self.max_bytes * 0.9:
+                break
+            del self.index[issue_key]
+            self.release(entry)
+
+    def release(self, entry):
+        """
+        Accounts for an index entry that was removed, deleting its object if nothing references it.
+        Caller must hold the lock.
+        """
+        self.size -= entry['size']
+        self.refs[entry['digest']] -= 1
+        if self.refs[entry['digest']] <= 0:
+            del self.refs[entry['digest']]
+            try:
+                os.remove(self.object_path(entry['digest']))
+            except FileNotFoundError:
+                pass
+
+    def read_object(self, digest):
+        """
+        :return: the issue JSON stored under digest, or None if the object is missing or corrupt
+        """
+        try:
+            with open(self.object_path(digest), 'rb') as object_file:
+                return json.loads(gzip.decompress(object_file.read()).decode('utf-8'))
+        except (OSError, EOFError, ValueError, zlib.error):
+            return None
+
+    def object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[:2], '{}.json.gz'.format(digest))
+
+    def stats(self):
+        with self.lock:
+            return {'issues': len(self.index), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses}
+
+
+def split_issue_key(issue_key):
+    project, _, issue_num = issue_key.rpartition('-')
+    return project, int(issue_num) if issue_num.isdigit() else 0
+
+
+def write_atomic(path, content):
+    with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(os.path.abspath(path)), delete=False) as temp_file:
+        temp_file.write(content)
+    os.replace(temp_file.name, path)
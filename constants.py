@@ -15,8 +15,19 @@ HEADER = [
     'remaining_estimate',
     'time_spent',
     'sprints',
+    'sprint_start_datetime',
+    'sprint_end_datetime',
+    'sprint_states',
+    'priority',
+    'flagged',
+    'rank',
+    'customfield_10614',
 ]
 
+# JIRA Software's Flagged and Rank fields; their ids differ between JIRA instances
+FLAGGED_FIELD = 'customfield_10021'
+RANK_FIELD = 'customfield_10019'
+
 FIELD_MAP = {
     'key': ['key'],
     'summary': ['fields', 'summary'],
@@ -34,10 +45,48 @@ FIELD_MAP = {
     'remaining_estimate': ['fields', 'timetracking', 'remainingEstimateSeconds'],
     'time_spent': ['fields', 'timetracking', 'timeSpentSeconds'],
     'sprints': ['fields', 'customfield_10004'],
+    'sprint_start_datetime': ['fields', 'customfield_10004'],
+    'sprint_end_datetime': ['fields', 'customfield_10004'],
+    'sprint_states': ['fields', 'customfield_10004'],
+    'priority': ['fields', 'priority', 'name'],
+    'flagged': ['fields', FLAGGED_FIELD],
+    'rank': ['fields', RANK_FIELD],
+    # read by the ProductionSupportFilters
+    'customfield_10614': ['fields', 'customfield_10614'],
     'description': ['fields', 'description'],
 }
 
+# Fields requested from the search endpoint; only what FIELD_MAP uses
+SEARCH_FIELDS = sorted({keys[1] for keys in FIELD_MAP.values() if keys[0] == 'fields'})
+
 EXCLUDED_ISSUE_TYPES = [
     'Epic',
     'Story',
 ]
+
+# Defaults and choices shown by the command line, kept here so building its parser imports nothing heavy
+INSTANCES_FILE = 'instances.json'
+MODEL_PATH = 'model.joblib'
+REPORT_DIR = 'report'
+# leaderboard roles, metrics and slice dimension -> list column it is exploded from; 'all' is the unsliced total
+ROLES = ['assignee', 'reporter']
+METRICS = ['resolved_issues', 'time_logged', 'estimate_accuracy', 'bug_fixes']
+DIMENSIONS = {'all': None, 'sprint': 'sprints', 'component': 'components', 'fix_version': 'fix_versions'}
+WORKLOG_METRIC = 'worklog_hours'
+
+
+class ProductionSupportFilters(object):
+
+    all_issues = "project in (FARM) AND (cf[10614] = 18 OR labels in (totalpkg, prodsup)) ORDER BY Rank ASC"
+    high_priority_issues = "project in (FARM) AND (cf[10614] = 18 OR labels in (totalpkg, prodsup)) AND (Flagged is not EMPTY OR priority = Blocker) AND sprint in (openSprints(), futureSprints()) ORDER BY Rank ASC"
+    open_sprints = "project in (FARM, SB, DI, DE) AND (cf[10614] = 18 OR labels in (totalpkg, prodsup)) AND sprint in (openSprints(), futureSprints()) ORDER BY Rank ASC"
+
+
+def get_filters():
+    """
+    :return: dict of ProductionSupportFilters name to JQL
+    """
+    return {
+        name: value for name, value in vars(ProductionSupportFilters).items()
+        if not name.startswith('_') and isinstance(value, str)
+    }
@@ -0,0 +1,103 @@
+import collections
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from api import DEFAULT_BASE_URL, DEFAULT_PROJECT, STATE_FILE, JirApi, RateLimiter, prompt_credentials
+from constants import INSTANCES_FILE
+
+JiraInstance = collections.namedtuple('JiraInstance', ['base_url', 'projects', 'rate_limit'])
+
+
+class ProjectCrawler(object):
+    """
+    Runs one job per configured project, all projects in parallel. Each instance has a single rate budget:
+    the projects on it share one RateLimiter (and one set of credentials), so adding projects to an instance
+    never raises the request rate it sees.
+    """
+    def __init__(self, instances, basic_auth=True):
+        self.instances = instances
+        self.basic_auth = basic_auth
+        self.rate_limiters = {instance.base_url: RateLimiter(rate=instance.rate_limit) for instance in instances}
+        self.credentials = {}
+        if basic_auth:
+            for instance in instances:
+                self.credentials[instance.base_url] = prompt_credentials(instance.base_url)
+
+    def projects(self):
+        return [(instance, project) for instance in self.instances for project in instance.projects]
+
+    def make_jira(self, instance, project, **kwargs):
+        """
+        Creates a client for one project that draws on its instance's shared rate budget
+        :param instance: JiraInstance
+        :param project: project key
+        :param kwargs: other JirApi arguments (start_issue, concurrency, cache, ...)
+        :return: JirApi
+        """
+        return JirApi(
+            basic_auth=self.basic_auth,
+            base_url=instance.base_url,
+            project=project,
+            credentials=self.credentials.get(instance.base_url),
+            rate_limiter=self.rate_limiters[instance.base_url],
+            **kwargs
+        )
+
+    def run(self, job):
+        """
+        Runs job(instance, project) for every project in parallel
+        :param job: callable taking a JiraInstance and a project key
+        :return: dict of project key to the job's result; the first error is raised once every job has finished
+        """
+        projects = self.projects()
+        with ThreadPoolExecutor(max_workers=len(projects)) as executor:
+            futures = [(project, executor.submit(job, instance, project)) for instance, project in projects]
+        results = {}
+        errors = []
+        for project, future in futures:
+            try:
+                results[project] = future.result()
+            except Exception as e:
+                print('{} failed: {}'.format(project, e))
+                errors.append(e)
+        if errors:
+            raise errors[0]
+        return results
+
+
+def load_instances(path=None, rate_limit=20.0):
+    """
+    Reads the instances to crawl, e.g.
+    [{"base_url": "https://farmobile.atlassian.net", "projects": ["FARM", "SB"], "rate_limit": 20}]
+    :param path: JSON config path, or None to use instances.json if present, else the FARM project alone
+    :param rate_limit: requests per second for instances that don't set rate_limit
+    :return: list of JiraInstance
+    """
+    if path is None:
+        if not os.path.exists(INSTANCES_FILE):
+            return [JiraInstance(DEFAULT_BASE_URL, [DEFAULT_PROJECT], rate_limit)]
+        path = INSTANCES_FILE
+    with open(path) as config_file:
+        config = json.load(config_file)
+    instances = [
+        JiraInstance(entry['base_url'].rstrip('/'), list(entry['projects']), float(entry.get('rate_limit', rate_limit)))
+        for entry in config
+    ]
+    projects = [project for instance in instances for project in instance.projects]
+    if not projects:
+        raise ValueError('{} does not list any projects'.format(path))
+    if len(set(projects)) != len(projects):
+        raise ValueError('{} lists a project more than once'.format(path))
+    return instances
+
+
+def get_state_path(project):
+    """
+    Sync state file of a project; the default project keeps the original state.json
+    :param project: project key
+    :return: path of the state file
+    """
+    if project == DEFAULT_PROJECT:
+        return STATE_FILE
+    return 'state.{}.json'.format(project)
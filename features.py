@@ -0,0 +1,142 @@
+import numpy
+import pandas
+import scipy.sparse
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+
+TEXT_COLUMNS = ['summary']
+# comma separated lists and single categorical values: each comma separated value is one token
+LIST_COLUMNS = ['issue_type', 'components', 'fix_versions', 'reporter', 'assignee', 'status', 'labels', 'sprints']
+DATE_COLUMNS = [
+    'created_datetime',
+    'updated_datetime',
+    'resolved_datetime',
+    'sprint_start_datetime',
+    'sprint_end_datetime',
+]
+NUMERIC_COLUMNS = ['original_estimate', 'remaining_estimate']
+EPOCH = pandas.Timestamp('1970-01-01', tz='UTC')
+HASHING_FEATURES = 2 ** 16
+
+
+class FeatureBuilder(object):
+    """
+    Builds one sparse design matrix from an issue data frame: date columns as day ordinals and numeric
+    columns as-is, followed by a TF-IDF block per text column. Every text column has its own vectorizer,
+    fitted once, and the blocks stay in CSR form end to end.
+    """
+    def __init__(self, text_columns=TEXT_COLUMNS, list_columns=LIST_COLUMNS, date_columns=DATE_COLUMNS,
+                 numeric_columns=NUMERIC_COLUMNS, max_features=None):
+        self.text_columns = list(text_columns)
+        self.list_columns = list(list_columns)
+        self.date_columns = list(date_columns)
+        self.numeric_columns = list(numeric_columns)
+        self.max_features = max_features
+        self.vectorizers = {}
+
+    def fit(self, data_frame):
+        """
+        Fits a vectorizer per text column
+        :param data_frame: pandas data frame of issues
+        :return: self
+        """
+        self.vectorizers = {}
+        for column in self.text_columns + self.list_columns:
+            vectorizer = make_vectorizer(column in self.list_columns, self.max_features)
+            try:
+                vectorizer.fit(text_values(data_frame[column]))
+            except ValueError:
+                # empty vocabulary, e.g. a column that is null for every issue
+                vectorizer = None
+            self.vectorizers[column] = vectorizer
+        return self
+
+    def transform(self, data_frame):
+        """
+        Builds the design matrix for issues using the fitted vectorizers
+        :param data_frame: pandas data frame of issues
+        :return: scipy.sparse CSR matrix with one row per issue
+        """
+        blocks = [scipy.sparse.csr_matrix(self.dense_values(data_frame))]
+        for column in self.text_columns + self.list_columns:
+            vectorizer = self.vectorizers[column]
+            if vectorizer is not None:
+                blocks.append(vectorizer.transform(text_values(data_frame[column])))
+        return scipy.sparse.hstack(blocks, format='csr')
+
+    def fit_transform(self, data_frame):
+        return self.fit(data_frame).transform(data_frame)
+
+    def dense_values(self, data_frame):
+        """
+        Date ordinals and numeric columns, with missing values as 0
+        :param data_frame: pandas data frame of issues
+        :return: numpy float array of shape (issues, date + numeric columns)
+        """
+        columns = [datetime_to_ordinal(data_frame[column]) for column in self.date_columns]
+        columns += [pandas.to_numeric(data_frame[column], errors='coerce') for column in self.numeric_columns]
+        if not columns:
+            return numpy.zeros((len(data_frame), 0))
+        return numpy.nan_to_num(numpy.column_stack([numpy.asarray(column, dtype=float) for column in columns]))
+
+    def feature_names(self):
+        names = list(self.date_columns) + list(self.numeric_columns)
+        for column in self.text_columns + self.list_columns:
+            vectorizer = self.vectorizers[column]
+            if vectorizer is not None:
+                names += ['{}={}'.format(column, term) for term in vectorizer.get_feature_names_out()]
+        return names
+
+
+class HashingFeatureBuilder(FeatureBuilder):
+    """
+    Stateless FeatureBuilder: each text column is hashed into n_features columns instead of being fitted,
+    so the same builder transforms every future batch and models can be trained incrementally.
+    """
+    def __init__(self, n_features=HASHING_FEATURES, **kwargs):
+        super().__init__(**kwargs)
+        self.n_features = n_features
+        self.vectorizers = {
+            column: make_hashing_vectorizer(column in self.list_columns, n_features)
+            for column in self.text_columns + self.list_columns
+        }
+
+    def fit(self, data_frame):
+        return self
+
+    def feature_names(self):
+        names = list(self.date_columns) + list(self.numeric_columns)
+        for column in self.text_columns + self.list_columns:
+            names += ['{}#{}'.format(column, bucket) for bucket in range(self.n_features)]
+        return names
+
+
+def make_hashing_vectorizer(list_column, n_features):
+    if list_column:
+        return HashingVectorizer(n_features=n_features, alternate_sign=False, tokenizer=split_list_value,
+                                 token_pattern=None, lowercase=False)
+    return HashingVectorizer(n_features=n_features, alternate_sign=False)
+
+
+def make_vectorizer(list_column, max_features=None):
+    if list_column:
+        return TfidfVectorizer(tokenizer=split_list_value, token_pattern=None, lowercase=False,
+                               max_features=max_features)
+    return TfidfVectorizer(max_features=max_features)
+
+
+def split_list_value(value):
+    return [token for token in value.split(',') if token]
+
+
+def text_values(series):
+    return series.astype(object).where(series.notnull(), '').astype(str).tolist()
+
+
+def datetime_to_ordinal(series):
+    """
+    Converts a datetime column to float days since the epoch
+    :param series: pandas series of datetimes or timestamp strings
+    :return: pandas float series, NaN where missing
+    """
+    series = pandas.to_datetime(series, utc=True, errors='coerce', format='ISO8601')
+    return (series - EPOCH) / pandas.Timedelta(days=1)
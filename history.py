@@ -0,0 +1,416 @@
+import os
+import shutil
+import sys
+import threading
+
+import numpy
+import pandas
+import pyarrow
+import pyarrow.dataset
+import pyarrow.parquet
+
+from api import FIELD_EXTRACTORS, intern_value
+from constants import EXCLUDED_ISSUE_TYPES, WORKLOG_METRIC
+
+EVENTS_PATH = 'events_store'
+CHANGELOG = 'changelog'
+WORKLOG = 'worklog'
+TABLE_COLUMNS = {
+    CHANGELOG: ['key', 'timestamp', 'author', 'field', 'from', 'to'],
+    WORKLOG: ['key', 'started', 'author', 'worklog_id', 'time_spent'],
+}
+TIME_COLUMNS = {CHANGELOG: 'timestamp', WORKLOG: 'started'}
+CATEGORICAL_COLUMNS = {'author', 'field', 'from', 'to'}
+# changelog fields kept; edits to free text (summary, description, comments) would dwarf everything else
+TRACKED_FIELDS = frozenset([
+    'status', 'resolution', 'assignee', 'priority', 'issuetype', 'Sprint', 'Fix Version', 'Component', 'labels',
+    'timeoriginalestimate', 'timeestimate', 'timespent', 'Story Points',
+])
+# issues are partitioned by project and a bucket of BUCKET_SIZE consecutive issue numbers, so all events of an
+# issue live in one small partition that lookups and upserts can go straight to
+BUCKET_SIZE = 1000
+PARTITION_COLUMNS = ['project', 'bucket']
+START_STATUSES = ('In Progress',)
+DONE_STATUSES = ('Done', 'Closed', 'Resolved')
+EPOCH = pandas.Timestamp('1970-01-01', tz='UTC')
+
+
+class EventCollector(object):
+    """
+    Column buffers for the changelog and worklog events of a stream of issue payloads. Only the compact event
+    rows are kept, so raw payloads can be dropped as soon as the issue store has parsed them.
+    """
+    def __init__(self):
+        self.keys = []
+        self.columns = {table: {column: [] for column in columns} for table, columns in TABLE_COLUMNS.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def collect(self, issues):
+        """
+        Generator that gathers the events of each issue it passes through
+        :param issues: iterable of JIRA issue JSON
+        :return: yields the same issues
+        """
+        for issue in issues:
+            self.add(issue)
+            yield issue
+
+    def add(self, issue):
+        """
+        Appends an issue's events. Issues fetched without a changelog are skipped so their stored events
+        are left alone.
+        :param issue: issue JSON fetched with expand=changelog
+        """
+        events = extract_events(issue)
+        if events is not None:
+            self.add_events(issue['key'], *events)
+
+    def add_events(self, key, changelog_rows, worklog_rows):
+        """
+        Appends event rows taken from an issue earlier, e.g. kept on an api.IssueRecord
+        :param key: issue key
+        :param changelog_rows: CHANGELOG rows without the key, from extract_events
+        :param worklog_rows: WORKLOG rows without the key, from extract_events
+        """
+        self.keys.append(key)
+        for table, rows in ((CHANGELOG, changelog_rows), (WORKLOG, worklog_rows)):
+            columns = self.columns[table]
+            columns['key'].extend([key] * len(rows))
+            for column, values in zip(TABLE_COLUMNS[table][1:], zip(*rows)):
+                columns[column].extend(values)
+
+    def to_data_frames(self):
+        """
+        :return: (changelog, worklog) pandas data frames
+        """
+        return tuple(normalize_events(pandas.DataFrame(self.columns[table]), table) for table in TABLE_COLUMNS)
+
+
+def extract_events(issue):
+    """
+    Pulls the tracked changelog items and the worklogs out of an issue payload, interning the strings that
+    repeat across issues (authors, field names and statuses)
+    :param issue: issue JSON fetched with expand=changelog
+    :return: (changelog rows, worklog rows), tuples in TABLE_COLUMNS order without the key, or None if the
+        issue was fetched without a changelog or is one of EXCLUDED_ISSUE_TYPES
+    """
+    if 'changelog' not in issue or FIELD_EXTRACTORS['issue_type'](issue) in EXCLUDED_ISSUE_TYPES:
+        return None
+    changelog_rows = []
+    for history in issue['changelog'].get('histories', []):
+        author = intern_value((history.get('author') or {}).get('name'))
+        for item in history.get('items', []):
+            field = item.get('field')
+            if field not in TRACKED_FIELDS:
+                continue
+            changelog_rows.append((
+                history.get('created'), author, sys.intern(field),
+                intern_value(item.get('fromString')), intern_value(item.get('toString')),
+            ))
+    worklog_rows = [
+        (entry.get('started'), intern_value((entry.get('author') or {}).get('name')), entry.get('id'),
+         entry.get('timeSpentSeconds'))
+        for entry in (issue.get('fields', {}).get('worklog') or {}).get('worklogs', [])
+    ]
+    return changelog_rows, worklog_rows
+
+
+class EventStore(object):
+    """
+    Parquet changelog and worklog tables (events_store/<table>/project=FARM/bucket=3/), rows sorted by issue
+    and then time. Reads prune to the partitions of the requested issues and filter on time inside the scan.
+    A synced issue's events replace all of its stored events, so edited and deleted worklogs don't linger.
+    """
+    def __init__(self, path=EVENTS_PATH):
+        self.path = path
+        self.lock = threading.RLock()
+
+    def table_path(self, table):
+        return os.path.join(self.path, table)
+
+    def exists(self):
+        return os.path.isdir(self.path) and any(os.scandir(self.path))
+
+    def load(self, table, columns=None, keys=None, projects=None, since=None, until=None, buckets=None):
+        """
+        Loads events
+        :param table: CHANGELOG or WORKLOG
+        :param columns: list of table columns to read, or None for all ('key' is always read)
+        :param keys: issue keys to read, or None for all
+        :param projects: project keys to read, or None for all
+        :param since: only events at or after this timezone aware datetime
+        :param until: only events before this timezone aware datetime
+        :param buckets: issue number buckets to read, or None for all
+        :return: pandas data frame indexed by issue key, sorted by issue and time
+        """
+        read_columns = TABLE_COLUMNS[table]
+        if columns is not None:
+            read_columns = ['key'] + [column for column in columns if column != 'key']
+        table_path = self.table_path(table)
+        if not os.path.isdir(table_path) or not any(os.scandir(table_path)):
+            return normalize_events(pandas.DataFrame(columns=TABLE_COLUMNS[table]), table)[read_columns]
+        filters = []
+        if keys is not None:
+            keys = list(keys)
+            partitions = partition_values(pandas.Series(keys))
+            filters.append(('project', 'in', partitions['project'].unique().tolist()))
+            filters.append(('bucket', 'in', partitions['bucket'].unique().tolist()))
+            filters.append(('key', 'in', keys))
+        if projects is not None:
+            filters.append(('project', 'in', list(projects)))
+        if buckets is not None:
+            filters.append(('bucket', 'in', list(buckets)))
+        time_column = TIME_COLUMNS[table]
+        if since is not None:
+            filters.append((time_column, '>=', pandas.Timestamp(since)))
+        if until is not None:
+            filters.append((time_column, '<', pandas.Timestamp(until)))
+
+        # the time column is always read, as rows are sorted by it
+        scan_columns = read_columns + [time_column] if time_column not in read_columns else read_columns
+        with self.lock:
+            events = pyarrow.parquet.read_table(
+                table_path,
+                columns=scan_columns,
+                filters=filters or None,
+                memory_map=True,
+                partitioning=pyarrow.dataset.partitioning(
+                    pyarrow.schema([('project', pyarrow.string()), ('bucket', pyarrow.int64())]), flavor='hive'),
+            ).to_pandas()
+        events = events.drop(columns=[c for c in PARTITION_COLUMNS if c in events.columns])
+        return sort_events(events, table)[read_columns]
+
+    def save(self, keys, changelog, worklog):
+        """
+        Replaces both tables
+        :param keys: issue keys the events were collected for
+        :param changelog: pandas data frame of changelog events
+        :param worklog: pandas data frame of worklog events
+        """
+        with self.lock:
+            if os.path.isdir(self.path):
+                shutil.rmtree(self.path)
+            self.upsert(keys, changelog, worklog)
+
+    def upsert(self, keys, changelog, worklog):
+        """
+        Replaces the stored events of issues, rewriting only the partitions they fall in
+        :param keys: issue keys the events were collected for, including issues with no events
+        :param changelog: pandas data frame of changelog events
+        :param worklog: pandas data frame of worklog events
+        """
+        if not keys:
+            return
+        keys = pandas.Index(keys, dtype=object).unique()
+        partitions = partition_values(pandas.Series(keys)).drop_duplicates()
+        with self.lock:
+            for table, new_rows in ((CHANGELOG, changelog), (WORKLOG, worklog)):
+                existing_rows = self.load(
+                    table,
+                    projects=partitions['project'].unique().tolist(),
+                    buckets=partitions['bucket'].unique().tolist(),
+                )
+                existing_rows = existing_rows.loc[~existing_rows.index.isin(keys)]
+                # only keep existing rows from partitions being rewritten
+                touched = pandas.MultiIndex.from_frame(partitions)
+                keep = pandas.MultiIndex.from_frame(partition_values(existing_rows['key'])).isin(touched)
+                merged = pandas.concat([existing_rows.loc[keep], normalize_events(new_rows, table)])
+                self.write(table, sort_events(merged, table), partitions)
+
+    def write(self, table, data_frame, partitions):
+        table_path = self.table_path(table)
+        for project, bucket in partitions.itertuples(index=False):
+            partition_path = os.path.join(table_path, 'project={}'.format(project), 'bucket={}'.format(bucket))
+            if os.path.isdir(partition_path):
+                shutil.rmtree(partition_path)
+        if data_frame.empty:
+            return
+        table_frame = pandas.concat(
+            [data_frame.reset_index(drop=True), partition_values(data_frame['key']).reset_index(drop=True)], axis=1)
+        pyarrow.dataset.write_dataset(
+            pyarrow.Table.from_pandas(table_frame, preserve_index=False),
+            table_path,
+            format='parquet',
+            partitioning=PARTITION_COLUMNS,
+            partitioning_flavor='hive',
+            existing_data_behavior='overwrite_or_ignore',
+            basename_template='part-{i}.parquet',
+        )
+
+
+def normalize_events(data_frame, table):
+    """
+    Casts event columns to their stored types: categoricals, UTC datetimes and floats
+    :param data_frame: pandas data frame of events
+    :param table: CHANGELOG or WORKLOG
+    :return: new pandas data frame indexed by issue key
+    """
+    data_frame = data_frame.reindex(columns=TABLE_COLUMNS[table]).copy()
+    for column in data_frame.columns:
+        if column in CATEGORICAL_COLUMNS:
+            data_frame[column] = data_frame[column].astype('string').astype('category')
+        elif column == TIME_COLUMNS[table]:
+            data_frame[column] = pandas.to_datetime(data_frame[column], utc=True, errors='coerce', format='ISO8601')
+        elif column == 'time_spent':
+            data_frame[column] = pandas.to_numeric(data_frame[column], errors='coerce').astype('float64')
+        else:
+            data_frame[column] = data_frame[column].astype('string')
+    data_frame.index = key_index(data_frame['key'])
+    return data_frame
+
+
+def sort_events(data_frame, table):
+    """
+    Sorts events by project, issue number and then time
+    :param data_frame: pandas data frame of events
+    :param table: CHANGELOG or WORKLOG
+    :return: sorted pandas data frame indexed by issue key
+    """
+    data_frame.index = key_index(data_frame['key'])
+    projects, issue_nums = split_keys(data_frame['key'])
+    order = numpy.lexsort((epoch_seconds(data_frame[TIME_COLUMNS[table]]).to_numpy(), issue_nums, projects))
+    return data_frame.iloc[order]
+
+
+def key_index(keys):
+    """
+    :param keys: pandas series of issue keys
+    :return: object dtype index of the keys; events repeat keys, and membership tests on object indexes are
+        hashed rather than scanned
+    """
+    return pandas.Index(keys.to_numpy(dtype=object, na_value=None), dtype=object, name=None)
+
+
+def partition_values(keys):
+    """
+    Computes the partition columns for each issue key
+    :param keys: pandas series of issue keys
+    :return: pandas data frame of project and bucket, aligned with keys
+    """
+    projects, issue_nums = split_keys(keys)
+    return pandas.DataFrame({
+        'project': projects,
+        'bucket': numpy.maximum(issue_nums, 0) // BUCKET_SIZE,
+    }, index=keys.index)
+
+
+def split_keys(keys):
+    """
+    Splits issue keys into project and number, parsing each distinct key once
+    :param keys: pandas series of issue keys
+    :return: (object array of projects, int64 array of issue numbers, -1 where unparseable)
+    """
+    codes, uniques = pandas.factorize(keys.astype(object))
+    parts = pandas.Series(uniques, dtype=object).astype(str).str.rsplit('-', n=1, expand=True).reindex(columns=[0, 1])
+    unique_nums = pandas.to_numeric(parts[1], errors='coerce').fillna(-1).to_numpy(dtype='int64')
+    unique_projects = parts[0].fillna('unknown').to_numpy(dtype=object)
+    # trailing entries for missing keys, which factorize codes as -1
+    unique_projects = numpy.append(unique_projects, 'unknown')
+    unique_nums = numpy.append(unique_nums, -1)
+    return unique_projects[codes], unique_nums[codes]
+
+
+def epoch_seconds(values):
+    """
+    :param values: pandas series of timezone aware datetimes
+    :return: pandas series of float seconds since the epoch, NaN where missing
+    """
+    return (pandas.to_datetime(values, utc=True) - EPOCH) / pandas.Timedelta(seconds=1)
+
+
+def status_transitions(changelog):
+    """
+    :param changelog: pandas data frame of changelog events sorted by issue and time
+    :return: the status events only
+    """
+    return changelog.loc[(changelog['field'] == 'status').to_numpy(dtype=bool, na_value=False)]
+
+
+def time_in_status(changelog, issues, until=None):
+    """
+    Sums the time each issue spent in each status, from its creation until now (or until)
+    :param changelog: pandas data frame of changelog events sorted by issue and time
+    :param issues: pandas data frame of issues indexed by key with created_datetime and status columns;
+        issues that never changed status spent their whole life in their current status
+    :param until: timezone aware end of the open span, default now
+    :return: pandas data frame of seconds indexed by issue key, one column per status
+    """
+    until = (pandas.Timestamp(until or pandas.Timestamp.now(tz='UTC')) - EPOCH) / pandas.Timedelta(seconds=1)
+    transitions = status_transitions(changelog)
+    transitions = transitions.loc[transitions.index.isin(issues.index.to_numpy(dtype=object))]
+    keys = transitions.index.to_numpy(dtype=object)
+    times = epoch_seconds(transitions['timestamp']).to_numpy()
+    first = numpy.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    last = numpy.ones(len(keys), dtype=bool)
+    last[:-1] = first[1:]
+    next_times = numpy.append(times[1:], until)
+    next_times[last] = until
+    created = epoch_seconds(issues['created_datetime'])
+    unchanged = issues.index.difference(pandas.Index(keys))
+
+    spans = pandas.DataFrame({
+        'key': numpy.concatenate([keys[first], keys, unchanged.to_numpy(dtype=object)]),
+        # before its first transition an issue was in the status it moved from
+        'status': numpy.concatenate([
+            transitions['from'].to_numpy(dtype=object)[first],
+            transitions['to'].to_numpy(dtype=object),
+            issues.loc[unchanged, 'status'].to_numpy(dtype=object),
+        ]),
+        'seconds': numpy.concatenate([
+            times[first] - created.reindex(keys[first]).to_numpy(),
+            next_times - times,
+            until - created.loc[unchanged].to_numpy(),
+        ]).clip(min=0),
+    })
+    spans = spans.loc[pandas.notnull(spans['status']) & pandas.notnull(spans['seconds'])]
+    totals = spans.groupby(['key', 'status'], sort=True)['seconds'].sum().unstack(fill_value=0)
+    totals.columns.name = None
+    totals.index.name = None
+    return totals.reindex(issues.index, fill_value=0)
+
+
+def cycle_time(changelog, start_statuses=START_STATUSES, done_statuses=DONE_STATUSES):
+    """
+    Time from an issue first entering a start status to it last entering a done status
+    :param changelog: pandas data frame of changelog events
+    :param start_statuses: statuses that start the clock
+    :param done_statuses: statuses that stop it
+    :return: pandas series of seconds indexed by issue key, for issues that were started and then finished
+    """
+    transitions = status_transitions(changelog)
+    to_status = transitions['to'].astype(object)
+    started = transitions.loc[to_status.isin(start_statuses).to_numpy()].groupby(level=0)['timestamp'].min()
+    finished = transitions.loc[to_status.isin(done_statuses).to_numpy()].groupby(level=0)['timestamp'].max()
+    seconds = (finished - started.reindex(finished.index)).dt.total_seconds()
+    return seconds.loc[seconds > 0].rename('cycle_time')
+
+
+def worklog_totals(worklog):
+    """
+    Sums logged work per person
+    :param worklog: pandas data frame of worklog events
+    :return: pandas data frame of time_logged seconds and distinct issues indexed by person, most time first
+    """
+    grouped = worklog.groupby(worklog['author'].astype(object), sort=False)
+    totals = pandas.DataFrame({
+        'time_logged': grouped['time_spent'].sum(),
+        'issues': grouped['key'].nunique(),
+    })
+    totals.index.name = 'person'
+    return totals.sort_values(['time_logged', 'issues'], ascending=False)
+
+
+def rank_worklogs(worklog, limit=10):
+    """
+    Ranks people by hours logged in worklogs
+    :param worklog: pandas data frame of worklog events
+    :param limit: number of people
+    :return: pandas data frame of rank, person, worklog_hours and issues, most hours first
+    """
+    totals = worklog_totals(worklog).head(limit).reset_index()
+    totals[WORKLOG_METRIC] = totals.pop('time_logged') / 3600
+    totals.insert(0, 'rank', numpy.arange(1, len(totals) + 1))
+    return totals[['rank', 'person', WORKLOG_METRIC, 'issues']]
@@ -1,7 +1,511 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
 
+import numpy
+import pandas
 
-class ProductionSupportFilters(object):
+from analytics import explode_list
+from api import IssueColumns, JirApi, compact_issue, parse_records, sort_by_issue_key
+from constants import HEADER, ProductionSupportFilters, get_filters  # noqa: F401
+from store import empty_data_frame, normalize_types
 
-    all_issues = "project in (FARM) AND (cf[10614] = 18 OR labels in (totalpkg, prodsup)) ORDER BY Rank ASC"
-    high_priority_issues = "project in (FARM) AND (cf[10614] = 18 OR labels in (totalpkg, prodsup)) AND (Flagged is not EMPTY OR priority = Blocker) AND sprint in (openSprints(), futureSprints()) ORDER BY Rank ASC"
-    open_sprints = "project in (FARM, SB, DI, DE) AND (cf[10614] = 18 OR labels in (totalpkg, prodsup)) AND sprint in (openSprints(), futureSprints()) ORDER BY Rank ASC"
+# seconds a filter's results are reused before it is run again; longer than the minute dashboards poll at
+DEFAULT_TTL = 300.0
+# where main.py query keeps results fetched from JIRA between runs
+QUERY_CACHE_DIR = 'query_cache'
+# JQL field -> (issue store column, whether the column holds a comma separated list)
+FIELD_COLUMNS = {
+    'project': ('key', False),
+    'key': ('key', False),
+    'issuekey': ('key', False),
+    'status': ('status', False),
+    'type': ('issue_type', False),
+    'issuetype': ('issue_type', False),
+    'assignee': ('assignee', False),
+    'reporter': ('reporter', False),
+    'labels': ('labels', True),
+    'sprint': ('sprints', True),
+    'component': ('components', True),
+    'fixversion': ('fix_versions', True),
+    'priority': ('priority', False),
+    'flagged': ('flagged', True),
+}
+# custom fields by id, e.g. cf[10614], for those stored in a customfield_<id> column; options are matched by id
+CUSTOM_FIELD = re.compile(r'cf\[(\d+)\]')
+# sprint functions -> sprint state they select
+SPRINT_FUNCTIONS = {
+    'opensprints': 'ACTIVE',
+    'futuresprints': 'FUTURE',
+    'closedsprints': 'CLOSED',
+}
+KEYWORDS = frozenset(['and', 'or', 'not', 'in', 'is', 'empty', 'null', 'order', 'by', 'asc', 'desc'])
+ORDER_COLUMNS = {
+    'key': 'key',
+    'issuekey': 'key',
+    'created': 'created_datetime',
+    'updated': 'updated_datetime',
+    'resolved': 'resolved_datetime',
+    'resolutiondate': 'resolved_datetime',
+    'rank': 'rank',
+}
+TOKEN = re.compile(
+    r'\s*(?:(?P<string>"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')'
+    r'|(?P<op>!=|=|\(|\)|,)'
+    r'|(?P<word>[^\s=!(),"\']+))'
+)
+
+
+class UntranslatableQuery(ValueError):
+    pass
+
+
+class FilterRunner(object):
+    """
+    Runs saved filters for dashboards that poll them. Results are cached per query for ttl seconds. Queries
+    made only of clauses the issue store can answer (project, key, labels, status, sprint and the sprint
+    functions, issue type, component, fix version, assignee, reporter, priority, flagged, stored custom fields)
+    are evaluated against the store; anything else pages through the search endpoint. Either way
+    EXCLUDED_ISSUE_TYPES are left out, as in the store. With a cache_dir, results from JIRA are also kept on
+    disk, so runs in separate processes (main.py query) share them.
+    """
+    def __init__(self, store=None, jira=None, ttl=DEFAULT_TTL, clock=time.monotonic, cache_dir=None,
+                 **jira_options):
+        """
+        :param store: IssueStore to answer translatable queries from, or None to always ask JIRA
+        :param jira: JirApi for the remaining queries; created from jira_options on first use if not given
+        :param ttl: seconds results are reused for
+        :param clock: monotonic time source
+        :param cache_dir: directory to keep results from JIRA in for ttl seconds, or None to keep them in memory
+        """
+        self.store = store
+        self.jira = jira
+        self.jira_options = jira_options
+        self.ttl = ttl
+        self.clock = clock
+        self.cache_dir = cache_dir
+        self.results = {}
+        self.lock = threading.Lock()
+        self.query_locks = {}
+
+    def run(self, query, local=None):
+        """
+        Runs a named filter or a JQL query
+        :param query: ProductionSupportFilters attribute name or JQL
+        :param local: True to require the issue store, False to always ask JIRA, None to use the store
+            when the query can be translated
+        :return: pandas data frame of matching issues indexed by key, in the query's order
+        """
+        jql = get_filters().get(query, query)
+        local_query = None
+        if local is not False and self.store is not None:
+            try:
+                local_query = translate(jql)
+            except UntranslatableQuery:
+                if local:
+                    raise
+        elif local:
+            raise ValueError('No issue store to run the query against')
+
+        cache_key = (jql, local_query is not None)
+        with self.lock:
+            query_lock = self.query_locks.setdefault(cache_key, threading.Lock())
+        # one refresh per query at a time; dashboards polling the same filter wait for it instead of piling on
+        with query_lock:
+            cached = self.results.get(cache_key)
+            if cached is not None and cached[0] > self.clock():
+                return cached[1].copy()
+            if local_query is not None:
+                result = local_query.run(self.store)
+            else:
+                result = self.load_result(jql)
+                if result is None:
+                    result = self.search(jql)
+                    self.save_result(jql, result)
+            self.results[cache_key] = (self.clock() + self.ttl, result)
+        return result.copy()
+
+    def result_path(self, jql):
+        digest = hashlib.sha256(normalize_jql(jql).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, '{}.parquet'.format(digest))
+
+    def load_result(self, jql):
+        """
+        :param jql: JQL query string
+        :return: pandas data frame of results saved less than ttl seconds ago, or None
+        """
+        if self.cache_dir is None:
+            return None
+        path = self.result_path(jql)
+        try:
+            if time.time() - os.path.getmtime(path) < self.ttl:
+                return pandas.read_parquet(path)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def save_result(self, jql, result):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.result_path(jql)
+        result.to_parquet(path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def search(self, jql):
+        """
+        Pages through every result of a JQL query on the server
+        :param jql: JQL query string
+        :return: pandas data frame of issues indexed by key, in the server's order, typed like the issue store
+        """
+        if self.jira is None:
+            self.jira = JirApi(**self.jira_options)
+        columns = IssueColumns()
+        for batch in self.jira.search_issues(jql):
+            parse_records([compact_issue(issue) for issue in batch], columns)
+        if not len(columns):
+            return empty_data_frame()
+        return normalize_types(columns.to_data_frame())
+
+    def invalidate(self):
+        """
+        Drops every cached result, e.g. after the issue store was synced
+        """
+        with self.lock:
+            self.results.clear()
+            if self.cache_dir is not None and os.path.isdir(self.cache_dir):
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith('.parquet'):
+                        os.remove(entry.path)
+
+
+class LocalQuery(object):
+    """
+    A JQL query translated into a predicate over issue store columns
+    """
+    def __init__(self, predicate, columns, projects=None, order=None):
+        """
+        :param predicate: function of a data frame of issues returning a boolean numpy array
+        :param columns: issue store columns the predicate and ordering read
+        :param projects: projects every match must be in, used to prune partitions, or None
+        :param order: list of (column, ascending) to sort by, or None for issue key order
+        """
+        self.predicate = predicate
+        self.columns = columns
+        self.projects = projects
+        self.order = order or []
+
+    def run(self, store):
+        """
+        :param store: IssueStore
+        :return: pandas data frame of matching issues indexed by key
+        """
+        # match on the few columns the query reads, then read whole rows only from partitions with matches
+        candidates = store.load(columns=sorted(self.columns | {'created_datetime'}), projects=self.projects)
+        result = sort_by_issue_key(store.load_existing(candidates.loc[self.predicate(candidates)]))
+        if self.order:
+            sort_keys = pandas.DataFrame({
+                position: numpy.arange(len(result)) if column == 'key' else result[column].reset_index(drop=True)
+                for position, (column, _) in enumerate(self.order)
+            })
+            sort_keys = sort_keys.sort_values(
+                list(sort_keys.columns),
+                ascending=[ascending for _, ascending in self.order],
+                kind='stable',
+                na_position='last',
+            )
+            result = result.iloc[sort_keys.index.to_numpy()]
+        return result
+
+
+def translate(jql):
+    """
+    Translates JQL into a LocalQuery
+    :param jql: JQL query string
+    :return: LocalQuery
+    :raises UntranslatableQuery: when the query uses fields, operators or functions the store can't answer
+    """
+    return QueryParser(tokenize(jql)).parse()
+
+
+def normalize_jql(jql):
+    """
+    Spells a query the same way however it was spaced or its keywords cased, to key cached results by
+    :param jql: JQL query string
+    :return: string
+    """
+    try:
+        tokens = tokenize(jql)
+    except UntranslatableQuery:
+        return ' '.join(jql.split())
+    return json.dumps([
+        (kind, value.lower() if kind == 'word' and value.lower() in KEYWORDS else value) for kind, value in tokens])
+
+
+def tokenize(jql):
+    tokens = []
+    position = 0
+    jql = jql.strip()
+    while position < len(jql):
+        match = TOKEN.match(jql, position)
+        if match is None:
+            raise UntranslatableQuery('Cannot parse JQL at: {}'.format(jql[position:]))
+        position = match.end()
+        if match.group('string') is not None:
+            tokens.append(('value', re.sub(r'\\(.)', r'\1', match.group('string')[1:-1])))
+        elif match.group('op') is not None:
+            tokens.append(('op', match.group('op')))
+        else:
+            tokens.append(('word', match.group('word')))
+    return tokens
+
+
+class QueryParser(object):
+    """
+    Recursive descent parser for the subset of JQL the issue store can answer:
+    clauses joined by AND, OR, NOT and parentheses, with =, !=, IN, NOT IN, IS [NOT] EMPTY, then ORDER BY.
+    The only functions are the sprint ones, as sprint values.
+    """
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+        self.columns = set()
+
+    def parse(self):
+        predicate, projects = self.parse_or()
+        order = None
+        if self.accept_word('order'):
+            self.expect_word('by')
+            order = self.parse_order()
+        if self.peek() is not None:
+            raise UntranslatableQuery('Unexpected {}'.format(self.peek()[1]))
+        return LocalQuery(predicate, self.columns, projects, order)
+
+    def parse_or(self):
+        predicate, projects = self.parse_and()
+        while self.accept_word('or'):
+            right, right_projects = self.parse_and()
+            predicate = combine(numpy.logical_or, predicate, right)
+            if projects is not None and right_projects is not None:
+                projects = sorted(set(projects) | set(right_projects))
+            else:
+                projects = None
+        return predicate, projects
+
+    def parse_and(self):
+        predicate, projects = self.parse_not()
+        while self.accept_word('and'):
+            right, right_projects = self.parse_not()
+            predicate = combine(numpy.logical_and, predicate, right)
+            if projects is None:
+                projects = right_projects
+            elif right_projects is not None:
+                projects = sorted(set(projects) & set(right_projects))
+        return predicate, projects
+
+    def parse_not(self):
+        if self.accept_word('not'):
+            predicate, _ = self.parse_not()
+            return (lambda data_frame: ~predicate(data_frame)), None
+        if self.accept_op('('):
+            result = self.parse_or()
+            self.expect_op(')')
+            return result
+        return self.parse_clause()
+
+    def parse_clause(self):
+        field = self.next_word().lower()
+        custom_field = CUSTOM_FIELD.fullmatch(field)
+        if custom_field is not None and 'customfield_{}'.format(custom_field.group(1)) in HEADER:
+            column, is_list = 'customfield_{}'.format(custom_field.group(1)), True
+        elif field in FIELD_COLUMNS:
+            column, is_list = FIELD_COLUMNS[field]
+        else:
+            raise UntranslatableQuery('Field {} is not in the issue store'.format(field))
+        self.columns.add(column)
+        if self.accept_word('is'):
+            negate = self.accept_word('not')
+            if not (self.accept_word('empty') or self.accept_word('null')):
+                raise UntranslatableQuery('Expected EMPTY after IS')
+            return empty_predicate(column, negate), None
+        if self.accept_op('='):
+            values, negate = [self.next_value()], False
+        elif self.accept_op('!='):
+            values, negate = [self.next_value()], True
+        else:
+            negate = self.accept_word('not')
+            self.expect_word('in')
+            values = self.parse_values()
+        projects = None
+        functions = [value for value in values if isinstance(value, SprintFunction)]
+        if functions and field != 'sprint':
+            raise UntranslatableQuery('Function {}() cannot be run locally'.format(functions[0].name))
+        if field == 'project':
+            values = [value.upper() for value in values]
+            projects = None if negate else values
+            predicate = project_predicate(values, negate)
+        elif functions:
+            self.columns.update(['sprint_states', 'updated_datetime'])
+            names = [value for value in values if not isinstance(value, SprintFunction)]
+            states = {SPRINT_FUNCTIONS[function.name] for function in functions}
+            predicate = sprint_predicate(names, states, negate)
+        else:
+            predicate = match_predicate(column, is_list, values, negate)
+        return predicate, projects
+
+    def parse_values(self):
+        self.expect_op('(')
+        values = [self.next_value()]
+        while self.accept_op(','):
+            values.append(self.next_value())
+        self.expect_op(')')
+        return values
+
+    def parse_order(self):
+        order = []
+        while True:
+            field = self.next_word().lower()
+            if field not in ORDER_COLUMNS:
+                raise UntranslatableQuery('Cannot order by {}'.format(field))
+            ascending = True
+            if self.accept_word('desc'):
+                ascending = False
+            else:
+                self.accept_word('asc')
+            self.columns.add(ORDER_COLUMNS[field])
+            order.append((ORDER_COLUMNS[field], ascending))
+            if not self.accept_op(','):
+                return order
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next_word(self):
+        token = self.peek()
+        if token is None or token[0] != 'word':
+            raise UntranslatableQuery('Expected a field name')
+        self.position += 1
+        return token[1]
+
+    def next_value(self):
+        """
+        :return: value string, or SprintFunction for a call to one of SPRINT_FUNCTIONS
+        """
+        token = self.peek()
+        if token is None or token[0] == 'op':
+            raise UntranslatableQuery('Expected a value')
+        self.position += 1
+        if token[0] == 'word' and self.peek() == ('op', '('):
+            if token[1].lower() not in SPRINT_FUNCTIONS:
+                raise UntranslatableQuery('Function {}() cannot be run locally'.format(token[1]))
+            self.expect_op('(')
+            self.expect_op(')')
+            return SprintFunction(token[1].lower())
+        return token[1]
+
+    def accept_word(self, word):
+        token = self.peek()
+        if token is not None and token[0] == 'word' and token[1].lower() == word:
+            self.position += 1
+            return True
+        return False
+
+    def expect_word(self, word):
+        if not self.accept_word(word):
+            raise UntranslatableQuery('Expected {}'.format(word.upper()))
+
+    def accept_op(self, op):
+        if self.peek() == ('op', op):
+            self.position += 1
+            return True
+        return False
+
+    def expect_op(self, op):
+        if not self.accept_op(op):
+            raise UntranslatableQuery('Expected {}'.format(op))
+
+
+class SprintFunction(object):
+    def __init__(self, name):
+        self.name = name
+
+
+def combine(operator, left, right):
+    return lambda data_frame: operator(left(data_frame), right(data_frame))
+
+
+def project_predicate(projects, negate):
+    def predicate(data_frame):
+        matches = data_frame['key'].astype(str).str.rsplit('-', n=1).str[0].str.upper().isin(projects).to_numpy(
+            dtype=bool, na_value=False)
+        return ~matches if negate else matches
+    return predicate
+
+
+def empty_predicate(column, negate):
+    def predicate(data_frame):
+        values = data_frame[column].astype(object)
+        empty = (pandas.isnull(values) | (values == '')).to_numpy(dtype=bool)
+        return ~empty if negate else empty
+    return predicate
+
+
+def match_predicate(column, is_list, values, negate):
+    """
+    Matches values case-insensitively. As in JQL, != and NOT IN never match issues where the field is empty.
+    """
+    values = {value.lower() for value in values}
+
+    def predicate(data_frame):
+        if is_list:
+            items = explode_list(data_frame[column])
+            matches = numpy.zeros(len(data_frame), dtype=bool)
+            item_matches = pandas.Series(items.cat.categories.str.lower().isin(values))
+            matches[items.index[item_matches.to_numpy()[items.cat.codes.to_numpy()]]] = True
+        else:
+            matches = data_frame[column].astype('string').str.lower().isin(values).to_numpy(
+                dtype=bool, na_value=False)
+        if not negate:
+            return matches
+        present = ~empty_predicate(column, False)(data_frame)
+        return present & ~matches
+    return predicate
+
+
+def sprint_predicate(names, states, negate):
+    """
+    Matches issues in one of the named sprints or in a sprint in one of states. Closing a sprint does not
+    update the issues completed in it, so each sprint's state is taken from the most recently updated issue
+    that carries it; a sprint counts as open until some issue in it is synced after it closed.
+    :param names: sprint names
+    :param states: sprint states, e.g. {'ACTIVE', 'FUTURE'}
+    :param negate: NOT IN
+    """
+    match_names = match_predicate('sprints', True, names, False)
+
+    def predicate(data_frame):
+        matches = match_names(data_frame)
+        sprint_names = explode_list(data_frame['sprints'])
+        sprint_states = explode_list(data_frame['sprint_states'])
+        rows = sprint_names.index.to_numpy()
+        if len(rows) == len(sprint_states) and (rows == sprint_states.index.to_numpy()).all():
+            sprints = pandas.DataFrame({
+                'name': sprint_names.astype(object).to_numpy(),
+                'state': sprint_states.astype(object).to_numpy(),
+                'updated': data_frame['updated_datetime'].to_numpy()[rows],
+            })
+            latest = sprints.sort_values('updated', kind='stable', na_position='first').groupby('name')['state'].last()
+            selected = latest.index[latest.str.upper().isin(states).to_numpy()]
+            matches[rows[sprints['name'].isin(selected).to_numpy()]] = True
+        else:
+            # a sprint name with a comma in it misaligns names and states; use each issue's own view
+            rows = sprint_states.index.to_numpy()
+            matches[rows[sprint_states.astype(object).str.upper().isin(states).to_numpy()]] = True
+        if not negate:
+            return matches
+        present = ~empty_predicate('sprints', False)(data_frame)
+        return present & ~matches
+    return predicate
@@ -0,0 +1,159 @@
+import os
+
+import numpy
+import pandas
+
+from analytics import explode_list
+from constants import DIMENSIONS, METRICS, ROLES
+
+ROLLUP_PATH = 'leaderboard_rollups.parquet'
+ROLLUP_KEYS = ['role', 'person', 'dimension', 'value']
+ROLLUP_COLUMNS = [
+    'issues', 'resolved_issues', 'bug_fixes', 'time_logged', 'tracked_issues', 'estimate_sum', 'abs_error_sum',
+]
+# issue columns read to build rollups
+ISSUE_COLUMNS = [
+    'issue_type', 'assignee', 'reporter', 'resolved_datetime', 'original_estimate', 'time_spent',
+    'sprints', 'components', 'fix_versions',
+]
+
+
+class Leaderboard(object):
+    """
+    Ranks assignees and reporters from pre-aggregated rollups: additive per-person sums for every role and
+    slice (sprint, component, fix version, or all issues). Synced issues are folded in by subtracting the
+    contribution of their previous version and adding the new one, so neither updates nor queries rescan
+    the issue history. Each rollup counts its issues, so a person/slice is dropped once it has none left,
+    exactly as a rebuild would leave it out.
+    """
+    def __init__(self, path=ROLLUP_PATH):
+        self.path = path
+        if os.path.exists(path):
+            self.rollups = pandas.read_parquet(path).set_index(ROLLUP_KEYS)
+        else:
+            self.rollups = empty_rollups()
+
+    def exists(self):
+        # rollups saved without every current column are rebuilt
+        return os.path.exists(self.path) and set(ROLLUP_COLUMNS).issubset(self.rollups.columns)
+
+    def rebuild(self, data_frame):
+        """
+        Recomputes every rollup from scratch
+        :param data_frame: pandas data frame of every stored issue
+        """
+        self.rollups = aggregate(data_frame)
+
+    def update(self, new_rows, old_rows=None):
+        """
+        Folds synced issues into the rollups
+        :param new_rows: pandas data frame of new or updated issues
+        :param old_rows: pandas data frame of the previously stored versions of those issues, if any
+        """
+        rollups = self.rollups.add(aggregate(new_rows), fill_value=0)
+        if old_rows is not None and not old_rows.empty:
+            rollups = rollups.sub(aggregate(old_rows), fill_value=0)
+        # drop people/slices whose every issue moved elsewhere
+        self.rollups = rollups.loc[rollups['issues'] > 0.5]
+
+    def save(self):
+        self.rollups.reset_index().to_parquet(self.path + '.tmp', index=False)
+        os.replace(self.path + '.tmp', self.path)
+
+    def rank(self, metric, role='assignee', dimension='all', value=None, limit=10):
+        """
+        Ranks people by a metric
+        :param metric: one of METRICS
+        :param role: 'assignee' or 'reporter'
+        :param dimension: one of DIMENSIONS
+        :param value: slice to rank within (e.g. a sprint name), or None to rank within every slice
+        :param limit: number of people per slice
+        :return: pandas data frame of value, rank, person and the metric, best first within each slice
+        """
+        if metric not in METRICS:
+            raise ValueError('Unknown metric {}. Choose from {}'.format(metric, ', '.join(METRICS)))
+        if dimension not in DIMENSIONS:
+            raise ValueError('Unknown slice {}. Choose from {}'.format(dimension, ', '.join(DIMENSIONS)))
+        index = self.rollups.index
+        selected = (index.get_level_values('role') == role) & (index.get_level_values('dimension') == dimension)
+        rollups = self.rollups.loc[selected].droplevel(['role', 'dimension'])
+        if value is not None:
+            rollups = rollups.loc[rollups.index.get_level_values('value') == value]
+        scores = compute_metrics(rollups)[metric].dropna().rename(metric).reset_index()
+        scores = scores.sort_values(['value', metric, 'person'], ascending=[True, False, True])
+        scores['rank'] = scores.groupby('value').cumcount() + 1
+        return scores.loc[scores['rank'] <= limit, ['value', 'rank', 'person', metric]].reset_index(drop=True)
+
+
+def compute_metrics(rollups):
+    """
+    Turns additive rollup sums into leaderboard metrics
+    :param rollups: pandas data frame of ROLLUP_COLUMNS
+    :return: pandas data frame of METRICS with time_logged in hours and estimate_accuracy as
+        1 - total absolute estimate error / total estimate (NaN when no issue had both)
+    """
+    estimate_sum = rollups['estimate_sum'].where(rollups['tracked_issues'] > 0)
+    return pandas.DataFrame({
+        'resolved_issues': rollups['resolved_issues'].round().astype(int),
+        'time_logged': rollups['time_logged'] / 3600,
+        'estimate_accuracy': 1 - rollups['abs_error_sum'] / estimate_sum,
+        'bug_fixes': rollups['bug_fixes'].round().astype(int),
+    }, index=rollups.index)
+
+
+def aggregate(data_frame):
+    """
+    Sums each issue's contribution per role, person and slice. An issue in several sprints, components or
+    fix versions contributes fully to each of them.
+    :param data_frame: pandas data frame of issues with ISSUE_COLUMNS
+    :return: pandas data frame of ROLLUP_COLUMNS indexed by ROLLUP_KEYS
+    """
+    if data_frame.empty:
+        return empty_rollups()
+    contributions = issue_contributions(data_frame)
+    frames = []
+    for role in ROLES:
+        people = data_frame[role].astype(object).to_numpy()
+        for dimension, column in DIMENSIONS.items():
+            if column is None:
+                rows = numpy.arange(len(data_frame))
+                values = numpy.full(len(data_frame), '', dtype=object)
+            else:
+                exploded = explode_list(data_frame[column])
+                rows = exploded.index.to_numpy()
+                values = exploded.astype(object).to_numpy()
+            frame = contributions.iloc[rows].reset_index(drop=True)
+            frame['role'] = role
+            frame['person'] = people[rows]
+            frame['dimension'] = dimension
+            frame['value'] = values
+            frames.append(frame.loc[pandas.notnull(frame['person'])])
+    combined = pandas.concat(frames, ignore_index=True)
+    return combined.groupby(ROLLUP_KEYS, sort=True)[ROLLUP_COLUMNS].sum()
+
+
+def issue_contributions(data_frame):
+    """
+    Per-issue values summed by the rollups
+    :param data_frame: pandas data frame of issues
+    :return: pandas data frame of ROLLUP_COLUMNS, one row per issue in data_frame order
+    """
+    resolved = pandas.notnull(data_frame['resolved_datetime']).to_numpy()
+    is_bug = (data_frame['issue_type'].astype(object) == 'Bug').to_numpy()
+    estimate = pandas.to_numeric(data_frame['original_estimate'], errors='coerce').to_numpy(dtype=float)
+    time_spent = pandas.to_numeric(data_frame['time_spent'], errors='coerce').to_numpy(dtype=float)
+    tracked = (estimate > 0) & (time_spent > 0)
+    return pandas.DataFrame({
+        'issues': numpy.ones(len(data_frame)),
+        'resolved_issues': resolved.astype(float),
+        'bug_fixes': (resolved & is_bug).astype(float),
+        'time_logged': numpy.nan_to_num(time_spent),
+        'tracked_issues': tracked.astype(float),
+        'estimate_sum': numpy.where(tracked, estimate, 0),
+        'abs_error_sum': numpy.where(tracked, numpy.abs(estimate - time_spent), 0),
+    })
+
+
+def empty_rollups():
+    index = pandas.MultiIndex.from_arrays([[]] * len(ROLLUP_KEYS), names=ROLLUP_KEYS)
+    return pandas.DataFrame({column: pandas.Series(dtype=float) for column in ROLLUP_COLUMNS}, index=index)
@@ -1,185 +1,626 @@
-import datetime
-from argparse import ArgumentParser
+import os
+from argparse import ArgumentParser, ArgumentTypeError
 
-import numpy
-import pandas
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.externals import joblib
-from sklearn.metrics import accuracy_score
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.tree import DecisionTreeClassifier
+from constants import DIMENSIONS, INSTANCES_FILE, METRICS, MODEL_PATH, REPORT_DIR, ROLES, WORKLOG_METRIC, get_filters
+from telemetry import PROFILE_DIR, PROFILE_MODES, TELEMETRY, stage
 
-from api import JirApi
-from constants import HEADER
+# Each command imports what it needs when it runs: pandas, pyarrow, sklearn and plotly take seconds to load,
+# and fetch and sync send their first requests before touching any of them.
 
+CSV_PATH = 'issues.csv'
 
-def main(update_type, update_model_flag, start_issue, end_issue):
-    # TODO programatically generate model filename based on type
-    model_name = 'test.pkl'
 
-    data_frame = fetch_data(update_type, start_issue, end_issue)
+def main(command, metrics_path=None, profile=None, **options):
+    """
+    Runs one command
+    :param command: name of the command in COMMANDS
+    :param metrics_path: write stage timings and counters to this file when done, see Telemetry.write
+    :param profile: dict of Telemetry.enable_profiling arguments, or None
+    :param options: arguments of the command's function
+    """
+    if profile:
+        TELEMETRY.enable_profiling(**profile)
+    try:
+        COMMANDS[command](**options)
+    finally:
+        if metrics_path:
+            TELEMETRY.write(metrics_path)
+            print('Wrote metrics to {}'.format(metrics_path))
+
+
+def fetch(start_issue=1, end_issue=None, bulk=False, concurrency=1, rate_limit=20.0, resume=False, chunk_size=500,
+          instances_path=None, history=False):
+    """
+    Recreates the issue data set by crawling every project, see update_store
+    """
+    with stage('fetch') as fetch_stage:
+        store = update_store(
+            'all',
+            start_issue,
+            end_issue,
+            bulk=bulk,
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+            resume=resume,
+            chunk_size=chunk_size,
+            instances_path=instances_path,
+            history=history,
+        )
+        fetch_stage.rows = len(store.load(columns=['key']))
 
-    if update_model_flag:
-        model = update_or_create_model(data_frame)
-    else:
-        model = joblib.load(model_name)
 
+def sync(rate_limit=20.0, instances_path=None, history=False):
+    """
+    Upserts the issues changed since each project's last sync, see update_store
+    """
+    with stage('fetch') as fetch_stage:
+        store = update_store('append', rate_limit=rate_limit, instances_path=instances_path, history=history)
+        fetch_stage.rows = len(store.load(columns=['key']))
 
-def update_or_create_model(data_frame):
+
+def reparse():
     """
-    Updates or creates model based upon data in dataframe.
-    :param data_frame: pandas dataframe object
-    :return: returns model
+    Rebuilds the issue data set offline from the raw issue cache, see update_store
     """
-    # TODO currently only creates; need to implement model updates
-    training_set = create_training_subset(data_frame)
+    with stage('fetch') as fetch_stage:
+        fetch_stage.rows = len(update_store('reparse').load(columns=['key']))
 
-    x_vals = training_set.drop(['time_spent', 'key'], axis=1)
-    y_vals = training_set['time_spent']
 
-    x_train, x_test, y_train, y_test = train_test_split(x_vals, y_vals, test_size=0.3, random_state=100)
+def train(incremental=False, n_jobs=-1, model_path=MODEL_PATH, replace=False):
+    """
+    Trains a model on the stored issues and saves it
+    :param incremental: update the saved incremental model with issues changed since it was trained instead of
+        retraining from scratch
+    :param n_jobs: number of cores used by the hyperparameter search, -1 for all
+    :param model_path: model artifact to update or create
+    :param replace: with incremental, overwrite a saved model that can not be updated incrementally
+    """
+    from training import update_or_create_model
 
-    classifier_gini = DecisionTreeClassifier(
-        criterion='gini',
-        random_state=100,
-        max_depth=3,
-        min_samples_leaf=5,
-    )
-    # print(numpy.unique(list(map(len, x_train))))
-    print(data_frame)
-    print(data_frame.shape)
-    classifier_gini.fit(x_train, y_train)
+    data_frame = fetch_data(None)
+    with stage('train', rows=len(data_frame)):
+        model = update_or_create_model(
+            data_frame, incremental=incremental, model_path=model_path, n_jobs=n_jobs, replace=replace)
+        model.save(model_path)
+
+
+def predict(issue_keys, model_path=MODEL_PATH, rate_limit=20.0):
+    """
+    Prints the predicted time spent of issues, fetched from JIRA, using the saved model
+    :param issue_keys: list of JIRA issue keys (e.g. EX-123)
+    :param model_path: model artifact to load
+    :param rate_limit: maximum requests per second sent to JIRA
+    """
+    from api import JirApi
+    from model import ModelArtifact
+
+    model = ModelArtifact.load(model_path)
+    with stage('predict', rows=len(issue_keys)):
+        predictions = predict_issues(model, issue_keys, JirApi(rate_limit=rate_limit))
+    for issue_key, seconds in predictions.items():
+        print('{}: {:.1f} hours'.format(issue_key, seconds / 3600))
+
+
+def report(output_dir=REPORT_DIR, formats=('html',)):
+    """
+    Renders every chart of the stored issues into a local report directory
+    :param output_dir: report directory
+    :param formats: report file formats, see plotter.render_report
+    """
+    from plotter import render_report
+
+    data_frame = fetch_data(None)
+    with stage('report', rows=len(data_frame)):
+        paths = render_report(data_frame, output_dir=output_dir, formats=formats)
+    for path in paths:
+        print('Wrote {}'.format(path))
+
+
+def predict_issues(model, issue_keys, jira):
+    """
+    Scores tickets on demand by fetching them from JIRA and transforming them with the saved features
+    :param model: ModelArtifact
+    :param issue_keys: list of JIRA issue keys (e.g. EX-123)
+    :param jira: JirApi used to fetch the issues
+    :return: pandas series of predicted seconds indexed by issue key
+    """
+    issues = [jira.get_issue_json(issue_key) for issue_key in issue_keys]
+    missing = [issue_key for issue_key, issue in zip(issue_keys, issues) if 'key' not in issue]
+    if missing:
+        raise ValueError('Issues not found: {}'.format(', '.join(missing)))
+    return model.predict_issues(issues)
 
-    test_result = classifier_gini.predict(x_test)
-    print(accuracy_score(y_test, test_result))
 
-    return classifier_gini
+def fetch_data(update_type, start_issue=1, end_issue=None, **options):
+    """
+    Gets data from file, JIRA API or both depending on update_type, see update_store
+    :return: returns pandas data frame
+    """
+    return update_store(update_type, start_issue, end_issue, **options).load()
 
 
-def fetch_data(update_type, start_issue, end_issue):
+def update_store(update_type, start_issue=1, end_issue=None, bulk=False, concurrency=1, rate_limit=20.0,
+                 resume=False, chunk_size=500, instances_path=None, history=False):
     """
-    Gets data from file, JIRA API or both depending on update_type
-    :param update_type: val of "all" recreates dataset from scratch, "append" not yet implemented
+    Brings the issue store up to date from file, JIRA API or both depending on update_type
+    :param update_type: val of "all" recreates dataset from scratch, "append" upserts issues updated since the
+        last sync, "reparse" rebuilds the dataset offline from the raw issue cache, None uses the store as is
     :param start_issue: starting ticket number to pull from
     :param end_issue: end ticket number to pull from
-    :return: returns pandas data frame
+    :param bulk: page through the search endpoint instead of fetching one issue at a time
+    :param concurrency: number of issues (or, in bulk mode, key range chunks) to fetch in parallel per project
+    :param rate_limit: maximum requests per second sent to each JIRA instance that doesn't set its own
+    :param resume: continue an interrupted "all" crawl after its last flushed chunk
+    :param chunk_size: number of issues written to the issue store at a time during an "all" crawl
+    :param instances_path: JSON list of JIRA instances and projects to crawl in parallel, see load_instances
+    :param history: also fetch changelogs and worklogs into the event store
+    :return: IssueStore
     """
-    try:
-        # TODO: validate header from archive is same as above
-        data_frame = pandas.DataFrame.from_csv('issues.csv')
-    except FileNotFoundError:
-        if not update_type:
-            raise
-        data_frame = pandas.DataFrame(columns=HEADER)
+    from api import JirApi, load_state_json, store_state_json
+    from cache import IssueCache
+    from crawler import ProjectCrawler, get_state_path, load_instances
+    from pipeline import IngestionPipeline, get_resume_issue
+    from store import IssueStore, empty_data_frame
+
+    store = IssueStore()
+    if not store.exists() and os.path.exists(CSV_PATH):
+        print("Migrating {} to {}".format(CSV_PATH, store.path))
+        store.migrate_csv(CSV_PATH)
+    if not store.exists() and not update_type:
+        raise FileNotFoundError('No issue data found. Use main.py fetch to create the issue data set.')
 
     if update_type == 'all':
         print("Updating all issue data")
-        jira = JirApi(start_issue=start_issue, end_issue=end_issue)
-        data_frame = jira.collect_issues(data_frame)
-        data_frame.to_csv('issues.csv')
+        crawler = ProjectCrawler(load_instances(instances_path, rate_limit))
+        cache = IssueCache()
+        event_store = None
+        if history:
+            from history import EventStore
+            event_store = EventStore()
+
+        def crawl(instance, project):
+            state_path = get_state_path(project)
+            project_start = start_issue
+            if resume:
+                project_start = get_resume_issue(load_state_json(state_path)) or start_issue
+                print("Resuming {} from issue {}".format(project, project_start))
+            else:
+                # a fresh crawl must not leave an earlier crawl's checkpoint for a later --resume
+                store_state_json(clear_flushed_key=True, state_path=state_path)
+            jira = crawler.make_jira(
+                instance,
+                project,
+                start_issue=project_start,
+                end_issue=end_issue,
+                concurrency=concurrency,
+                cache=cache,
+                history=history,
+            )
+            IngestionPipeline(
+                jira, store, chunk_size=chunk_size, state_path=state_path, event_store=event_store).run(bulk=bulk)
+            print('{} request stats: {}'.format(project, jira.request_stats()))
+            store_state_json(**jira.checkpoint(), state_path=state_path)
+
+        try:
+            crawler.run(crawl)
+        finally:
+            cache.flush()
+        print('Cache stats: {}'.format(cache.stats()))
     elif update_type == 'append':
-        # TODO: Programatically determine start_ & end_issue vals
-        raise Exception('Append new data not implemented. Use -U to update entire dataset.')
+        crawler = ProjectCrawler(load_instances(instances_path, rate_limit))
+        cache = IssueCache()
+        if history:
+            from history import EventCollector, EventStore
+
+        def sync_project(instance, project):
+            since = get_sync_start(store, project)
+            print("Updating {} issues changed since {}".format(project, since))
+            jira = crawler.make_jira(instance, project, cache=cache, history=history)
+            events = EventCollector() if history else None
+            new_rows = jira.sync_issues(None, since, events=events)
+            if new_rows is None:
+                new_rows = empty_data_frame()
+            print('{} request stats: {}'.format(project, jira.request_stats()))
+            return jira, new_rows, events
 
-    data_frame = convert_datetimes_to_ordinals(data_frame)
-    data_frame = vectorize_text_fields(data_frame)
+        synced = crawler.run(sync_project)
+        cache.flush()
+        from leaderboard import ISSUE_COLUMNS as LEADERBOARD_COLUMNS
+        # merged one project at a time so each leaderboard update sees the rows it replaces
+        for project, (jira, new_rows, events) in synced.items():
+            old_rows = store.load_existing(new_rows, columns=LEADERBOARD_COLUMNS)
+            store.upsert(new_rows)
+            if events is not None:
+                EventStore().upsert(events.keys, *events.to_data_frames())
+            update_leaderboard(store, new_rows, old_rows)
+            store_state_json(**jira.checkpoint(), state_path=get_state_path(project))
+    elif update_type == 'reparse':
+        from history import EventCollector, EventStore
 
-    return data_frame
+        cache = IssueCache()
+        print("Reparsing {} cached issues".format(len(cache)))
+        jira = JirApi(basic_auth=False)
+        events = EventCollector()
+        store.save(jira.store_issues(empty_data_frame(), cache.issues(), events=events))
+        if len(events):
+            print("Rebuilding changelog and worklog events of {} issues".format(len(events)))
+            EventStore().save(events.keys, *events.to_data_frames())
+    if update_type in ('all', 'reparse'):
+        update_leaderboard(store)
 
+    return store
 
-def create_training_subset(data_frame):
+
+def update_leaderboard(store, new_rows=None, old_rows=None):
     """
-    Strips out all rows that do not have an actual time spent value.
-    :param data_frame: pandas data frame
-    :return: training set data frame
+    Folds synced issues into the leaderboard rollups, or rebuilds them from the store when there are no rollups yet
+    or the whole store was rewritten
+    :param store: IssueStore the issues were written to
+    :param new_rows: pandas data frame of synced issues, or None to rebuild
+    :param old_rows: pandas data frame of the previously stored versions of new_rows
     """
-    training_set = data_frame.loc[data_frame['time_spent'].notnull()]
-    return training_set
+    from leaderboard import ISSUE_COLUMNS as LEADERBOARD_COLUMNS, Leaderboard
+
+    with stage('leaderboard') as leaderboard_stage:
+        leaderboard = Leaderboard()
+        if new_rows is not None and leaderboard.exists():
+            leaderboard.update(new_rows, old_rows)
+            leaderboard_stage.rows = len(new_rows)
+        else:
+            issues = store.load(columns=LEADERBOARD_COLUMNS)
+            leaderboard.rebuild(issues)
+            leaderboard_stage.rows = len(issues)
+        leaderboard.save()
 
 
-def vectorize_text_fields(data_frame):
+def print_leaderboard(metric, role='assignee', dimension='all', value=None, limit=10):
     """
-    Creates a tfidf vector for all columns of dtype numpy.object
-    :param data_frame: pandas data frame
-    :return: pandas data frame
+    Prints a leaderboard from the saved rollups, or of worklog authors from the event store
+    :param metric: one of leaderboard.METRICS or history.WORKLOG_METRIC
+    :param role: 'assignee' or 'reporter'; ignored for worklogs
+    :param dimension: one of leaderboard.DIMENSIONS; ignored for worklogs
+    :param value: slice to show (e.g. a sprint name), or None for every slice
+    :param limit: number of people per slice
     """
-    vectorizer = TfidfVectorizer()
-    excluded_columns = ['time_spent', 'key', 'original_estimate', 'remaining_estimate']
-    for column_name in data_frame:
-        if column_name not in excluded_columns and data_frame[column_name].dtype == numpy.object:
-            tfidf_vect = vectorizer.fit_transform(data_frame[column_name].values.astype('U'))
-            vect_df = list(tfidf_vect.toarray())
-            # data_frame = pandas.concat([data_frame, vect_df])
-            data_frame[column_name] = vect_df
+    if metric == WORKLOG_METRIC:
+        from history import WORKLOG, EventStore, rank_worklogs
 
-    return data_frame
+        worklog = EventStore().load(WORKLOG, columns=['author', 'time_spent'])
+        if worklog.empty:
+            raise FileNotFoundError('No worklogs found. Use main.py fetch or sync with --history to fetch them.')
+        print(rank_worklogs(worklog, limit=limit).to_string(index=False))
+        return
+    from leaderboard import Leaderboard
+    from store import IssueStore
 
+    leaderboard = Leaderboard()
+    if not leaderboard.exists():
+        update_leaderboard(IssueStore())
+        leaderboard = Leaderboard()
+    print(leaderboard.rank(metric, role=role, dimension=dimension, value=value, limit=limit).to_string(index=False))
 
-def convert_datetimes_to_ordinals(data_frame):
+
+def run_query(query, remote=False, rate_limit=20.0):
     """
-    Converts datetime columns in data frame to ordinals
-    :param data_frame: pandas data frame
-    :return: pandas data frame
+    Prints the issues matching a saved filter or JQL query, answered from the issue store when possible
+    :param query: jql.ProductionSupportFilters name or JQL
+    :param remote: always ask JIRA
+    :param rate_limit: maximum requests per second sent to JIRA
     """
-    date_columns = ['created_datetime', 'updated_datetime', 'resolved_datetime']
-    for column in date_columns:
-        data_frame[column] = pandas.to_datetime(data_frame[column])
-        data_frame[column] = data_frame[column].map(datetime.datetime.toordinal)
+    from jql import QUERY_CACHE_DIR, FilterRunner
+    from store import IssueStore
 
-    return data_frame
+    # results from JIRA are kept on disk, since every run is a new process
+    runner = FilterRunner(store=IssueStore(), cache_dir=QUERY_CACHE_DIR, rate_limit=rate_limit)
+    result = runner.run(query, local=False if remote else None)
+    print(result[['status', 'assignee', 'summary']].to_string())
+    print('{} issues'.format(len(result)))
 
 
-if __name__ == '__main__':
-    parser = ArgumentParser()
-    group = parser.add_mutually_exclusive_group()
-    group.add_argument(
-        "-u",
-        "--update-issues",
-        dest="update_issues",
-        help="Update issue data set",
-        action="store_true",
+def get_sync_start(store, project):
+    """
+    Finds the point to sync a project from: its stored checkpoint, else the newest updated timestamp of its
+    stored issues
+    :param store: IssueStore of previously fetched issues
+    :param project: project key
+    :return: timezone aware datetime
+    """
+    from api import load_state_json
+    from crawler import get_state_path
+
+    last_updated = load_state_json(get_state_path(project)).get('last_updated')
+    if last_updated:
+        return last_updated
+    updated = store.load(columns=['updated_datetime'], projects=[project])['updated_datetime']
+    if updated.isnull().all():
+        raise ValueError(
+            'No {} issue data to update. Use main.py fetch to create the issue data set.'.format(project))
+    return updated.max().to_pydatetime()
+
+
+def positive_float(value):
+    """
+    argparse type for options that must be a positive number
+    :param value: raw command line value
+    :return: float value
+    """
+    number = float(value)
+    if number <= 0:
+        raise ArgumentTypeError('{} is not a positive number'.format(value))
+    return number
+
+
+def positive_int(value):
+    """
+    argparse type for options that must be a positive integer
+    :param value: raw command line value
+    :return: int value
+    """
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError('{} is not a positive integer'.format(value))
+    return number
+
+
+COMMANDS = {
+    'fetch': fetch,
+    'sync': sync,
+    'reparse': reparse,
+    'train': train,
+    'predict': predict,
+    'report': report,
+    'leaderboard': print_leaderboard,
+    'query': run_query,
+}
+
+
+def build_parser():
+    """
+    Command line parser with a subcommand per COMMANDS entry; each subcommand's options are named after the
+    arguments of its function
+    :return: ArgumentParser
+    """
+    telemetry_options = ArgumentParser(add_help=False)
+    telemetry_options.add_argument(
+        "--metrics",
+        dest="metrics_path",
+        help="Write stage timings, request latencies and other counters to this file, as Prometheus text if it "
+             "ends in .prom, else as JSON",
+    )
+    telemetry_options.add_argument(
+        "--profile",
+        dest="profile_stages",
+        nargs="+",
+        metavar="STAGE",
+        help="Profile these stages (fetch, parse, store, events, train, features, search, fit, leaderboard, "
+             "report, ...) into {}/".format(PROFILE_DIR),
+    )
+    telemetry_options.add_argument(
+        "--profile-mode",
+        dest="profile_mode",
+        choices=PROFILE_MODES,
+        default="cprofile",
+        help="cprofile for exact call counts, sample for low-overhead collapsed stacks",
     )
-    group.add_argument(
-        "-U",
-        "--update-all-issues",
-        dest="update_all_issues",
-        help="Recreate issue data set",
+    rate_options = ArgumentParser(add_help=False)
+    rate_options.add_argument(
+        "-r",
+        "--rate-limit",
+        type=positive_float,
+        dest="rate_limit",
+        default=20.0,
+        help="Maximum requests per second sent to each JIRA instance",
+    )
+    crawl_options = ArgumentParser(add_help=False)
+    crawl_options.add_argument(
+        "--history",
+        dest="history",
+        help="Also fetch issue changelogs and worklogs for cycle time, time in status and worklog leaderboards",
         action="store_true",
     )
-    parser.add_argument(
+    crawl_options.add_argument(
+        "--instances",
+        dest="instances_path",
+        help="JSON list of JIRA instances and projects to crawl in parallel (default {} if present, "
+             "else FARM)".format(INSTANCES_FILE),
+    )
+    model_options = ArgumentParser(add_help=False)
+    model_options.add_argument(
+        "--model-path",
+        dest="model_path",
+        default=MODEL_PATH,
+        help="Model artifact to save or load",
+    )
+
+    parser = ArgumentParser()
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+    fetch_parser = commands.add_parser(
+        "fetch",
+        parents=[telemetry_options, rate_options, crawl_options],
+        help="Recreate the issue data set",
+    )
+    fetch_parser.add_argument(
         "-s",
         "--start-issue",
-        type=int,
+        type=positive_int,
         dest="start_issue",
+        default=1,
         help="First issue to pull",
     )
-    parser.add_argument(
+    fetch_parser.add_argument(
         "-e",
         "--end-issue",
         type=int,
         dest="end_issue",
-        help="Last issue to pull",
+        help="Last issue to pull (default: the highest issue number in the project, found with one search)",
+    )
+    fetch_parser.add_argument(
+        "--resume",
+        dest="resume",
+        help="Resume an interrupted fetch after the last chunk written",
+        action="store_true",
+    )
+    fetch_parser.add_argument(
+        "--chunk-size",
+        type=positive_int,
+        dest="chunk_size",
+        default=500,
+        help="Number of issues written to the issue store at a time",
+    )
+    fetch_parser.add_argument(
+        "-b",
+        "--bulk",
+        dest="bulk",
+        help="Fetch issues in pages from the search endpoint",
+        action="store_true",
+    )
+    fetch_parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=positive_int,
+        dest="concurrency",
+        default=1,
+        help="Number of issues, or with --bulk key range chunks, to fetch in parallel",
+    )
+
+    commands.add_parser(
+        "sync",
+        parents=[telemetry_options, rate_options, crawl_options],
+        help="Update the issue data set with the issues changed since the last sync",
+    )
+
+    commands.add_parser(
+        "reparse",
+        parents=[telemetry_options],
+        help="Rebuild the issue data set from the raw issue cache without contacting JIRA",
+    )
+
+    train_parser = commands.add_parser(
+        "train",
+        parents=[telemetry_options, model_options],
+        help="Train a time spent model on the issue data set",
     )
-    parser.add_argument(
-        "-m",
-        "--update-model",
-        dest="update_model",
-        help="Update model flag",
+    train_parser.add_argument(
+        "-i",
+        "--incremental",
+        dest="incremental",
+        help="Update the saved model with issues changed since it was trained instead of retraining",
         action="store_true",
     )
-    args = parser.parse_args()
-    update_issues_flag = args.update_issues
-    update_all_issues = args.update_all_issues
-    update_model_flag = args.update_model
-    start_issue = args.start_issue
-    end_issue = args.end_issue
-
-    if update_all_issues:
-        update_type = 'all'
-    elif update_issues_flag:
-        update_type = 'append'
-    else:
-        update_type = None
-
-    main(update_type, update_model_flag, start_issue, end_issue)
+    train_parser.add_argument(
+        "--replace",
+        dest="replace",
+        help="With --incremental, overwrite a saved model that can not be updated incrementally",
+        action="store_true",
+    )
+    train_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        dest="n_jobs",
+        default=-1,
+        help="Number of cores used by the hyperparameter search (-1 for all)",
+    )
+
+    predict_parser = commands.add_parser(
+        "predict",
+        parents=[telemetry_options, rate_options, model_options],
+        help="Predict time spent for the given issues using the saved model",
+    )
+    predict_parser.add_argument(
+        "issue_keys",
+        nargs="+",
+        metavar="ISSUE_KEY",
+        help="Issue to fetch from JIRA and predict",
+    )
+
+    report_parser = commands.add_parser(
+        "report",
+        parents=[telemetry_options],
+        help="Render every chart into a local report directory",
+    )
+    report_parser.add_argument(
+        "-o",
+        "--output-dir",
+        dest="output_dir",
+        default=REPORT_DIR,
+        help="Report directory (default {})".format(REPORT_DIR),
+    )
+    report_parser.add_argument(
+        "--format",
+        dest="formats",
+        nargs="+",
+        choices=["html", "png"],
+        default=["html"],
+        help="Report file formats; png needs the kaleido package",
+    )
+
+    leaderboard_parser = commands.add_parser(
+        "leaderboard",
+        parents=[telemetry_options],
+        help="Print a leaderboard ranked by a metric",
+    )
+    leaderboard_parser.add_argument(
+        "metric",
+        choices=METRICS + [WORKLOG_METRIC],
+        help="Metric to rank people by",
+    )
+    leaderboard_parser.add_argument(
+        "--role",
+        dest="role",
+        choices=ROLES,
+        default="assignee",
+        help="Rank assignees or reporters",
+    )
+    leaderboard_parser.add_argument(
+        "--slice",
+        dest="dimension",
+        choices=list(DIMENSIONS),
+        default="all",
+        help="Rank within each sprint, component or fix version",
+    )
+    leaderboard_parser.add_argument(
+        "--slice-value",
+        dest="value",
+        help="Only show this sprint, component or fix version",
+    )
+    leaderboard_parser.add_argument(
+        "--top",
+        type=positive_int,
+        dest="limit",
+        default=10,
+        help="Number of people shown per slice",
+    )
+
+    query_parser = commands.add_parser(
+        "query",
+        parents=[telemetry_options, rate_options],
+        help="Print the issues matching a saved filter or JQL query",
+    )
+    query_parser.add_argument(
+        "query",
+        metavar="FILTER_OR_JQL",
+        help="Saved filter ({}) or JQL query, answered from the issue store when it only uses fields the store "
+             "holds".format(', '.join(get_filters())),
+    )
+    query_parser.add_argument(
+        "--remote",
+        dest="remote",
+        help="Always run the query on the JIRA server",
+        action="store_true",
+    )
+    return parser
+
+
+if __name__ == '__main__':
+    args = vars(build_parser().parse_args())
+    command = args.pop('command')
+    metrics_path = args.pop('metrics_path')
+    profile_stages = args.pop('profile_stages')
+    profile_mode = args.pop('profile_mode')
+    profile = None
+    if profile_stages:
+        profile = {'stages': profile_stages, 'mode': profile_mode}
+
+    main(command, metrics_path=metrics_path, profile=profile, **args)
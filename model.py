@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+
+import joblib
+import numpy
+import pandas
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import MaxAbsScaler
+
+from api import parse_issue_json
+from constants import HEADER, MODEL_PATH
+from features import HashingFeatureBuilder
+
+ARTIFACT_VERSION = 1
+SCHEMA_HASH = hashlib.sha256(json.dumps(HEADER).encode('utf-8')).hexdigest()
+
+
+class ModelArtifactError(Exception):
+    pass
+
+
+class ModelArtifact(object):
+    """
+    A trained estimator together with the fitted FeatureBuilder it was trained on, saved and loaded as one
+    file. The artifact records its format version and a hash of HEADER, so a model is never scored against
+    features built from a different column layout. Inference only calls transform on the saved builder.
+    """
+    def __init__(self, features, estimator, metadata=None):
+        self.features = features
+        self.estimator = estimator
+        self.metadata = metadata or {}
+        self.version = ARTIFACT_VERSION
+        self.schema_hash = SCHEMA_HASH
+
+    def predict(self, data_frame):
+        """
+        Predicts time spent for issues
+        :param data_frame: pandas data frame of issues with HEADER columns
+        :return: numpy array of predicted seconds
+        """
+        return self.estimator.predict(self.features.transform(data_frame))
+
+    def predict_issues(self, issues):
+        """
+        Predicts time spent for raw issues, e.g. tickets fetched on demand
+        :param issues: list of issue JSON from JirApi
+        :return: pandas series of predicted seconds indexed by issue key
+        """
+        data_frame = pandas.DataFrame([parse_issue_json(issue) for issue in issues], columns=HEADER)
+        return pandas.Series(self.predict(data_frame), index=data_frame['key'].tolist())
+
+    def supports_updates(self):
+        return isinstance(self.features, HashingFeatureBuilder) and hasattr(self.estimator, 'partial_fit')
+
+    def update(self, data_frame):
+        """
+        Updates the model in place with issues changed since it was last trained, so the cost of an update is
+        proportional to the new rows rather than the whole history
+        :param data_frame: pandas data frame of issues; rows at or before the trained_through watermark are skipped
+        :return: number of issues trained on
+        """
+        if not self.supports_updates():
+            raise ModelArtifactError('Model can not be updated incrementally. Retrain with main.py train.')
+        new_rows = select_new_rows(data_frame, self.metadata.get('trained_through'))
+        new_rows = new_rows.loc[new_rows['time_spent'].notnull()]
+        if not new_rows.empty:
+            self.estimator.partial_fit(self.features.transform(new_rows), new_rows['time_spent'])
+            self.record_training(new_rows)
+        return len(new_rows)
+
+    def record_training(self, data_frame):
+        """
+        Tracks how many issues the model has seen and the newest updated timestamp among them
+        :param data_frame: pandas data frame of issues the model was just trained on
+        """
+        updated = pandas.to_datetime(data_frame['updated_datetime'], utc=True, errors='coerce', format='ISO8601')
+        self.metadata['rows'] = self.metadata.get('rows', 0) + len(data_frame)
+        if updated.notnull().any():
+            trained_through = self.metadata.get('trained_through')
+            if trained_through is None or updated.max() > trained_through:
+                self.metadata['trained_through'] = updated.max()
+
+    def save(self, path=MODEL_PATH):
+        payload = {
+            'version': self.version,
+            'schema_hash': self.schema_hash,
+            'features': self.features,
+            'estimator': self.estimator,
+            'metadata': self.metadata,
+        }
+        temp_path = '{}.tmp'.format(path)
+        joblib.dump(payload, temp_path)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        """
+        Loads a saved artifact, refusing ones written for another format version or column layout
+        :param path: path of the artifact file
+        :return: ModelArtifact
+        """
+        payload = joblib.load(path)
+        if not isinstance(payload, dict) or payload.get('version') != ARTIFACT_VERSION:
+            raise ModelArtifactError('{} is not a version {} model artifact. Retrain with main.py train.'.format(
+                path, ARTIFACT_VERSION))
+        if payload['schema_hash'] != SCHEMA_HASH:
+            raise ModelArtifactError(
+                '{} was trained on a different issue schema. Retrain with main.py train.'.format(path))
+        return cls(payload['features'], payload['estimator'], payload['metadata'])
+
+
+class IncrementalRegressor(object):
+    """
+    Out-of-core time spent regressor: a MaxAbsScaler (keeps the design matrix sparse) feeding an SGDRegressor,
+    both updated with partial_fit. Targets are fitted in hours, which keeps SGD stable, and predicted in seconds.
+    """
+    def __init__(self, random_state=100):
+        self.scaler = MaxAbsScaler()
+        self.regressor = SGDRegressor(random_state=random_state)
+
+    def partial_fit(self, x_vals, y_vals):
+        self.scaler.partial_fit(x_vals)
+        self.regressor.partial_fit(self.scaler.transform(x_vals), numpy.asarray(y_vals, dtype=float) / 3600)
+        return self
+
+    def predict(self, x_vals):
+        return self.regressor.predict(self.scaler.transform(x_vals)) * 3600
+
+
+def select_new_rows(data_frame, trained_through):
+    """
+    Rows updated after a model's watermark
+    :param data_frame: pandas data frame of issues
+    :param trained_through: timezone aware timestamp, or None for every row
+    :return: pandas data frame
+    """
+    if trained_through is None:
+        return data_frame
+    updated = pandas.to_datetime(data_frame['updated_datetime'], utc=True, errors='coerce', format='ISO8601')
+    return data_frame.loc[updated > trained_through]
@@ -0,0 +1,182 @@
+import queue
+import threading
+
+from api import STATE_FILE, compact_issue, get_issue_num, parse_records, store_state_json
+from telemetry import stage
+
+DONE = object()
+
+
+class IngestionPipeline(object):
+    """
+    Streams a crawl into the issue store: fetch -> compact -> parse -> filter EXCLUDED_ISSUE_TYPES -> write
+    chunk. With an event store, each chunk's changelog and worklog events are written alongside it.
+    Fetching and writing run on their own threads behind bounded queues, so a slow stage blocks the ones
+    feeding it. The fetch thread shrinks each payload to an IssueRecord before queueing it, so about
+    (2 * chunk_size records + max_pending_chunks parsed chunks) are held in memory and no raw JSON. After each
+    chunk is written its last issue key is checkpointed as a high-water mark, so an interrupted crawl can resume
+    after the last flushed chunk. The mark only advances while issues arrive in increasing key order: once an
+    issue arrives out of order, every issue below the mark is no longer known to be flushed, so the mark is left
+    where it was. It is cleared once the crawl completes.
+    """
+    def __init__(self, jira, store, chunk_size=500, max_pending_chunks=2, state_path=STATE_FILE, event_store=None):
+        self.jira = jira
+        self.store = store
+        self.event_store = event_store
+        self.chunk_size = chunk_size
+        self.max_pending_chunks = max_pending_chunks
+        self.state_path = state_path
+        self.stopped = threading.Event()
+        self.errors = []
+        self.flushed_chunks = 0
+        self.flushed_rows = 0
+
+    def run(self, bulk=False):
+        """
+        Runs the crawl to completion
+        :param bulk: fetch issues in pages from the search endpoint instead of one request per issue
+        :return: number of rows written
+        """
+        issue_queue = queue.Queue(maxsize=self.chunk_size)
+        chunk_queue = queue.Queue(maxsize=self.max_pending_chunks)
+        fetcher = threading.Thread(target=self.fetch, args=(issue_queue, bulk), daemon=True)
+        writer = threading.Thread(target=self.write, args=(chunk_queue,), daemon=True)
+        fetcher.start()
+        writer.start()
+        try:
+            self.parse(issue_queue, chunk_queue)
+        except Exception as e:
+            self.fail(e)
+        finally:
+            # the writer drains everything up to DONE, so this cannot block for long
+            chunk_queue.put(DONE)
+            writer.join()
+            self.stopped.set()
+            fetcher.join()
+        if self.errors:
+            raise self.errors[0]
+        store_state_json(clear_flushed_key=True, state_path=self.state_path)
+        return self.flushed_rows
+
+    def fetch(self, issue_queue, bulk):
+        extract = None
+        if self.event_store is not None:
+            # history loads pandas and pyarrow, so it is only imported when events are wanted
+            from history import extract_events as extract
+        try:
+            if bulk:
+                issues = (issue for batch in self.jira.all_issues_bulk() for issue in batch)
+            else:
+                issues = self.jira.all_issues()
+            for issue in issues:
+                if 'key' not in issue:
+                    # error body for a missing issue
+                    continue
+                if not self.put(issue_queue, compact_issue(issue, extract)):
+                    return
+        except Exception as e:
+            # let the issues fetched so far flow through and be written before the error is raised
+            self.errors.append(e)
+        finally:
+            self.put(issue_queue, DONE)
+
+    def parse(self, issue_queue, chunk_queue):
+        pending = []
+        last_issue_num = 0
+        in_order = True
+        while True:
+            record = self.get(issue_queue)
+            if record is DONE:
+                break
+            self.jira.update_checkpoint(record.key, record.get('updated_datetime'))
+            issue_num = get_issue_num({'key': record.key})
+            in_order = in_order and issue_num > last_issue_num
+            last_issue_num = issue_num
+            pending.append(record)
+            if len(pending) >= self.chunk_size:
+                if not self.put(chunk_queue, self.make_chunk(pending, in_order)):
+                    return
+                pending = []
+        if pending and not self.stopped.is_set():
+            self.put(chunk_queue, self.make_chunk(pending, in_order))
+
+    def make_chunk(self, records, in_order=True):
+        """
+        :param records: IssueRecords to write
+        :param in_order: whether every issue so far arrived in increasing key order
+        :return: (data frame, EventCollector or None, last issue key, whether to checkpoint it)
+        """
+        events = None
+        if self.event_store is not None:
+            from history import EventCollector
+            events = EventCollector()
+            for record in records:
+                if record.events is not None:
+                    events.add_events(record.key, *record.events)
+        return parse_records(records).to_data_frame(), events, records[-1].key, in_order
+
+    def write(self, chunk_queue):
+        while True:
+            item = chunk_queue.get()
+            if item is DONE:
+                return
+            if self.stopped.is_set():
+                continue
+            data_frame, events, last_key, checkpoint = item
+            try:
+                with stage('store', rows=len(data_frame)):
+                    self.store.upsert(data_frame)
+                if events is not None:
+                    with stage('events', rows=len(events)):
+                        self.event_store.upsert(events.keys, *events.to_data_frames())
+                if self.jira.cache is not None:
+                    self.jira.cache.flush()
+                if checkpoint:
+                    store_state_json(last_flushed_key=last_key, state_path=self.state_path)
+            except Exception as e:
+                self.fail(e)
+                continue
+            self.flushed_chunks += 1
+            self.flushed_rows += len(data_frame)
+            print('Flushed {} issues through {}'.format(self.flushed_rows, last_key))
+
+    def put(self, target_queue, item):
+        """
+        Blocking put that gives up once the pipeline has stopped
+        :return: True if the item was queued
+        """
+        while not self.stopped.is_set() or item is DONE:
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if item is DONE and self.stopped.is_set():
+                    return False
+        return False
+
+    def get(self, source_queue):
+        """
+        Blocking get that returns DONE once the pipeline has stopped
+        """
+        while not self.stopped.is_set():
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return DONE
+
+    def fail(self, error):
+        self.errors.append(error)
+        self.stopped.set()
+
+
+def get_resume_issue(state):
+    """
+    Finds the first issue number after the last flushed chunk of an interrupted crawl
+    :param state: sync state from load_state_json
+    :return: issue number to resume from, or None if there is nothing to resume
+    """
+    last_flushed_key = state.get('last_flushed_key')
+    if not last_flushed_key:
+        return None
+    return get_issue_num({'key': last_flushed_key}) + 1
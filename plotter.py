@@ -1,49 +1,65 @@
-from plotly import plotly
-from plotly.graph_objs import Scatter, Bar, Layout, Data, Figure
+import html
+import os
 
+import numpy
+import pandas
+from plotly.graph_objects import Bar, Figure, Layout, Scatter, Scattergl
+from plotly.offline import get_plotlyjs
 
-def time_estimates_plot(data_frame, xrange=None):
-    trace0 = Scatter(
-        x=data_frame.index.tolist(),
-        y=data_frame['time_spent'],
+import analytics
+from constants import REPORT_DIR
+from telemetry import stage
+
+# series longer than this are averaged into buckets of consecutive issues
+MAX_POINTS = 5000
+# scatter traces longer than this are drawn with WebGL
+WEBGL_THRESHOLD = 1000
+
+
+def time_estimates_figure(data_frame, xrange=None, max_points=MAX_POINTS):
+    data_frame, bucket_size = downsample(data_frame, ['time_spent', 'original_estimate'], max_points)
+    scatter = Scattergl if len(data_frame) > WEBGL_THRESHOLD else Scatter
+    x_vals = data_frame.index.to_numpy()
+    trace0 = scatter(
+        x=x_vals,
+        y=data_frame['time_spent'].to_numpy(),
         mode='markers',
         name='Time Spent'
     )
-    trace1 = Scatter(
-        x=data_frame.index.tolist(),
-        y=data_frame['original_estimate'],
+    trace1 = scatter(
+        x=x_vals,
+        y=data_frame['original_estimate'].to_numpy(),
         mode='markers',
         name='Original Estimate'
     )
     trace2 = Bar(
-        x=data_frame.index.tolist(),
-        y=data_frame['original_estimate'] - data_frame['time_spent'],
+        x=x_vals,
+        y=(data_frame['original_estimate'] - data_frame['time_spent']).to_numpy(),
         name='Difference'
     )
-    data = Data([trace0, trace1, trace2])
+    title = 'Time Estimate Accuracy'
+    if bucket_size > 1:
+        title += ' (mean per {} issues)'.format(bucket_size)
     layout = Layout(
-        title='Time Estimate Accuracy',
+        title=title,
         xaxis=dict(
-            title='Issue Number',
+            title='Issue Key',
             range=xrange
         ),
         yaxis=dict(
             title='Time (s)'
         ),
     )
-    figure = Figure(data=data, layout=layout)
-    plotly.plot(figure, filename='test')
+    return Figure(data=[trace0, trace1, trace2], layout=layout)
 
 
-def bugs_open_by_sprint(data_frame, xrange=None):
+def bugs_open_by_sprint_figure(data_frame, xrange=None):
     bugs_tally, sprint_list = _tally_bugs_by_sprint(data_frame)
     trace0 = Bar(
         x=sprint_list,
-        y=[bugs_tally[sprint] for sprint in sprint_list],
+        y=[bugs_tally.get(sprint, 0) for sprint in sprint_list],
         name='Total Bugs'
     )
-
-    data = Data([trace0])
     layout = Layout(
         title='Bugs Open by Sprint',
         xaxis=dict(
@@ -54,57 +70,113 @@ def bugs_open_by_sprint(data_frame, xrange=None):
             title='Number of Bugs'
         ),
     )
-    figure = Figure(data=data, layout=layout)
-    plotly.plot(figure, filename='test')
+    return Figure(data=[trace0], layout=layout)
 
 
-def _tally_bugs_by_sprint(data_frame):
-    tally = {}
-    sprint_list = []
-    for i, row in data_frame.iterrows():
-        sprints = row['sprints'].split(',') if row['sprints'] else None
-        if sprints:
-            for sprint in sprints:
-                if sprint not in sprint_list:
-                    sprint_list.append(sprint)
-        if row['issue_type'] == 'Bug' and sprints:
-            tally.update({sprint: tally.setdefault(sprint, 0) + 1 for sprint in sprints})
+FIGURES = {
+    'time_estimates': time_estimates_figure,
+    'bugs_open_by_sprint': bugs_open_by_sprint_figure,
+}
+
+
+def time_estimates_plot(data_frame, xrange=None, path='time_estimates.html'):
+    write_figure(time_estimates_figure(data_frame, xrange), path)
+
+
+def bugs_open_by_sprint(data_frame, xrange=None, path='bugs_open_by_sprint.html'):
+    write_figure(bugs_open_by_sprint_figure(data_frame, xrange), path)
+
+
+def write_figure(figure, path):
+    """
+    Writes a figure to a standalone local file
+    :param figure: plotly Figure
+    :param path: output path; .png needs the optional kaleido package, anything else is written as html
+    """
+    if path.endswith('.png'):
+        figure.write_image(path)
+    else:
+        figure.write_html(path, include_plotlyjs=True)
+
 
-    return tally, sprint_list
+def render_report(data_frame, output_dir=REPORT_DIR, formats=('html',)):
+    """
+    Renders every chart in one pass into output_dir: index.html with all charts sharing one local copy of
+    plotly.js, and/or one PNG per chart. Nothing is uploaded.
+    :param data_frame: pandas data frame of issues
+    :param output_dir: directory the report is written to
+    :param formats: any of 'html' and 'png'
+    :return: list of paths written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    figures = {}
+    for name, build_figure in FIGURES.items():
+        with stage('figure_' + name, rows=len(data_frame)):
+            figures[name] = build_figure(data_frame)
+    paths = []
+    if 'html' in formats:
+        with stage('report_html', rows=len(figures)):
+            paths.append(os.path.join(output_dir, 'plotly.min.js'))
+            with open(paths[-1], 'w') as js_file:
+                js_file.write(get_plotlyjs())
+            paths.append(os.path.join(output_dir, 'index.html'))
+            with open(paths[-1], 'w') as html_file:
+                html_file.write(report_html(figures, analytics.estimate_accuracy(data_frame)))
+    if 'png' in formats:
+        with stage('report_png', rows=len(figures)):
+            for name, figure in figures.items():
+                paths.append(os.path.join(output_dir, '{}.png'.format(name)))
+                figure.write_image(paths[-1])
+    return paths
+
+
+def report_html(figures, estimate_accuracy):
+    rows = ''.join(
+        '<tr><th>{}</th><td>{}</td></tr>'.format(html.escape(name.replace('_', ' ')), format_value(value))
+        for name, value in estimate_accuracy.items()
+    )
+    charts = ''.join(figure.to_html(full_html=False, include_plotlyjs=False) for figure in figures.values())
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>JIRA report</title>'
+        '<script src="plotly.min.js"></script></head><body>'
+        '<h1>JIRA report</h1><table>{}</table>{}</body></html>'
+    ).format(rows, charts)
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return '' if numpy.isnan(value) else '{:.2f}'.format(value)
+    return str(value)
+
+
+def downsample(data_frame, columns, max_points=MAX_POINTS):
+    """
+    Averages columns over buckets of consecutive rows so at most max_points remain
+    :param data_frame: pandas data frame indexed by issue number
+    :param columns: numeric columns to keep
+    :param max_points: maximum number of rows returned
+    :return: (pandas data frame indexed by the first issue number of each bucket, bucket size)
+    """
+    values = data_frame[columns].apply(pandas.to_numeric, errors='coerce')
+    if len(values) <= max_points:
+        return values, 1
+    bucket_size = -(-len(values) // max_points)
+    buckets = numpy.arange(len(values)) // bucket_size
+    downsampled = values.groupby(buckets).mean()
+    downsampled.index = values.index[::bucket_size]
+    return downsampled, bucket_size
+
+
+def _tally_bugs_by_sprint(data_frame):
+    bug_counts = analytics.bugs_by_sprint(data_frame)
+    tally = {sprint: int(count) for sprint, count in bug_counts.items() if count}
+    return tally, bug_counts.index.tolist()
 
 
 def calc_average_time_est_error(data_frame):
     """
     Calculates average time estimation error.
-    :param data_frame:
-    :return:
+    :param data_frame: pandas data frame with original_estimate and time_spent columns
+    :return: dict of over/under/spot on counts and average estimate, actual and difference in minutes
     """
-    # TODO: Refactor me. I am a mess.
-    overestimated_count = 0
-    underestimated_count = 0
-    spot_on = 0
-    total_diff = 0
-    time_tracked_issues = 0
-    for i, row in data_frame.iterrows():
-        original_estimate = row['original_estimate'] if pd.notnull(row['original_estimate']) else None
-        time_spent = row['time_spent'] if pd.notnull(row['time_spent']) else None
-        if original_estimate and time_spent:
-            if original_estimate < time_spent:
-                underestimated_count += 1
-            elif original_estimate > time_spent:
-                overestimated_count += 1
-            else:
-                spot_on += 1
-            time_tracked_issues += 1
-            diff = original_estimate - time_spent
-            total_diff += diff
-    average_estimate = round(data_frame['original_estimate'].mean() / 60, 2)
-    average_actual = round(data_frame['time_spent'].mean() / 60, 2)
-    average_diff = round(total_diff / (time_tracked_issues * 60), 2)
-    print('Overestimated issues: {}'.format(overestimated_count))
-    print('Underestimated issues: {}'.format(underestimated_count))
-    print('Spot on: {}'.format(spot_on))
-    print('Total time tracked issues: {}'.format(time_tracked_issues))
-    print('Average etimate: {}m'.format(average_estimate))
-    print('Average actual: {}m'.format(average_actual))
-    print('Average estimate off by {}m.'.format(average_diff))
+    return analytics.estimate_accuracy(data_frame)
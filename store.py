@@ -0,0 +1,220 @@
+import os
+import shutil
+import threading
+
+from api import sort_by_issue_key
+from constants import HEADER
+
+# pandas and pyarrow are imported where they are used, so a crawl is not held up loading them
+
+STORE_PATH = 'issues_store'
+PARTITION_COLUMNS = ['project', 'created_month']
+CATEGORICAL_COLUMNS = ['issue_type', 'status', 'reporter', 'assignee', 'priority']
+DATETIME_COLUMNS = [
+    'created_datetime',
+    'updated_datetime',
+    'resolved_datetime',
+    'sprint_start_datetime',
+    'sprint_end_datetime',
+]
+NUMERIC_COLUMNS = ['original_estimate', 'remaining_estimate', 'time_spent']
+
+
+class IssueStore(object):
+    """
+    Parquet issue store partitioned by project and created month (hive layout, e.g.
+    issues_store/project=FARM/created_month=2017-10/). Columns are typed so loads skip all string parsing,
+    and loads can be limited to the columns and partitions a caller needs. Issues are keyed by their full
+    issue key, so several projects can share one store; reads and writes are serialized so crawls of
+    different projects can upsert concurrently.
+    """
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.lock = threading.RLock()
+        self.schema_checked = False
+
+    def exists(self):
+        return os.path.isdir(self.path) and any(os.scandir(self.path))
+
+    def load(self, columns=None, projects=None, months=None):
+        """
+        Loads issues from the store
+        :param columns: list of HEADER columns to read, or None for all ('key' is always read)
+        :param projects: list of project keys to read, or None for all
+        :param months: list of created months ('YYYY-MM') to read, or None for all
+        :return: pandas data frame indexed by issue key
+        """
+        import pandas
+        import pyarrow.parquet
+        read_columns = None
+        if columns is not None:
+            read_columns = ['key'] + [column for column in columns if column != 'key']
+        if not self.exists():
+            return empty_data_frame(read_columns)
+        self.migrate_schema()
+        filters = []
+        if projects is not None:
+            filters.append(('project', 'in', list(projects)))
+        if months is not None:
+            filters.append(('created_month', 'in', list(months)))
+
+        # held so parallel crawls never list files another writer is replacing
+        with self.lock:
+            table = pyarrow.parquet.read_table(
+                self.path,
+                columns=read_columns,
+                filters=filters or None,
+                memory_map=True,
+                partitioning='hive',
+            )
+        data_frame = table.to_pandas()
+        data_frame = data_frame.drop(columns=[c for c in PARTITION_COLUMNS if c in data_frame.columns])
+        data_frame.index = pandas.Index(data_frame['key'].astype(str), name=None)
+        return sort_by_issue_key(data_frame[read_columns or HEADER])
+
+    def migrate_schema(self):
+        """
+        Rewrites a store saved before columns were added to HEADER, with the new columns empty until their issues
+        are fetched again. Checked once per IssueStore.
+        """
+        if self.schema_checked:
+            return
+        import pandas
+        import pyarrow.dataset
+        with self.lock:
+            self.schema_checked = True
+            fragments = list(pyarrow.dataset.dataset(self.path, format='parquet', partitioning='hive').get_fragments())
+            if all(set(HEADER).issubset(fragment.physical_schema.names) for fragment in fragments):
+                return
+            print('Adding new columns to {}'.format(self.path))
+            self.save(pandas.concat([normalize_types(fragment.to_table().to_pandas()) for fragment in fragments]))
+
+    def load_existing(self, data_frame, columns=None):
+        """
+        Loads the stored versions of issues, reading only the partitions they fall in
+        :param data_frame: pandas data frame of issues
+        :param columns: list of HEADER columns to read, or None for all
+        :return: pandas data frame of the issues that are already stored
+        """
+        if data_frame.empty:
+            return empty_data_frame(None if columns is None else ['key'] + [c for c in columns if c != 'key'])
+        partitions = partition_values(data_frame)
+        existing_rows = self.load(
+            columns=columns,
+            projects=partitions['project'].unique().tolist(),
+            months=partitions['created_month'].unique().tolist(),
+        )
+        return existing_rows.loc[existing_rows.index.isin(data_frame['key'].astype(str))]
+
+    def clear(self):
+        """
+        Removes every partition from the store
+        """
+        if os.path.isdir(self.path):
+            for entry in os.scandir(self.path):
+                if entry.is_dir() and entry.name.startswith('project='):
+                    shutil.rmtree(entry.path)
+
+    def save(self, data_frame):
+        """
+        Replaces the whole store with data_frame
+        :param data_frame: pandas data frame of issues
+        """
+        with self.lock:
+            self.write(data_frame, existing_data_behavior='delete_matching', replace_all=True)
+
+    def upsert(self, data_frame):
+        """
+        Inserts or replaces issues, rewriting only the partitions they fall in
+        :param data_frame: pandas data frame of new or updated issues
+        """
+        if data_frame.empty:
+            return
+        import pandas
+        with self.lock:
+            new_rows = normalize_types(data_frame)
+            partitions = partition_values(new_rows)
+            existing_rows = self.load(
+                projects=partitions['project'].unique().tolist(),
+                months=partitions['created_month'].unique().tolist(),
+            )
+            existing_rows = existing_rows.drop(new_rows.index, errors='ignore')
+            # only keep existing rows from partitions being rewritten
+            existing_partitions = partition_values(existing_rows)
+            touched = set(zip(partitions['project'], partitions['created_month']))
+            existing_pairs = zip(existing_partitions['project'], existing_partitions['created_month'])
+            keep = [pair in touched for pair in existing_pairs]
+            merged = pandas.concat([existing_rows[keep], new_rows]) if any(keep) else new_rows
+            self.write(merged, existing_data_behavior='delete_matching')
+
+    def write(self, data_frame, existing_data_behavior, replace_all=False):
+        import pandas
+        import pyarrow
+        import pyarrow.dataset
+        data_frame = normalize_types(data_frame)
+        table_frame = pandas.concat([data_frame, partition_values(data_frame)], axis=1)
+        table = pyarrow.Table.from_pandas(table_frame, preserve_index=False)
+        if replace_all:
+            self.clear()
+        pyarrow.dataset.write_dataset(
+            table,
+            self.path,
+            format='parquet',
+            partitioning=PARTITION_COLUMNS,
+            partitioning_flavor='hive',
+            existing_data_behavior=existing_data_behavior,
+            basename_template='part-{i}.parquet',
+        )
+
+    def migrate_csv(self, csv_path='issues.csv'):
+        """
+        One-time import of an issues.csv written by earlier versions
+        :param csv_path: path of the csv file
+        :return: pandas data frame that was stored
+        """
+        import pandas
+        data_frame = pandas.read_csv(csv_path, index_col=0)
+        self.save(data_frame)
+        return self.load()
+
+
+def normalize_types(data_frame):
+    """
+    Casts issue columns to their stored types: categoricals, UTC datetimes and floats
+    :param data_frame: pandas data frame of issues
+    :return: new pandas data frame with HEADER columns in order, indexed by issue key
+    """
+    import pandas
+    data_frame = data_frame.reindex(columns=HEADER).copy()
+    for column in HEADER:
+        if column in CATEGORICAL_COLUMNS:
+            data_frame[column] = data_frame[column].astype('string').astype('category')
+        elif column in DATETIME_COLUMNS:
+            data_frame[column] = pandas.to_datetime(data_frame[column], utc=True, errors='coerce', format='ISO8601')
+        elif column in NUMERIC_COLUMNS:
+            data_frame[column] = pandas.to_numeric(data_frame[column], errors='coerce').astype('float64')
+        else:
+            data_frame[column] = data_frame[column].astype('string')
+    data_frame.index = pandas.Index(data_frame['key'].astype(str), name=None)
+    return data_frame
+
+
+def partition_values(data_frame):
+    """
+    Computes the partition columns for each issue
+    :param data_frame: pandas data frame of issues with key and created_datetime columns
+    :return: pandas data frame of project and created_month, aligned with data_frame
+    """
+    import pandas
+    keys = data_frame['key'].astype('string')
+    created = pandas.to_datetime(data_frame['created_datetime'], utc=True, errors='coerce', format='ISO8601')
+    return pandas.DataFrame({
+        'project': keys.str.rsplit('-', n=1).str[0].fillna('unknown').astype(str),
+        'created_month': created.dt.strftime('%Y-%m').fillna('unknown').astype(str),
+    }, index=data_frame.index)
+
+
+def empty_data_frame(columns=None):
+    import pandas
+    return normalize_types(pandas.DataFrame(columns=HEADER))[columns or HEADER]
+
@@ -0,0 +1,333 @@
+import bisect
+import collections
+import contextlib
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+PREFIX = 'jira_'
+PROFILE_DIR = 'profiles'
+PROFILE_MODES = ['cprofile', 'sample']
+SAMPLE_INTERVAL = 0.005
+# upper bounds in seconds, as in the Prometheus client defaults plus 30s for slow searches
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# ru_maxrss is in bytes on macOS and kilobytes elsewhere
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+class Histogram(object):
+    """
+    Fixed-bucket histogram; quantiles are approximated by the upper bound of the bucket they fall in
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        :return: list of (upper bound, observations <= upper bound), ending with (inf, count)
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+
+    def as_dict(self):
+        result = {'count': self.count, 'sum': round(self.sum, 6)}
+        for q in QUANTILES:
+            result['p{}'.format(int(q * 100))] = self.quantile(q)
+        result['buckets'] = {format_bound(bound): total for bound, total in self.cumulative()}
+        return result
+
+
+class Stage(object):
+    """
+    Handed out by Telemetry.stage; set rows to the number of rows the stage processed
+    """
+    def __init__(self, name, rows=0):
+        self.name = name
+        self.rows = rows
+
+
+class Telemetry(object):
+    """
+    Thread-safe counters, high-water gauges, histograms and stage timers for one process. Every stage run
+    adds to the stage's wall time, call and row counts, and records how far it raised the process's peak RSS.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = collections.defaultdict(float)
+        self.gauges = {}
+        self.histograms = {}
+        self.profiler = None
+
+    def count(self, name, amount=1, **labels):
+        with self.lock:
+            self.counters[name, label_items(labels)] += amount
+
+    def high_water(self, name, value, **labels):
+        key = name, label_items(labels)
+        with self.lock:
+            if value > self.gauges.get(key, float('-inf')):
+                self.gauges[key] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = name, label_items(labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=0):
+        """
+        Times a block of work, profiling it too if profiling is enabled for the stage
+        :param name: stage name, e.g. 'parse'
+        :param rows: rows processed, if known up front; otherwise set the yielded Stage's rows
+        :return: context manager yielding a Stage
+        """
+        stage = Stage(name, rows)
+        rss_before = peak_rss()
+        started = time.perf_counter()
+        profile = self.profiler.profile(name) if self.profiler else contextlib.nullcontext()
+        try:
+            with profile:
+                yield stage
+        finally:
+            seconds = time.perf_counter() - started
+            rss_after = peak_rss()
+            self.count('stage_seconds', seconds, stage=name)
+            self.count('stage_calls', stage=name)
+            self.count('stage_rows', stage.rows, stage=name)
+            self.count('stage_rss_growth_bytes', rss_after - rss_before, stage=name)
+            self.high_water('peak_rss_bytes', rss_after)
+
+    def enable_profiling(self, stages, mode='cprofile', output_dir=PROFILE_DIR):
+        """
+        Profiles the given stages from now on, see StageProfiler
+        """
+        self.profiler = StageProfiler(stages, mode=mode, output_dir=output_dir)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def as_dict(self):
+        """
+        Snapshot of every metric, with the stage counters folded into one entry per stage
+        :return: dict of stages, counters, gauges and histograms
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: histogram.as_dict() for key, histogram in self.histograms.items()}
+        stages = collections.defaultdict(dict)
+        other_counters = {}
+        for (name, labels), value in counters.items():
+            value = int(value) if value.is_integer() else value
+            if name.startswith('stage_'):
+                stages[dict(labels)['stage']][name[len('stage_'):]] = value
+            else:
+                other_counters[metric_name(name, labels)] = value
+        for values in stages.values():
+            values['rows_per_sec'] = round(values['rows'] / values['seconds'], 2) if values['seconds'] else None
+            values['seconds'] = round(values['seconds'], 6)
+        return {
+            'stages': dict(stages),
+            'counters': other_counters,
+            'gauges': {metric_name(name, labels): value for (name, labels), value in gauges.items()},
+            'histograms': {metric_name(name, labels): value for (name, labels), value in histograms.items()},
+        }
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """
+        Renders every metric in the Prometheus text exposition format, e.g. for the node exporter's
+        textfile collector
+        :return: string
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, histogram.cumulative(), histogram.sum, histogram.count)
+                                for key, histogram in self.histograms.items())
+        lines = []
+        typed = set()
+
+        def add(name, metric_type, labels, value):
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE {} {}'.format(name, metric_type))
+            lines.append('{}{} {}'.format(name, format_labels(labels), format_number(value)))
+
+        for (name, labels), value in counters:
+            add(PREFIX + name + '_total', 'counter', labels, value)
+        for (name, labels), value in gauges:
+            add(PREFIX + name, 'gauge', labels, value)
+        for (name, labels), cumulative, total, count in histograms:
+            name = PREFIX + name
+            lines.append('# TYPE {} histogram'.format(name))
+            for bound, bucket_count in cumulative:
+                lines.append('{}_bucket{} {}'.format(
+                    name, format_labels(labels + (('le', format_bound(bound)),)), bucket_count))
+            lines.append('{}_sum{} {}'.format(name, format_labels(labels), format_number(total)))
+            lines.append('{}_count{} {}'.format(name, format_labels(labels), count))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Writes the metrics as Prometheus text if path ends in .prom, else as JSON
+        :param path: output path
+        """
+        with open(path, 'w') as metrics_file:
+            metrics_file.write(self.to_prometheus() if path.endswith('.prom') else self.to_json())
+
+
+class StageProfiler(object):
+    """
+    Opt-in profiling of named stages. 'cprofile' accumulates a cProfile per stage into <stage>.prof (open it
+    with pstats or snakeviz). 'sample' snapshots the stage thread's stack every interval into <stage>.folded,
+    collapsed stacks for flamegraph.pl or speedscope; it costs far less than cProfile on hot loops.
+    Only the outermost profiled stage on a thread is profiled, since a thread can run one profiler at a time.
+    """
+    def __init__(self, stages, mode='cprofile', output_dir=PROFILE_DIR, interval=SAMPLE_INTERVAL):
+        if mode not in PROFILE_MODES:
+            raise ValueError('Unknown profile mode {}, expected one of {}'.format(mode, ', '.join(PROFILE_MODES)))
+        self.stages = set(stages)
+        self.mode = mode
+        self.output_dir = output_dir
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.profiles = {}
+        self.samples = collections.defaultdict(collections.Counter)
+        self.active = threading.local()
+
+    @contextlib.contextmanager
+    def profile(self, stage):
+        if stage not in self.stages or getattr(self.active, 'stage', None):
+            yield
+            return
+        self.active.stage = stage
+        os.makedirs(self.output_dir, exist_ok=True)
+        try:
+            if self.mode == 'cprofile':
+                with self.lock:
+                    profile = self.profiles.setdefault(stage, cProfile.Profile())
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+                    with self.lock:
+                        profile.dump_stats(self.path(stage, 'prof'))
+            else:
+                sampler = StackSampler(threading.get_ident(), self.interval)
+                sampler.start()
+                try:
+                    yield
+                finally:
+                    sampler.stop()
+                    with self.lock:
+                        self.samples[stage].update(sampler.samples)
+                        with open(self.path(stage, 'folded'), 'w') as folded_file:
+                            for stack, count in self.samples[stage].most_common():
+                                folded_file.write('{} {}\n'.format(stack, count))
+        finally:
+            self.active.stage = None
+
+    def path(self, stage, extension):
+        return os.path.join(self.output_dir, '{}.{}'.format(stage, extension))
+
+
+class StackSampler(object):
+    """
+    Background thread counting the collapsed call stacks of another thread
+    """
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = collections.Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append('{}:{}'.format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+def peak_rss():
+    """
+    :return: the process's peak resident set size so far, in bytes
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+def label_items(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def metric_name(name, labels):
+    if not labels:
+        return name
+    return '{}{{{}}}'.format(name, ','.join('{}={}'.format(label, value) for label, value in labels))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join('{}="{}"'.format(
+        label, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for label, value in labels))
+
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def format_number(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+# process-wide instance used by the instrumented modules
+TELEMETRY = Telemetry()
+stage = TELEMETRY.stage
+count = TELEMETRY.count
+observe = TELEMETRY.observe
+high_water = TELEMETRY.high_water
@@ -0,0 +1,57 @@
+from unittest import TestCase
+
+import numpy
+import pandas
+
+import analytics
+
+
+class TestAnalytics(TestCase):
+
+    def setUp(self):
+        self.data_frame = pandas.DataFrame([
+            {'sprints': 'Sprint 1', 'issue_type': 'Task', 'original_estimate': 3600, 'time_spent': 7200},
+            {'sprints': 'Sprint 1,Sprint 2', 'issue_type': 'Bug', 'original_estimate': 3600, 'time_spent': 1800},
+            {'sprints': None, 'issue_type': 'Bug', 'original_estimate': None, 'time_spent': 600},
+            {'sprints': 'Sprint 2', 'issue_type': 'Bug', 'original_estimate': 3600, 'time_spent': 3600},
+            {'sprints': 'Sprint 3,Sprint 2', 'issue_type': 'Task', 'original_estimate': 0, 'time_spent': 600},
+            {'sprints': 'Sprint 1,Sprint 2', 'issue_type': 'Bug', 'original_estimate': None, 'time_spent': None},
+        ])
+
+    def test_explode_sprints(self):
+        sprints = analytics.explode_sprints(self.data_frame['sprints'])
+
+        self.assertEqual(list(sprints.index), [0, 1, 1, 3, 4, 4, 5, 5])
+        self.assertEqual(
+            list(sprints),
+            ['Sprint 1', 'Sprint 1', 'Sprint 2', 'Sprint 2', 'Sprint 3', 'Sprint 2', 'Sprint 1', 'Sprint 2'],
+        )
+        self.assertEqual(list(sprints.cat.categories), ['Sprint 1', 'Sprint 2', 'Sprint 3'])
+
+    def test_explode_sprints_empty(self):
+        sprints = analytics.explode_sprints(pandas.Series([None, None], dtype=object))
+
+        self.assertEqual(len(sprints), 0)
+
+    def test_bugs_by_sprint(self):
+        counts = analytics.bugs_by_sprint(self.data_frame)
+
+        self.assertEqual(counts.to_dict(), {'Sprint 1': 2, 'Sprint 2': 3, 'Sprint 3': 0})
+        self.assertEqual(list(counts.index), ['Sprint 1', 'Sprint 2', 'Sprint 3'])
+
+    def test_estimate_accuracy(self):
+        result = analytics.estimate_accuracy(self.data_frame)
+
+        self.assertEqual(result['overestimated'], 1)
+        self.assertEqual(result['underestimated'], 1)
+        self.assertEqual(result['spot_on'], 1)
+        self.assertEqual(result['time_tracked_issues'], 3)
+        self.assertEqual(result['average_estimate_minutes'], 45)
+        self.assertEqual(result['average_actual_minutes'], 46)
+        self.assertEqual(result['average_diff_minutes'], -10)
+
+    def test_estimate_accuracy_without_tracked_issues(self):
+        result = analytics.estimate_accuracy(self.data_frame.iloc[[2, 5]])
+
+        self.assertEqual(result['time_tracked_issues'], 0)
+        self.assertTrue(numpy.isnan(result['average_diff_minutes']))
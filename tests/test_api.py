@@ -1,7 +1,27 @@
+import datetime
+import json
+import os
+import re
+import tempfile
+import itertools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from unittest import TestCase, mock
+from urllib.parse import parse_qs, urlparse
+
+import pandas
 
 import api
 from api import JirApi
+from cache import IssueCache
+
+
+def cached_issue(key, **fields):
+    """
+    Issue payload as the search endpoint returns it, with every requested field present
+    """
+    return {'key': key, 'fields': dict(dict.fromkeys(api.SEARCH_FIELDS), **fields)}
 
 
 class TestJirApi(TestCase):
@@ -19,30 +39,36 @@ class TestJirApi(TestCase):
 
     def setUp(self):
         self.jira.found_ticket = False
+        self.jira.more_to_pull = True
         self.jira.start_issue = 1
         self.jira.end_issue = 3
 
-    @mock.patch('api.store_state_json')
-    @mock.patch('api.requests.get')
-    def test_get_issue_json(self, mock_get, mock_store):
+    @mock.patch('api.requests.Session.get')
+    def test_get_issue_json(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {'return': 'me'}
 
         result = self.jira.get_issue_json('TEST-123')
         self.assertEqual(result, {'return': 'me'})
 
+        # inside a known range a 404 is a gap; without one it ends the crawl
         mock_get.return_value.status_code = 404
         self.jira.found_ticket = True
+        self.jira.missing_issues = 0
+        self.jira.get_issue_json('TEST-2')
+        self.assertTrue(self.jira.more_to_pull)
+        self.assertEqual(self.jira.missing_issues, 1)
+        self.jira.end_issue = None
         self.jira.get_issue_json('TEST-123')
-        mock_store.assert_called_with('TEST-123')
+        self.assertFalse(self.jira.more_to_pull)
 
+        self.jira.more_to_pull = True
         self.jira.found_ticket = False
         result = self.jira.get_issue_json('TEST-123')
         self.assertEqual(result, {'return': 'me'})
 
         mock_get.return_value.status_code = 401
-        # TODO: broad exception, this is bad
-        with self.assertRaises(Exception):
+        with self.assertRaises(api.JiraApiError):
             self.jira.get_issue_json('TEST-123')
 
     @mock.patch('api.JirApi.get_issue_json')
@@ -87,6 +113,420 @@ class TestJirApi(TestCase):
 
         self.assertEqual(len(results), 2)
 
+    @mock.patch('api.execute_jql_query')
+    def test_search_issues(self, mock_query):
+        mock_query.side_effect = [
+            {'total': 3, 'issues': [{'key': 'TEST-1'}, {'key': 'TEST-2'}]},
+            {'total': 3, 'issues': [{'key': 'TEST-3'}]},
+        ]
+        batches = list(self.jira.search_issues('project = TEST', batch_size=2))
+
+        self.assertEqual(batches, [[{'key': 'TEST-1'}, {'key': 'TEST-2'}], [{'key': 'TEST-3'}]])
+        self.assertEqual(mock_query.call_args_list[1][1]['start_at'], 2)
+        self.assertEqual(mock_query.call_args[1]['fields'], api.SEARCH_FIELDS)
+
+    @mock.patch('api.execute_jql_query')
+    def test_search_issues_history(self, mock_query):
+        jira = JirApi(basic_auth=False, project='TEST', history=True)
+        mock_query.return_value = {'total': 1, 'issues': [{'key': 'TEST-1', 'changelog': {'total': 0, 'histories': []}}]}
+        list(jira.search_issues('project = TEST'))
+
+        self.assertEqual(mock_query.call_args[1]['expand'], 'changelog')
+        self.assertEqual(mock_query.call_args[1]['fields'], api.SEARCH_FIELDS + ['worklog'])
+        list(jira.search_issues('project = TEST', fields=['updated']))
+        self.assertIsNone(mock_query.call_args[1]['expand'])
+
+    @mock.patch('api.requests.Session.get')
+    def test_complete_history(self, mock_get):
+        jira = JirApi(basic_auth=False, base_url='http://www.test.test', history=True)
+        pages = [
+            {'startAt': 0, 'total': 3, 'isLast': False, 'values': [{'id': '1'}, {'id': '2'}]},
+            {'startAt': 2, 'total': 3, 'isLast': True, 'values': [{'id': '3'}]},
+            {'startAt': 0, 'total': 1, 'worklogs': [{'id': '10'}]},
+        ]
+        mock_get.return_value.json.side_effect = pages
+        issue = {
+            'key': 'TEST-1',
+            'changelog': {'startAt': 0, 'maxResults': 1, 'total': 3, 'histories': [{'id': '3'}]},
+            'fields': {'worklog': {'startAt': 0, 'maxResults': 0, 'total': 1, 'worklogs': []}},
+        }
+        jira.complete_history(issue)
+
+        self.assertEqual([history['id'] for history in issue['changelog']['histories']], ['1', '2', '3'])
+        self.assertEqual(issue['fields']['worklog']['worklogs'], [{'id': '10'}])
+        self.assertEqual(mock_get.call_args_list[0][0][0], 'http://www.test.test/rest/api/2/issue/TEST-1/changelog')
+        self.assertEqual(mock_get.call_args_list[1][1]['params'], {'startAt': 2, 'maxResults': 100})
+        self.assertEqual(mock_get.call_args_list[2][0][0], 'http://www.test.test/rest/api/2/issue/TEST-1/worklog')
+
+        mock_get.reset_mock()
+        jira.complete_history(issue)
+        mock_get.assert_not_called()
+
+    def test_get_cached_without_changelog(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            jira = JirApi(basic_auth=False, cache=IssueCache(cache_dir), history=True)
+            jira.cache.put(cached_issue('TEST-1', updated='v1'))
+            jira.cache.put(dict(cached_issue('TEST-2', updated='v1'), changelog={'histories': []}))
+            # cached before priority was requested
+            jira.cache.put({'key': 'TEST-3', 'fields': {'updated': 'v1'}, 'changelog': {'histories': []}})
+
+            self.assertIsNone(jira.get_cached('TEST-1', 'v1'))
+            self.assertIsNotNone(jira.get_cached('TEST-2', 'v1'))
+            self.assertIsNone(jira.get_cached('TEST-3', 'v1'))
+
+    def test_issue_keys_defaults_to_first_issue(self):
+        jira = JirApi(basic_auth=False, start_issue=None, end_issue=2)
+        self.assertEqual(list(jira.issue_keys()), ['FARM-1', 'FARM-2'])
+
+        with self.assertRaises(ValueError):
+            JirApi(basic_auth=False, concurrency=0)
+
+    @mock.patch('api.execute_jql_query')
+    def test_all_issues_bulk_revalidated(self, mock_query):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.jira.cache = IssueCache(cache_dir)
+            self.jira.cache.put(cached_issue('TEST-1', updated='v1', summary='cached'))
+            self.jira.cache.put(cached_issue('TEST-3', updated='v1', summary='cached'))
+            mock_query.side_effect = [
+                {'total': 3, 'issues': [
+                    {'key': 'TEST-1', 'fields': {'updated': 'v1'}},
+                    {'key': 'TEST-2', 'fields': {'updated': 'v1'}},
+                    {'key': 'TEST-3', 'fields': {'updated': 'v1'}},
+                ]},
+                {'total': 1, 'issues': [{'key': 'TEST-2', 'fields': {'updated': 'v1', 'summary': 'fetched'}}]},
+            ]
+            try:
+                batches = list(self.jira.all_issues_bulk())
+            finally:
+                self.jira.cache = None
+
+        # changed issues are merged into the cached ones in key order
+        self.assertEqual(batches, [[
+            cached_issue('TEST-1', updated='v1', summary='cached'),
+            {'key': 'TEST-2', 'fields': {'updated': 'v1', 'summary': 'fetched'}},
+            cached_issue('TEST-3', updated='v1', summary='cached'),
+        ]])
+        self.assertEqual(mock_query.call_args_list[0][1]['fields'], ['updated'])
+        self.assertEqual(mock_query.call_args_list[1][0][0], 'key in (TEST-2) ORDER BY key ASC')
+
+    def test_plan_chunks(self):
+        self.assertEqual(api.plan_chunks(1, 7, 3), [(1, 3), (4, 6), (7, 7)])
+        self.assertEqual(api.plan_chunks(5, 6, 10), [(5, 6)])
+        self.assertEqual(api.plan_chunks(1, 0, 10), [])
+
+    @mock.patch('api.execute_jql_query')
+    def test_discover_range(self, mock_query):
+        mock_query.return_value = {'total': 2, 'issues': [{'key': 'TEST-41'}]}
+        self.assertEqual(self.jira.discover_range(), 41)
+        self.assertEqual(mock_query.call_args[0][0], 'project = TEST ORDER BY key DESC')
+
+        mock_query.return_value = {'total': 0, 'issues': []}
+        self.assertIsNone(self.jira.discover_range())
+
+    def test_project_jql(self):
+        self.assertEqual(
+            self.jira.project_jql(),
+            'project = TEST AND key >= TEST-1 AND key <= TEST-3 ORDER BY key ASC',
+        )
+        self.jira.end_issue = None
+        self.assertEqual(self.jira.project_jql(), 'project = TEST AND key >= TEST-1 ORDER BY key ASC')
+
+    def test_updated_jql(self):
+        since = datetime.datetime(2017, 10, 30, 12, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=-5)))
+        self.assertEqual(
+            self.jira.updated_jql(since),
+            'project = TEST AND updated >= "2017/10/29 17:00" ORDER BY updated ASC',
+        )
+
+    @mock.patch('api.JirApi.updated_issues')
+    def test_sync_issues(self, mock_updated_issues):
+        data_frame = pandas.DataFrame(columns=api.HEADER)
+        data_frame.loc['TEST-1'] = ['TEST-1', 'old summary'] + [None] * (len(api.HEADER) - 2)
+        data_frame.loc['TEST-2'] = ['TEST-2', 'untouched'] + [None] * (len(api.HEADER) - 2)
+        mock_updated_issues.return_value = [[
+            {'key': 'TEST-1', 'fields': {'summary': 'new summary', 'updated': '2017-10-30T12:00:00.000-0500'}},
+            {'key': 'TEST-3', 'fields': {'summary': 'new issue', 'updated': '2017-10-29T12:00:00.000-0500'}},
+        ]]
+
+        result = self.jira.sync_issues(data_frame, since=datetime.datetime.now(datetime.timezone.utc))
+        self.assertEqual(list(result.columns), api.HEADER)
+
+        self.assertEqual(list(result.index), ['TEST-1', 'TEST-2', 'TEST-3'])
+        self.assertEqual(result.loc['TEST-1', 'summary'], 'new summary')
+        self.assertEqual(result.loc['TEST-2', 'summary'], 'untouched')
+        checkpoint = self.jira.checkpoint()
+        self.assertEqual(checkpoint['last_key'], 'TEST-3')
+        self.assertEqual(checkpoint['last_updated'], api.parse_jira_datetime('2017-10-30T12:00:00.000-0500'))
+
+
+class StubJiraHandler(BaseHTTPRequestHandler):
+    last_issue = 7
+    missing_issues = set()
+    # issue number -> list of error statuses to return before succeeding
+    failures = {}
+    searchable = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/search':
+            return self.search(parse_qs(url.query)['jql'][0])
+        issue_num = int(url.path.split('-')[-1])
+        if self.failures.get(issue_num):
+            self.send_response(self.failures[issue_num].pop(0))
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        if issue_num > self.last_issue or issue_num in self.missing_issues:
+            self.send_response(404)
+            body = {'errorMessages': ['Issue does not exist or you do not have permission to see it.']}
+        else:
+            self.send_response(200)
+            body = {'key': 'TEST-{}'.format(issue_num), 'fields': {'issuetype': {'name': 'Bug'}}}
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode('utf-8'))
+
+    def search(self, jql):
+        key_range = re.search(r'key >= TEST-(\d+) AND key <= TEST-(\d+)', jql)
+        first, last = (int(num) for num in key_range.groups()) if key_range else (1, self.last_issue)
+        issue_nums = [num for num in range(first, min(last, self.last_issue) + 1) if num not in self.missing_issues]
+        key_list = re.search(r'key in \(([^)]*)\)', jql)
+        if key_list:
+            issue_nums = [num for num in issue_nums if 'TEST-{}'.format(num) in key_list.group(1).split(',')]
+        if jql.endswith('DESC'):
+            issue_nums.reverse()
+        if not self.searchable:
+            self.send_response(400)
+            body = {'errorMessages': ['Field key is not searchable']}
+        else:
+            self.send_response(200)
+            body = {'total': len(issue_nums), 'issues': [
+                {'key': 'TEST-{}'.format(num), 'fields': {'issuetype': {'name': 'Bug'}, 'updated': 'v1'}}
+                for num in issue_nums]}
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestJirApiStubServer(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), StubJiraHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubJiraHandler.failures = {}
+        StubJiraHandler.last_issue = 7
+        StubJiraHandler.missing_issues = set()
+        StubJiraHandler.searchable = True
+
+    def make_jira(self, concurrency):
+        jira = JirApi(basic_auth=False, concurrency=concurrency)
+        jira.session.retry_policy.backoff_base = 0
+        jira.domain = 'http://127.0.0.1:{}/issue/{{}}'.format(self.server.server_port)
+        jira.search_url = 'http://127.0.0.1:{}/search'.format(self.server.server_port)
+        jira.project = 'TEST'
+        return jira
+
+    def test_all_issues_concurrent_matches_sequential(self):
+        sequential = list(self.make_jira(concurrency=1).all_issues())
+        concurrent = list(self.make_jira(concurrency=4).all_issues())
+
+        self.assertEqual(concurrent, sequential)
+        keys = [issue['key'] for issue in concurrent if 'key' in issue]
+        self.assertEqual(keys, ['TEST-{}'.format(i) for i in range(1, 8)])
+
+    def test_all_issues_crawls_past_gaps(self):
+        StubJiraHandler.missing_issues = {3, 4}
+        for concurrency in (1, 3):
+            jira = self.make_jira(concurrency=concurrency)
+            issues = list(jira.all_issues())
+
+            self.assertEqual([issue['key'] for issue in issues if 'key' in issue],
+                             ['TEST-1', 'TEST-2', 'TEST-5', 'TEST-6', 'TEST-7'])
+            self.assertEqual(jira.end_issue, 7)
+            self.assertEqual(jira.missing_issues, 2)
+            # one search finds the end, then nothing past it is requested
+            self.assertEqual(jira.request_stats()['requests'], 8)
+
+    def test_probe_range(self):
+        StubJiraHandler.searchable = False
+        StubJiraHandler.last_issue = 40
+        StubJiraHandler.missing_issues = {1, 16, 17, 32}
+        jira = self.make_jira(concurrency=1)
+
+        self.assertEqual(jira.discover_range(), 40)
+        self.assertLess(jira.request_stats()['requests'], 30)
+
+        StubJiraHandler.last_issue = 0
+        self.assertIsNone(self.make_jira(concurrency=1).discover_range())
+
+    def test_all_issues_bulk_chunked(self):
+        StubJiraHandler.missing_issues = {3, 4}
+        jira = self.make_jira(concurrency=2)
+
+        batches = list(jira.all_issues_bulk_chunked(batch_size=2, chunk_size=3))
+        self.assertEqual([[issue['key'] for issue in batch] for batch in batches],
+                         [['TEST-1', 'TEST-2'], ['TEST-5', 'TEST-6'], ['TEST-7']])
+
+    def test_all_issues_bulk_chunked_streams_pages(self):
+        produced = []
+
+        def search_bulk(jql_query, batch_size):
+            first, last = (int(num) for num in re.findall(r'TEST-(\d+)', jql_query))
+            for num in range(first, last + 1):
+                produced.append(num)
+                yield [{'key': 'TEST-{}'.format(num)}]
+
+        jira = self.make_jira(concurrency=2)
+        jira.end_issue = 40
+        with mock.patch.object(jira, 'search_bulk', side_effect=search_bulk):
+            batches = jira.all_issues_bulk_chunked(chunk_size=10, max_pending_pages=2)
+            consumed = [batch[0]['key'] for batch in itertools.islice(batches, 5)]
+            time.sleep(0.3)
+            # two chunks, each at most a full queue plus the page waiting to be put ahead of the consumer
+            self.assertLessEqual(len(produced), 5 + 2 * 3)
+            consumed += [batch[0]['key'] for batch in batches]
+
+        self.assertEqual(consumed, ['TEST-{}'.format(num) for num in range(1, 41)])
+
+    def test_all_issues_bulk_chunked_revalidates_chunks(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            jira = self.make_jira(concurrency=2)
+            jira.cache = IssueCache(cache_dir)
+            jira.cache.put(cached_issue('TEST-2', updated='v1', summary='cached'))
+            jira.cache.put(cached_issue('TEST-5', updated='v1', summary='cached'))
+
+            batches = list(jira.all_issues_bulk_chunked(batch_size=2, chunk_size=3))
+
+        issues = [issue for batch in batches for issue in batch]
+        self.assertEqual([issue['key'] for issue in issues], ['TEST-{}'.format(i) for i in range(1, 8)])
+        self.assertEqual([issue['fields'].get('summary') for issue in issues[1:5]], ['cached', None, None, 'cached'])
+        # the end of the range, then per chunk of 3 an updated index and a search per page with changed issues
+        self.assertEqual(jira.request_stats()['requests'], 9)
+
+    def test_all_issues_probes_range_with_cache(self):
+        StubJiraHandler.searchable = False
+        with tempfile.TemporaryDirectory() as cache_dir:
+            jira = self.make_jira(concurrency=1)
+            jira.cache = IssueCache(cache_dir)
+
+            issues = list(jira.all_issues())
+
+        self.assertEqual(jira.end_issue, 7)
+        self.assertEqual([issue['key'] for issue in issues], ['TEST-{}'.format(i) for i in range(1, 8)])
+
+    def test_all_issues_concurrent_end_issue(self):
+        jira = self.make_jira(concurrency=3)
+        jira.end_issue = 2
+
+        self.assertEqual([issue['key'] for issue in jira.all_issues()], ['TEST-1', 'TEST-2'])
+
+    def test_all_issues_skips_unchanged_cached_issues(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IssueCache(cache_dir)
+            cache.put(cached_issue('TEST-2', updated='v1', summary='cached'))
+            cache.put(cached_issue('TEST-3', updated='v1', summary='stale'))
+            updated_index = {'TEST-{}'.format(i): 'v1' for i in range(1, 8)}
+            updated_index['TEST-3'] = 'v2'
+
+            for concurrency in (1, 3):
+                jira = self.make_jira(concurrency=concurrency)
+                jira.cache = cache
+                with mock.patch('api.JirApi.get_updated_index', return_value=updated_index):
+                    issues = list(jira.all_issues())
+
+                self.assertEqual([issue['key'] for issue in issues if 'key' in issue],
+                                 ['TEST-{}'.format(i) for i in range(1, 8)])
+                self.assertEqual(issues[1]['fields']['summary'], 'cached')
+                self.assertNotIn('summary', issues[2]['fields'])
+                # one search for the end of the range, then every issue but TEST-2, which comes from the cache
+                self.assertEqual(jira.request_stats()['requests'], 7)
+
+    def test_retries_throttled_requests(self):
+        StubJiraHandler.failures = {2: [429, 503]}
+        jira = self.make_jira(concurrency=2)
+        jira.end_issue = 3
+
+        self.assertEqual([issue['key'] for issue in jira.all_issues()], ['TEST-1', 'TEST-2', 'TEST-3'])
+        stats = jira.request_stats()
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['retries'], 2)
+        self.assertLess(jira.session.rate_limiter.rate, jira.session.rate_limiter.max_rate)
+
+    def test_retry_budget_exhausted(self):
+        StubJiraHandler.failures = {1: [500] * 10}
+        jira = self.make_jira(concurrency=1)
+        jira.session.retry_policy.retry_budget = 3
+
+        with self.assertRaises(api.JiraApiError):
+            jira.get_issue_json('TEST-1')
+        self.assertEqual(jira.request_stats()['retries'], 3)
+
+    def test_retry_after_not_charged_to_budget(self):
+        StubJiraHandler.failures = {1: [429] * 4}
+        jira = self.make_jira(concurrency=1)
+        jira.session.retry_policy.retry_budget = 1
+
+        self.assertEqual(jira.get_issue_json('TEST-1')['key'], 'TEST-1')
+        stats = jira.request_stats()
+        self.assertEqual(stats['throttled_responses'], 4)
+        self.assertEqual(stats['pacing_waits'], 0)
+        self.assertEqual(jira.session.retry_policy.retry_budget, 1)
+
+
+class TestRateLimiting(TestCase):
+
+    @mock.patch('api.time.sleep')
+    @mock.patch('api.time.monotonic')
+    def test_rate_limiter(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 100.0
+        limiter = api.RateLimiter(rate=2.0, burst=2)
+
+        self.assertEqual(limiter.acquire(), (0.0, 0.0))
+        self.assertEqual(limiter.acquire(), (0.0, 0.0))
+
+        mock_sleep.side_effect = lambda seconds: setattr(
+            mock_monotonic, 'return_value', mock_monotonic.return_value + seconds)
+        self.assertEqual(limiter.acquire(), (0.5, 0.0))
+
+        limiter.throttled(10)
+        self.assertEqual(limiter.rate, 1.0)
+        paced, throttled = limiter.acquire()
+        self.assertEqual(throttled, 10)
+
+    def test_rate_limiter_bounds(self):
+        with self.assertRaises(ValueError):
+            api.RateLimiter(rate=0)
+
+        limiter = api.RateLimiter(rate=0.2)
+        limiter.throttled(0)
+        self.assertEqual(limiter.rate, 0.2)
+
+    def test_get_retry_after(self):
+        resp = mock.Mock(headers={'Retry-After': '7'})
+        self.assertEqual(api.get_retry_after(resp), 7.0)
+        resp.headers = {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+        self.assertEqual(api.get_retry_after(resp), 0.0)
+        resp.headers = {}
+        self.assertIsNone(api.get_retry_after(resp))
+        self.assertIsNone(api.get_retry_after(None))
+
+    def test_backoff(self):
+        policy = api.RetryPolicy(backoff_base=1, backoff_max=5)
+        for attempt in range(6):
+            self.assertLessEqual(policy.backoff(attempt), min(5, 2 ** attempt))
+
 
 class TestJirApiHelpers(TestCase):
 
@@ -144,6 +584,7 @@ class TestJirApiHelpers(TestCase):
             'remaining_estimate': 'return_remainingEstimateSeconds',
             'time_spent': 'return_timeSpentSeconds',
             'sprints': 'Total pkg 2017: 10/23 - 10/27,Total pkg 2017: 10/30 - 11/3',
+            'sprint_states': 'CLOSED,ACTIVE',
         }
 
         for key, outcome in expected_outocmes.items():
@@ -167,6 +608,76 @@ class TestJirApiHelpers(TestCase):
             result = api.parse_issue_json(json_with_nulls)[key]
             self.assertEqual(result, expected_outcomes[key])
 
+    def test_get_option_ids(self):
+        issue = {'key': 'TEST-1', 'fields': {
+            'customfield_10614': {'id': '18', 'value': 'Production Support'},
+            api.FLAGGED_FIELD: [{'id': '10000', 'value': 'Impediment'}],
+            'customfield_1': 18.0,
+        }}
+        self.assertEqual(api.parse_issue_json(issue)['customfield_10614'], '18')
+        self.assertEqual(api.parse_issue_json(issue)['flagged'], '10000')
+        self.assertEqual(api.get_option_ids(issue, 'customfield_1'), '18')
+        self.assertIsNone(api.get_option_ids(issue, 'customfield_2'))
+
+    def test_parse_records(self):
+        epic = {'key': 'TEST-125', 'fields': {'issuetype': {'name': 'Epic'}}}
+        second = {'key': 'TEST-124', 'fields': {'summary': 'second', 'labels': []}}
+        issues = [self.test_json, epic, second]
+        records = [api.compact_issue(json.loads(json.dumps(issue))) for issue in issues]
+
+        self.assertEqual(records[0].key, 'TEST-123')
+        self.assertEqual(records[1].get('issue_type'), 'Epic')
+        self.assertIsNone(records[0].events)
+        # repeating values are shared between records instead of copied from each payload
+        other = api.compact_issue(json.loads(json.dumps(self.test_json)))
+        self.assertIs(other.get('status'), records[0].get('status'))
+        self.assertFalse(hasattr(records[0], '__dict__'))
+
+        columns = api.parse_records(records)
+        self.assertEqual(columns.index, ['TEST-123', 'TEST-124'])
+        self.assertEqual(columns.columns['summary'], ['return_summary', 'second'])
+        self.assertEqual(columns.columns['labels'], ['return_label', None])
+        data_frame = columns.to_data_frame()
+        self.assertEqual(list(data_frame.columns), api.HEADER)
+        self.assertEqual(data_frame.loc['TEST-123'].to_dict(), api.parse_issue_json(self.test_json))
+        self.assertTrue(pandas.isnull(data_frame.loc['TEST-124', 'sprints']))
+        self.assertEqual(api.parse_records([]).index, [])
+
+    def test_compile_field_extractor(self):
+        test_json = {
+            'depth_1': 'return_me',
+            'depth_2_1': {'depth_2_2': 'return_me', 'empty': []},
+            'depth_3_1': {'depth_3_2': {'depth_3_3': [{'name': 'return'}, {'name': 'me'}]}},
+            'depth_4_1': {'depth_4_2': {'depth_4_3': {'depth_4_4': ['return', 'me']}}},
+            'zero': {'value': 0},
+        }
+        key_lists = [
+            ['depth_1'],
+            ['depth_2_1', 'depth_2_2'],
+            ['depth_2_1', 'empty'],
+            ['depth_3_1', 'depth_3_2', 'depth_3_3'],
+            ['depth_4_1', 'depth_4_2', 'depth_4_3', 'depth_4_4'],
+            ['zero', 'value'],
+            ['does', 'not', 'exist'],
+        ]
+        for keys in key_lists:
+            extract = api.compile_field_extractor(keys)
+            self.assertEqual(extract(test_json), api.get_leaf_value(test_json, keys), keys)
+
+    def test_upsert_rows(self):
+        existing = pandas.DataFrame({'summary': ['one', 'two', 'ten']}, index=['TEST-1', 'TEST-2', 'TEST-10'])
+        batches = [
+            pandas.DataFrame({'summary': ['three', 'two']}, index=['TEST-3', 'TEST-2']),
+            pandas.DataFrame({'summary': ['two again', 'other two']}, index=['TEST-2', 'OTHER-2']),
+        ]
+
+        result = api.upsert_rows(existing, batches)
+        self.assertEqual(list(result.index), ['OTHER-2', 'TEST-1', 'TEST-2', 'TEST-3', 'TEST-10'])
+        self.assertEqual(result.loc['TEST-2', 'summary'], 'two again')
+        self.assertIs(api.upsert_rows(existing, []), existing)
+        self.assertEqual(list(api.upsert_rows(None, batches[:1]).index), ['TEST-2', 'TEST-3'])
+        self.assertIsNone(api.upsert_rows(None, []))
+
     def test_get_leaf_value(self):
         test_json = {
             'depth_1': 'return_me',
@@ -203,6 +714,38 @@ class TestJirApiHelpers(TestCase):
         for key_list in fail_keys:
             self.assertIsNone(api.get_leaf_value(test_json, key_list))
 
+    @mock.patch('api.requests.get')
+    def test_execute_jql_query(self, mock_get):
+        mock_get.return_value.json.return_value = {'issues': []}
+        result = api.execute_jql_query('project = TEST', start_at=50, max_results=25, fields=['summary', 'status'])
+
+        self.assertEqual(result, {'issues': []})
+        params = mock_get.call_args[1]['params']
+        self.assertEqual(params['startAt'], 50)
+        self.assertEqual(params['maxResults'], 25)
+        self.assertEqual(params['fields'], 'summary,status')
+
+    def test_store_state_json(self):
+        with tempfile.TemporaryDirectory() as state_dir:
+            state_path = os.path.join(state_dir, 'state.json')
+            self.assertEqual(api.load_state_json(state_path), {})
+
+            newer = api.parse_jira_datetime('2017-10-30T12:00:00.000-0500')
+            older = api.parse_jira_datetime('2017-10-29T12:00:00.000-0500')
+            api.store_state_json('TEST-5', newer, state_path=state_path)
+            api.store_state_json('TEST-6', older, state_path=state_path)
+
+            state = api.load_state_json(state_path)
+            self.assertEqual(state['last_ticket_retrieved'], 'TEST-6')
+            self.assertEqual(state['last_updated'], newer)
+            self.assertEqual(os.listdir(state_dir), ['state.json'])
+
+    def test_parse_jira_datetime(self):
+        result = api.parse_jira_datetime('2017-10-23T14:09:09.683-0500')
+        self.assertEqual(result.astimezone(datetime.timezone.utc).hour, 19)
+        self.assertIsNone(api.parse_jira_datetime(None))
+        self.assertIsNone(api.parse_jira_datetime('return_updated'))
+
     def test_get_sprint_info(self):
         no_sprint_string_json = {
             "fields": {
@@ -210,9 +753,41 @@ class TestJirApiHelpers(TestCase):
             }
         }
 
-        # TODO: Test other values of val_name
         self.assertIsNone(api.get_sprint_info(no_sprint_string_json, 'name'))
 
         expected_result = 'Total pkg 2017: 10/23 - 10/27,Total pkg 2017: 10/30 - 11/3'
         result = api.get_sprint_info(self.test_json, 'name')
         self.assertEqual(result, expected_result)
+
+        expected_result = '2017-10-23T14:09:09.683Z,2017-10-30T17:06:02.051Z'
+        self.assertEqual(api.get_sprint_info(self.test_json, 'startDate'), expected_result)
+        expected_result = '2017-10-30T14:09:00.000Z,2017-11-06T18:06:00.000Z'
+        self.assertEqual(api.get_sprint_info(self.test_json, 'endDate'), expected_result)
+
+        with self.assertRaises(ValueError):
+            api.get_sprint_info(self.test_json, 'goal')
+
+    def test_parse_sprint_string(self):
+        sprint_string = self.test_json['fields']['customfield_10004'][1]
+        self.assertEqual(api.parse_sprint_string(sprint_string), api.Sprint(
+            id=59,
+            name='Total pkg 2017: 10/30 - 11/3',
+            state='ACTIVE',
+            start_date='2017-10-30T17:06:02.051Z',
+            end_date='2017-11-06T18:06:00.000Z',
+            complete_date=None,
+        ))
+
+        sprint_string = (
+            'com.atlassian.greenhopper.service.sprint.Sprint@1[id=7,rapidViewId=37,state=FUTURE,'
+            'name=Fixes, part 2,goal=Ship it, finally,startDate=<null>,endDate=<null>,completeDate=<null>,sequence=7]'
+        )
+        sprint = api.parse_sprint_string(sprint_string)
+        self.assertEqual(sprint.name, 'Fixes, part 2')
+        self.assertIsNone(sprint.start_date)
+
+    def test_sprint_date_columns(self):
+        row = api.parse_issue_json(self.test_json)
+        self.assertEqual(row['sprint_start_datetime'], '2017-10-30T17:06:02.051Z')
+        self.assertEqual(row['sprint_end_datetime'], '2017-11-06T18:06:00.000Z')
+        self.assertIsNone(api.parse_issue_json({'key': 'TEST-1', 'fields': {}})['sprint_start_datetime'])
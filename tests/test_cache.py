@@ -0,0 +1,89 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from cache import IssueCache
+
+
+def make_issue(issue_key, updated, summary='summary'):
+    return {'key': issue_key, 'fields': {'updated': updated, 'summary': summary}}
+
+
+class TestIssueCache(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'issue_cache')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_and_put(self):
+        cache = IssueCache(self.path)
+        issue = make_issue('TEST-1', '2017-10-23T14:09:09.683-0500')
+        self.assertIsNone(cache.get('TEST-1'))
+
+        cache.put(issue)
+        self.assertEqual(cache.get('TEST-1'), issue)
+        self.assertEqual(cache.get('TEST-1', '2017-10-23T14:09:09.683-0500'), issue)
+        self.assertIsNone(cache.get('TEST-1', '2017-10-24T14:09:09.683-0500'))
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_put_replaces_old_version(self):
+        cache = IssueCache(self.path)
+        cache.put(make_issue('TEST-1', 'v1'))
+        old_size = cache.size
+        cache.put(make_issue('TEST-1', 'v2', summary='new summary'))
+
+        self.assertEqual(cache.get('TEST-1')['fields']['summary'], 'new summary')
+        self.assertEqual(len(cache), 1)
+        objects = [name for _, _, names in os.walk(os.path.join(self.path, 'objects')) for name in names]
+        self.assertEqual(len(objects), 1)
+        self.assertAlmostEqual(cache.size, old_size, delta=16)
+
+    def test_identical_payloads_share_an_object(self):
+        cache = IssueCache(self.path)
+        cache.put(make_issue('TEST-1', 'v1'))
+        cache.put(make_issue('TEST-1', 'v1'))
+
+        self.assertEqual(sum(cache.refs.values()), 1)
+        self.assertEqual(cache.get('TEST-1'), make_issue('TEST-1', 'v1'))
+
+    def test_lru_eviction(self):
+        cache = IssueCache(self.path)
+        cache.put(make_issue('TEST-1', 'v1'))
+        cache.max_bytes = cache.size * 2.5
+        cache.put(make_issue('TEST-2', 'v1'))
+        cache.get('TEST-1')
+        cache.put(make_issue('TEST-3', 'v1'))
+
+        self.assertIsNotNone(cache.get('TEST-1'))
+        self.assertIsNone(cache.get('TEST-2'))
+        self.assertIsNotNone(cache.get('TEST-3'))
+        self.assertLessEqual(cache.size, cache.max_bytes)
+
+    def test_flush_and_reload(self):
+        cache = IssueCache(self.path)
+        cache.put(make_issue('TEST-10', 'v1'))
+        cache.put(make_issue('TEST-2', 'v1'))
+        cache.flush()
+
+        reloaded = IssueCache(self.path)
+        self.assertEqual(len(reloaded), 2)
+        self.assertEqual(reloaded.size, cache.size)
+        self.assertEqual([issue['key'] for issue in reloaded.issues()], ['TEST-2', 'TEST-10'])
+
+    def test_skips_missing_objects(self):
+        cache = IssueCache(self.path)
+        cache.put(make_issue('TEST-1', 'v1', summary='one'))
+        cache.put(make_issue('TEST-2', 'v1', summary='two'))
+        cache.put(make_issue('TEST-3', 'v1', summary='three'))
+        os.remove(cache.object_path(cache.index['TEST-1']['digest']))
+        with open(cache.object_path(cache.index['TEST-3']['digest']), 'wb') as object_file:
+            object_file.write(b'partial')
+
+        self.assertEqual([issue['key'] for issue in cache.issues()], ['TEST-2'])
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.get('TEST-1'))
+        self.assertEqual(cache.stats()['hits'], 0)
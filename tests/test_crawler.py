@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import threading
+from unittest import TestCase, mock
+
+import crawler
+from api import DEFAULT_BASE_URL, STATE_FILE
+
+
+class TestLoadInstances(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'instances.json')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_config(self, config):
+        with open(self.path, 'w') as config_file:
+            json.dump(config, config_file)
+
+    def test_default_instance(self):
+        with mock.patch('crawler.INSTANCES_FILE', self.path):
+            instances = crawler.load_instances(rate_limit=5.0)
+        self.assertEqual(instances, [crawler.JiraInstance(DEFAULT_BASE_URL, ['FARM'], 5.0)])
+
+    def test_config(self):
+        self.write_config([
+            {'base_url': 'https://one.example.com/', 'projects': ['FARM', 'SB'], 'rate_limit': 5},
+            {'base_url': 'https://two.example.com', 'projects': ['OPS']},
+        ])
+        instances = crawler.load_instances(self.path, rate_limit=20.0)
+        self.assertEqual(instances, [
+            crawler.JiraInstance('https://one.example.com', ['FARM', 'SB'], 5.0),
+            crawler.JiraInstance('https://two.example.com', ['OPS'], 20.0),
+        ])
+
+    def test_duplicate_project(self):
+        self.write_config([
+            {'base_url': 'https://one.example.com', 'projects': ['FARM']},
+            {'base_url': 'https://two.example.com', 'projects': ['FARM']},
+        ])
+        with self.assertRaises(ValueError):
+            crawler.load_instances(self.path)
+
+    def test_state_path(self):
+        self.assertEqual(crawler.get_state_path('FARM'), STATE_FILE)
+        self.assertEqual(crawler.get_state_path('SB'), 'state.SB.json')
+
+
+class TestProjectCrawler(TestCase):
+
+    def setUp(self):
+        self.instances = [
+            crawler.JiraInstance('https://one.example.com', ['FARM', 'SB'], 5.0),
+            crawler.JiraInstance('https://two.example.com', ['OPS'], 10.0),
+        ]
+
+    @mock.patch('crawler.prompt_credentials')
+    def test_credentials_per_instance(self, mock_prompt):
+        mock_prompt.return_value = ('user', 'secret')
+        project_crawler = crawler.ProjectCrawler(self.instances)
+        self.assertEqual(mock_prompt.call_count, 2)
+
+        jira = project_crawler.make_jira(self.instances[0], 'SB')
+        self.assertEqual(jira.headers['Authorization'], 'Basic dXNlcjpzZWNyZXQ=')
+
+    def test_shared_rate_budget(self):
+        project_crawler = crawler.ProjectCrawler(self.instances, basic_auth=False)
+        farm = project_crawler.make_jira(self.instances[0], 'FARM')
+        sb = project_crawler.make_jira(self.instances[0], 'SB')
+        ops = project_crawler.make_jira(self.instances[1], 'OPS')
+
+        self.assertIs(farm.session.rate_limiter, sb.session.rate_limiter)
+        self.assertIsNot(farm.session.rate_limiter, ops.session.rate_limiter)
+        self.assertEqual(ops.session.rate_limiter.max_rate, 10.0)
+        self.assertEqual(sb.search_url, 'https://one.example.com/rest/api/2/search')
+        self.assertEqual(sb.project, 'SB')
+
+    def test_run_in_parallel(self):
+        project_crawler = crawler.ProjectCrawler(self.instances, basic_auth=False)
+        barrier = threading.Barrier(3, timeout=5)
+
+        def job(instance, project):
+            barrier.wait()
+            return instance.base_url
+
+        self.assertEqual(project_crawler.run(job), {
+            'FARM': 'https://one.example.com',
+            'SB': 'https://one.example.com',
+            'OPS': 'https://two.example.com',
+        })
+
+    def test_run_raises_after_all_jobs(self):
+        project_crawler = crawler.ProjectCrawler(self.instances, basic_auth=False)
+        finished = []
+
+        def job(instance, project):
+            if project == 'SB':
+                raise RuntimeError('boom')
+            finished.append(project)
+
+        with self.assertRaises(RuntimeError):
+            project_crawler.run(job)
+        self.assertEqual(sorted(finished), ['FARM', 'OPS'])
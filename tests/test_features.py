@@ -0,0 +1,90 @@
+from unittest import TestCase
+
+import pandas
+import scipy.sparse
+
+import features
+from constants import HEADER
+
+
+def make_issue(issue_num, created, **values):
+    row = {field: None for field in HEADER}
+    row.update({
+        'key': 'TEST-{}'.format(issue_num),
+        'summary': 'summary {}'.format(issue_num),
+        'issue_type': 'Bug',
+        'status': 'Done',
+        'created_datetime': created,
+        'updated_datetime': created,
+        'original_estimate': 7200,
+        'time_spent': 3600,
+    })
+    row.update(values)
+    return row
+
+
+class TestFeatureBuilder(TestCase):
+
+    def setUp(self):
+        self.data_frame = pandas.DataFrame([
+            make_issue(1, '2017-10-23T14:09:09.683-0500', summary='fix login page', labels='web,urgent'),
+            make_issue(2, '2017-10-30T10:00:00.000-0500', summary='slow login', status='In Progress'),
+            make_issue(3, '1970-01-02T00:00:00.000+0000', summary='report export', labels='web'),
+        ])
+
+    def test_fit_transform_is_sparse(self):
+        builder = features.FeatureBuilder()
+        matrix = builder.fit_transform(self.data_frame)
+
+        self.assertTrue(scipy.sparse.isspmatrix_csr(matrix))
+        self.assertEqual(matrix.shape, (3, len(builder.feature_names())))
+
+    def test_vectorizer_per_column(self):
+        builder = features.FeatureBuilder().fit(self.data_frame)
+        names = builder.feature_names()
+
+        self.assertIn('summary=login', names)
+        self.assertIn('labels=web', names)
+        self.assertIn('labels=urgent', names)
+        self.assertIn('status=In Progress', names)
+        # components is null for every issue, so it has no vectorizer and no block
+        self.assertIsNone(builder.vectorizers['components'])
+        self.assertFalse(any(name.startswith('components=') for name in names))
+        self.assertIsNot(builder.vectorizers['summary'], builder.vectorizers['labels'])
+
+    def test_dense_columns(self):
+        builder = features.FeatureBuilder()
+        matrix = builder.fit_transform(self.data_frame)
+        names = builder.feature_names()
+
+        created = matrix[:, names.index('created_datetime')].toarray().ravel()
+        self.assertEqual(created[2], 1.0)
+        self.assertEqual(matrix[0, names.index('original_estimate')], 7200)
+        # missing dates become 0 rather than NaN
+        self.assertEqual(matrix[:, names.index('resolved_datetime')].nnz, 0)
+
+    def test_transform_uses_fitted_vocabulary(self):
+        builder = features.FeatureBuilder().fit(self.data_frame)
+        new_issue = pandas.DataFrame([
+            make_issue(4, '2017-11-01T10:00:00.000-0500', summary='brand new words', labels='mobile'),
+        ])
+
+        matrix = builder.transform(new_issue)
+
+        self.assertEqual(matrix.shape, (1, len(builder.feature_names())))
+
+
+class TestHashingFeatureBuilder(TestCase):
+
+    def test_transform_without_fit(self):
+        data_frame = pandas.DataFrame([
+            make_issue(1, '2017-10-23T14:09:09.683-0500', summary='fix login page', labels='web,urgent'),
+        ])
+        builder = features.HashingFeatureBuilder(n_features=16)
+
+        matrix = builder.transform(data_frame)
+
+        self.assertTrue(scipy.sparse.isspmatrix_csr(matrix))
+        self.assertEqual(matrix.shape, (1, len(builder.feature_names())))
+        self.assertEqual(matrix.shape[1], 7 + 9 * 16)
+        self.assertGreater(matrix.nnz, 0)
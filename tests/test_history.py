@@ -0,0 +1,173 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import pandas
+
+import history
+
+
+def make_issue(key, histories=(), worklogs=(), issue_type='Bug'):
+    return {
+        'key': key,
+        'fields': {
+            'issuetype': {'name': issue_type},
+            'worklog': {'total': len(worklogs), 'worklogs': list(worklogs)},
+        },
+        'changelog': {'total': len(histories), 'histories': list(histories)},
+    }
+
+
+def make_history(created, field='status', from_string=None, to_string=None, author='alice'):
+    return {
+        'author': {'name': author},
+        'created': created,
+        'items': [{'field': field, 'fromString': from_string, 'toString': to_string}],
+    }
+
+
+def make_worklog(worklog_id, started, seconds, author='alice'):
+    return {'id': worklog_id, 'author': {'name': author}, 'started': started, 'timeSpentSeconds': seconds}
+
+
+class TestEventCollector(TestCase):
+
+    def test_add(self):
+        events = history.EventCollector()
+        issues = [
+            make_issue(
+                'TEST-1',
+                histories=[
+                    make_history('2017-10-02T10:00:00.000-0500', from_string='Open', to_string='In Progress'),
+                    make_history('2017-10-02T11:00:00.000-0500', field='description', to_string='long text'),
+                ],
+                worklogs=[make_worklog('10', '2017-10-02T12:00:00.000-0500', 3600)],
+            ),
+            make_issue('TEST-2', histories=[make_history('2017-10-01T10:00:00.000-0500')], issue_type='Epic'),
+            {'key': 'TEST-3', 'fields': {'issuetype': {'name': 'Bug'}}},
+        ]
+
+        self.assertEqual(list(events.collect(issues)), issues)
+        changelog, worklog = events.to_data_frames()
+        self.assertEqual(events.keys, ['TEST-1'])
+        self.assertEqual(list(changelog.columns), history.TABLE_COLUMNS[history.CHANGELOG])
+        self.assertEqual(changelog[['field', 'from', 'to']].values.tolist(), [['status', 'Open', 'In Progress']])
+        self.assertEqual(changelog['timestamp'].iloc[0], pandas.Timestamp('2017-10-02T15:00:00Z'))
+        self.assertEqual(changelog['field'].dtype.name, 'category')
+        self.assertEqual(worklog['time_spent'].tolist(), [3600.0])
+
+    def test_add_events(self):
+        issue = make_issue(
+            'TEST-1',
+            histories=[make_history('2017-10-02T10:00:00.000-0500', from_string='Open', to_string='In Progress')],
+            worklogs=[make_worklog('10', '2017-10-02T12:00:00.000-0500', 3600)],
+        )
+        added = history.EventCollector()
+        added.add(issue)
+        kept = history.EventCollector()
+        kept.add_events('TEST-1', *history.extract_events(issue))
+
+        self.assertEqual(kept.columns, added.columns)
+        self.assertEqual(kept.keys, ['TEST-1'])
+        self.assertIsNone(history.extract_events({'key': 'TEST-2', 'fields': {}}))
+
+
+class TestEventStore(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = history.EventStore(os.path.join(self.temp_dir.name, 'events_store'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def upsert(self, issues):
+        events = history.EventCollector()
+        for issue in issues:
+            events.add(issue)
+        self.store.upsert(events.keys, *events.to_data_frames())
+
+    def test_upsert_replaces_issue_events(self):
+        self.assertTrue(self.store.load(history.CHANGELOG).empty)
+        self.upsert([
+            make_issue('TEST-1', worklogs=[
+                make_worklog('1', '2017-10-03T10:00:00.000-0500', 60),
+                make_worklog('2', '2017-10-02T10:00:00.000-0500', 120),
+            ]),
+            make_issue('TEST-1001', worklogs=[make_worklog('3', '2017-10-02T10:00:00.000-0500', 30)]),
+            make_issue('OTHER-1', worklogs=[make_worklog('4', '2017-10-02T10:00:00.000-0500', 10)]),
+        ])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.store.path, history.WORKLOG, 'project=TEST'))),
+            ['bucket=0', 'bucket=1'],
+        )
+        result = self.store.load(history.WORKLOG)
+        self.assertEqual(list(result.index), ['OTHER-1', 'TEST-1', 'TEST-1', 'TEST-1001'])
+        self.assertEqual(result['worklog_id'].tolist(), ['4', '2', '1', '3'])
+
+        # a deleted worklog disappears when its issue is synced again; other issues are untouched
+        self.upsert([make_issue('TEST-1', worklogs=[make_worklog('1', '2017-10-03T10:00:00.000-0500', 90)])])
+        result = self.store.load(history.WORKLOG)
+        self.assertEqual(result['worklog_id'].tolist(), ['4', '1', '3'])
+        self.assertEqual(result.loc['TEST-1', 'time_spent'], 90)
+
+        self.upsert([make_issue('OTHER-1')])
+        self.assertEqual(list(self.store.load(history.WORKLOG).index), ['TEST-1', 'TEST-1001'])
+
+    def test_load_filters(self):
+        self.upsert([
+            make_issue('TEST-1', histories=[
+                make_history('2017-10-02T10:00:00.000-0500', from_string='Open', to_string='In Progress'),
+                make_history('2017-11-02T10:00:00.000-0500', from_string='In Progress', to_string='Done'),
+            ]),
+            make_issue('TEST-2', histories=[make_history('2017-11-05T10:00:00.000-0500', to_string='Done')]),
+        ])
+
+        result = self.store.load(history.CHANGELOG, keys=['TEST-1'], columns=['to'])
+        self.assertEqual(list(result.columns), ['key', 'to'])
+        self.assertEqual(result['to'].tolist(), ['In Progress', 'Done'])
+        result = self.store.load(history.CHANGELOG, since=pandas.Timestamp('2017-11-01', tz='UTC'))
+        self.assertEqual(list(result.index), ['TEST-1', 'TEST-2'])
+        result = self.store.load(history.CHANGELOG, until=pandas.Timestamp('2017-11-01', tz='UTC'))
+        self.assertEqual(list(result.index), ['TEST-1'])
+
+
+class TestHistoryMetrics(TestCase):
+
+    def setUp(self):
+        events = history.EventCollector()
+        for issue in [
+            make_issue('TEST-1', histories=[
+                make_history('2017-10-01T02:00:00.000+0000', from_string='Open', to_string='In Progress'),
+                make_history('2017-10-01T05:00:00.000+0000', from_string='In Progress', to_string='Review'),
+                make_history('2017-10-01T06:00:00.000+0000', from_string='Review', to_string='Done'),
+            ], worklogs=[
+                make_worklog('1', '2017-10-01T03:00:00.000+0000', 7200),
+                make_worklog('2', '2017-10-01T04:00:00.000+0000', 1800, author='bob'),
+            ]),
+            make_issue('TEST-2', histories=[
+                make_history('2017-10-01T01:00:00.000+0000', field='assignee', to_string='bob'),
+            ], worklogs=[make_worklog('3', '2017-10-01T03:00:00.000+0000', 3600, author='bob')]),
+        ]:
+            events.add(issue)
+        self.changelog, self.worklog = events.to_data_frames()
+        self.issues = pandas.DataFrame({
+            'created_datetime': pandas.to_datetime(['2017-10-01T00:00:00Z', '2017-10-01T00:00:00Z']),
+            'status': ['Done', 'Open'],
+        }, index=['TEST-1', 'TEST-2'])
+
+    def test_time_in_status(self):
+        result = history.time_in_status(self.changelog, self.issues, until=pandas.Timestamp('2017-10-01T10:00:00Z'))
+
+        self.assertEqual(result.loc['TEST-1'].to_dict(), {
+            'Done': 4 * 3600, 'In Progress': 3 * 3600, 'Open': 2 * 3600, 'Review': 3600})
+        self.assertEqual(result.loc['TEST-2'].to_dict(), {'Done': 0, 'In Progress': 0, 'Open': 10 * 3600, 'Review': 0})
+
+    def test_cycle_time(self):
+        result = history.cycle_time(self.changelog)
+        self.assertEqual(result.to_dict(), {'TEST-1': 4 * 3600})
+
+    def test_rank_worklogs(self):
+        result = history.rank_worklogs(self.worklog)
+        self.assertEqual(result.columns.tolist(), ['rank', 'person', history.WORKLOG_METRIC, 'issues'])
+        self.assertEqual(result.values.tolist(), [[1, 'alice', 2.0, 1], [2, 'bob', 1.5, 2]])
@@ -0,0 +1,177 @@
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import pandas
+
+import jql
+from store import IssueStore
+from test_store import make_issue
+
+
+class TestTranslate(TestCase):
+
+    def setUp(self):
+        self.issues = pandas.DataFrame([
+            make_issue(1, '2017-10-01T10:00:00.000-0500', labels='prodsup,ui', status='Open', sprints='Sprint 1'),
+            make_issue(2, '2017-10-02T10:00:00.000-0500', labels='totalpkg', status='Done'),
+            make_issue(3, '2017-10-03T10:00:00.000-0500', labels=None, status='In Progress', sprints='Sprint 1,Sprint 2'),
+            make_issue(1, '2017-10-04T10:00:00.000-0500', key='OTHER-1', labels='prodsup', status='Open'),
+        ])
+        self.issues.index = self.issues['key']
+
+    def matches(self, query):
+        return list(self.issues.index[jql.translate(query).predicate(self.issues)])
+
+    def test_clauses(self):
+        self.assertEqual(self.matches('project = TEST'), ['TEST-1', 'TEST-2', 'TEST-3'])
+        self.assertEqual(self.matches('labels in (totalpkg, PRODSUP)'), ['TEST-1', 'TEST-2', 'OTHER-1'])
+        self.assertEqual(self.matches('labels not in (prodsup)'), ['TEST-2'])
+        self.assertEqual(self.matches('labels is EMPTY'), ['TEST-3'])
+        self.assertEqual(self.matches('status != Open'), ['TEST-2', 'TEST-3'])
+        self.assertEqual(self.matches('sprint = "Sprint 2"'), ['TEST-3'])
+        self.assertEqual(self.matches('key in (TEST-2, OTHER-1)'), ['TEST-2', 'OTHER-1'])
+
+    def test_boolean_operators(self):
+        self.assertEqual(
+            self.matches('project in (TEST) AND (labels = prodsup OR status = "In Progress")'), ['TEST-1', 'TEST-3'])
+        self.assertEqual(self.matches('NOT status = Open and project = TEST'), ['TEST-2', 'TEST-3'])
+
+    def test_projects_and_order(self):
+        query = jql.translate('project in (TEST, OTHER) AND labels = prodsup ORDER BY created DESC, key')
+        self.assertEqual(query.projects, ['TEST', 'OTHER'])
+        self.assertEqual(query.order, [('created_datetime', False), ('key', True)])
+        self.assertEqual(query.columns, {'key', 'labels', 'created_datetime'})
+        self.assertIsNone(jql.translate('project = TEST OR labels = prodsup').projects)
+
+    def test_production_support_filters(self):
+        issues = pandas.DataFrame([
+            make_issue(1, '2017-10-01T10:00:00.000-0500', key='FARM-1', customfield_10614='18', rank='0|i0002:',
+                       sprints='Sprint 1', sprint_states='ACTIVE', flagged='10000'),
+            make_issue(2, '2017-10-02T10:00:00.000-0500', key='FARM-2', labels='prodsup', rank='0|i0001:',
+                       sprints='Sprint 2', sprint_states='FUTURE', priority='Blocker'),
+            make_issue(3, '2017-10-03T10:00:00.000-0500', key='FARM-3', labels='totalpkg', rank='0|i0003:',
+                       sprints='Sprint 0', sprint_states='CLOSED'),
+            make_issue(4, '2017-10-04T10:00:00.000-0500', key='FARM-4', customfield_10614='19',
+                       sprints='Sprint 1', sprint_states='ACTIVE'),
+            make_issue(1, '2017-10-05T10:00:00.000-0500', key='SB-1', labels='prodsup', sprints='Sprint 1',
+                       sprint_states='ACTIVE'),
+        ])
+        issues.index = issues['key']
+        filters = jql.get_filters()
+
+        self.assertEqual(list(issues.index[jql.translate(filters['all_issues']).predicate(issues)]),
+                         ['FARM-1', 'FARM-2', 'FARM-3'])
+        self.assertEqual(jql.translate(filters['all_issues']).order, [('rank', True)])
+        self.assertEqual(list(issues.index[jql.translate(filters['high_priority_issues']).predicate(issues)]),
+                         ['FARM-1', 'FARM-2'])
+        self.assertEqual(list(issues.index[jql.translate(filters['open_sprints']).predicate(issues)]),
+                         ['FARM-1', 'FARM-2', 'SB-1'])
+
+    def test_sprint_state_from_latest_issue(self):
+        issues = pandas.DataFrame([
+            make_issue(1, '2017-10-01T10:00:00.000-0500', sprints='Sprint 1', sprint_states='ACTIVE'),
+            # carried over when Sprint 1 closed
+            make_issue(2, '2017-10-02T10:00:00.000-0500', sprints='Sprint 1,Sprint 2',
+                       sprint_states='CLOSED,ACTIVE'),
+        ])
+        issues.index = issues['key']
+        query = jql.translate('sprint in (openSprints())')
+        self.assertEqual(list(issues.index[query.predicate(issues)]), ['TEST-2'])
+        query = jql.translate('sprint in (closedSprints(), "Sprint 2")')
+        self.assertEqual(list(issues.index[query.predicate(issues)]), ['TEST-1', 'TEST-2'])
+
+    def test_normalize_jql(self):
+        self.assertEqual(jql.normalize_jql('project = TEST  and labels in (a,b)'),
+                         jql.normalize_jql('project=TEST AND labels IN (a, b)'))
+        self.assertNotEqual(jql.normalize_jql('labels = a'), jql.normalize_jql('labels = A'))
+
+    def test_untranslatable(self):
+        for query in [
+            'summary ~ "crash"',
+            'project = TEST AND',
+            'labels in (currentUser())',
+            'sprint in (openSprints(1))',
+            'cf[10000] = 1',
+            'project = TEST ORDER BY summary',
+        ]:
+            with self.assertRaises(jql.UntranslatableQuery, msg=query):
+                jql.translate(query)
+
+
+class TestFilterRunner(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = IssueStore(os.path.join(self.temp_dir.name, 'issues_store'))
+        self.store.save(pandas.DataFrame([
+            make_issue(1, '2017-10-01T10:00:00.000-0500', labels='prodsup'),
+            make_issue(2, '2017-11-02T10:00:00.000-0500', labels='prodsup'),
+            make_issue(10, '2017-10-03T10:00:00.000-0500', labels='prodsup'),
+            make_issue(3, '2017-10-03T10:00:00.000-0500'),
+        ]))
+        self.now = 0.0
+        self.jira = mock.Mock()
+        self.runner = jql.FilterRunner(store=self.store, jira=self.jira, ttl=60, clock=lambda: self.now)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_local(self):
+        result = self.runner.run('project = TEST AND labels = prodsup ORDER BY key DESC')
+        self.assertEqual(list(result.index), ['TEST-10', 'TEST-2', 'TEST-1'])
+        self.assertEqual(result.loc['TEST-2', 'summary'], 'summary 2')
+        self.jira.search_issues.assert_not_called()
+
+        result = self.runner.run('project = TEST AND labels = prodsup ORDER BY created')
+        self.assertEqual(list(result.index), ['TEST-1', 'TEST-10', 'TEST-2'])
+        self.assertTrue(self.runner.run('labels = nothing').empty)
+
+    def test_remote_paginated_and_cached(self):
+        query = 'project = TEST AND summary ~ "crash"'
+        self.jira.search_issues.return_value = iter([
+            [{'key': 'TEST-5', 'fields': {'issuetype': {'name': 'Bug'}, 'status': {'name': 'Open'}}}],
+            [{'key': 'TEST-4', 'fields': {'issuetype': {'name': 'Bug'}}}],
+        ])
+        result = self.runner.run(query)
+        self.assertEqual(list(result.index), ['TEST-5', 'TEST-4'])
+        self.assertEqual(result.loc['TEST-5', 'status'], 'Open')
+        self.jira.search_issues.assert_called_once_with(query)
+
+        self.now = 59
+        self.assertEqual(list(self.runner.run(query).index), ['TEST-5', 'TEST-4'])
+        self.assertEqual(self.jira.search_issues.call_count, 1)
+
+        self.now = 61
+        self.jira.search_issues.return_value = iter([])
+        self.assertTrue(self.runner.run(query).empty)
+        self.assertEqual(self.jira.search_issues.call_count, 2)
+
+    def test_results_cached_on_disk(self):
+        cache_dir = os.path.join(self.temp_dir.name, 'query_cache')
+        query = 'project = TEST AND summary ~ "crash"'
+        self.jira.search_issues.return_value = iter([
+            [{'key': 'TEST-5', 'fields': {'issuetype': {'name': 'Bug'}, 'status': {'name': 'Open'}}}],
+        ])
+        jql.FilterRunner(store=self.store, jira=self.jira, cache_dir=cache_dir).run(query)
+
+        # a later run in another process
+        runner = jql.FilterRunner(store=self.store, jira=self.jira, ttl=60, cache_dir=cache_dir)
+        result = runner.run('project = TEST and summary ~ "crash"')
+        self.assertEqual(list(result.index), ['TEST-5'])
+        self.assertEqual(result.loc['TEST-5', 'status'], 'Open')
+        self.assertEqual(self.jira.search_issues.call_count, 1)
+
+        result_path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+        os.utime(result_path, (0, 0))
+        self.jira.search_issues.return_value = iter([])
+        runner = jql.FilterRunner(store=self.store, jira=self.jira, ttl=60, cache_dir=cache_dir)
+        self.assertTrue(runner.run(query).empty)
+        self.assertEqual(self.jira.search_issues.call_count, 2)
+
+    def test_forced_source(self):
+        self.jira.search_issues.return_value = iter([])
+        self.assertTrue(self.runner.run('labels = prodsup', local=False).empty)
+        self.jira.search_issues.assert_called_once_with('labels = prodsup')
+        with self.assertRaises(jql.UntranslatableQuery):
+            self.runner.run('summary ~ "crash"', local=True)
@@ -0,0 +1,108 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import pandas
+
+import leaderboard
+from test_store import make_issue
+
+
+def make_issues():
+    return pandas.DataFrame(
+        [
+            make_issue(1, '2017-10-23T14:09:09.683-0500', assignee='alice', reporter='carol', sprints='Sprint 1',
+                       components='api', resolved_datetime='2017-10-24T10:00:00.000-0500',
+                       original_estimate=3600, time_spent=3600),
+            make_issue(2, '2017-10-24T10:00:00.000-0500', assignee='bob', reporter='carol',
+                       sprints='Sprint 1,Sprint 2', components='api,web', issue_type='Task',
+                       resolved_datetime='2017-10-26T10:00:00.000-0500', original_estimate=3600, time_spent=7200),
+            make_issue(3, '2017-10-25T10:00:00.000-0500', assignee='bob', reporter='alice', sprints='Sprint 2',
+                       resolved_datetime='2017-10-27T10:00:00.000-0500', original_estimate=None, time_spent=1800),
+            make_issue(4, '2017-10-26T10:00:00.000-0500', assignee=None, reporter='alice', sprints='Sprint 2'),
+        ],
+        index=[1, 2, 3, 4],
+    )
+
+
+class TestLeaderboard(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.leaderboard = leaderboard.Leaderboard(os.path.join(self.temp_dir.name, 'rollups.parquet'))
+        self.leaderboard.rebuild(make_issues())
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_rank_overall(self):
+        result = self.leaderboard.rank('resolved_issues')
+
+        self.assertEqual(list(result['person']), ['bob', 'alice'])
+        self.assertEqual(list(result['resolved_issues']), [2, 1])
+        self.assertEqual(list(result['rank']), [1, 2])
+
+    def test_rank_metrics(self):
+        bug_fixes = self.leaderboard.rank('bug_fixes')
+        self.assertEqual(bug_fixes.set_index('person')['bug_fixes'].to_dict(), {'alice': 1, 'bob': 1})
+
+        time_logged = self.leaderboard.rank('time_logged')
+        self.assertEqual(time_logged.set_index('person')['time_logged'].to_dict(), {'bob': 2.5, 'alice': 1.0})
+
+        accuracy = self.leaderboard.rank('estimate_accuracy')
+        self.assertEqual(list(accuracy['person']), ['alice', 'bob'])
+        self.assertEqual(list(accuracy['estimate_accuracy']), [1.0, 0.0])
+
+    def test_rank_per_slice(self):
+        result = self.leaderboard.rank('resolved_issues', dimension='sprint')
+
+        self.assertEqual(
+            list(result.itertuples(index=False, name=None)),
+            [('Sprint 1', 1, 'alice', 1), ('Sprint 1', 2, 'bob', 1), ('Sprint 2', 1, 'bob', 2)],
+        )
+        component = self.leaderboard.rank('resolved_issues', dimension='component', value='web')
+        self.assertEqual(list(component['person']), ['bob'])
+
+    def test_rank_reporters(self):
+        result = self.leaderboard.rank('resolved_issues', role='reporter', limit=1)
+
+        self.assertEqual(list(result['person']), ['carol'])
+
+    def test_rank_rejects_unknown_metric(self):
+        with self.assertRaises(ValueError):
+            self.leaderboard.rank('lines_of_code')
+
+    def test_update_matches_rebuild(self):
+        issues = make_issues()
+        old_rows = issues.loc[[2]]
+        new_rows = pandas.DataFrame(
+            [
+                make_issue(2, '2017-10-24T10:00:00.000-0500', assignee='alice', reporter='carol',
+                           sprints='Sprint 3', components='web', issue_type='Bug',
+                           resolved_datetime='2017-10-30T10:00:00.000-0500', original_estimate=3600,
+                           time_spent=3000),
+                make_issue(5, '2017-10-31T10:00:00.000-0500', assignee='dave', reporter='bob', sprints='Sprint 3'),
+                # nothing resolved or logged yet, so every sum is zero
+                make_issue(6, '2017-10-31T11:00:00.000-0500', assignee='erin', reporter='bob', sprints='Sprint 3',
+                           time_spent=None),
+            ],
+            index=[2, 5, 6],
+        )
+        self.leaderboard.update(new_rows, old_rows)
+
+        rebuilt = leaderboard.Leaderboard(os.path.join(self.temp_dir.name, 'other.parquet'))
+        rebuilt.rebuild(pandas.concat([issues.drop([2]), new_rows]))
+        pandas.testing.assert_frame_equal(
+            self.leaderboard.rollups.sort_index(),
+            rebuilt.rollups.sort_index(),
+            check_dtype=False,
+        )
+        self.assertNotIn(('assignee', 'bob', 'sprint', 'Sprint 1'), self.leaderboard.rollups.index)
+        self.assertIn(('assignee', 'erin', 'all', ''), self.leaderboard.rollups.index)
+
+    def test_save_and_load(self):
+        self.leaderboard.save()
+        loaded = leaderboard.Leaderboard(self.leaderboard.path)
+
+        self.assertTrue(loaded.exists())
+        pandas.testing.assert_frame_equal(loaded.rank('time_logged'), self.leaderboard.rank('time_logged'))
@@ -1,9 +1,51 @@
+import inspect
+import os
+import subprocess
+import sys
 from unittest import TestCase
 
 import main
 
+# modules that take hundreds of milliseconds or more to import
+HEAVY_MODULES = ['numpy', 'pandas', 'pyarrow', 'scipy', 'sklearn', 'plotly']
 
-class TestMainHelpers(TestCase):
 
-    def place_holder(self):
-        pass
+class TestCommandLine(TestCase):
+
+    def parse(self, *argv):
+        args = vars(main.build_parser().parse_args(argv))
+        for option in ['metrics_path', 'profile_stages', 'profile_mode']:
+            args.pop(option)
+        return args.pop('command'), args
+
+    def test_commands_take_their_options(self):
+        for argv in [
+            ['fetch', '-b', '-c', '4', '-e', '100', '--history'],
+            ['sync', '-r', '5', '--instances', 'instances.json'],
+            ['reparse'],
+            ['train', '-i', '--replace', '-j', '2', '--model-path', 'other.joblib'],
+            ['predict', 'FARM-1', 'FARM-2'],
+            ['report', '--format', 'html', 'png'],
+            ['leaderboard', 'time_logged', '--slice', 'sprint', '--top', '3'],
+            ['query', 'open_sprints', '--remote'],
+        ]:
+            command, options = self.parse(*argv)
+            self.assertEqual(command, argv[0])
+            # raises TypeError if an option doesn't match an argument of the command's function
+            inspect.signature(main.COMMANDS[command]).bind(**options)
+
+        self.assertEqual(self.parse('fetch', '-c', '4')[1]['concurrency'], 4)
+        self.assertEqual(self.parse('leaderboard', 'bug_fixes', '--slice-value', 'Sprint 3')[1]['value'], 'Sprint 3')
+        with self.assertRaises(SystemExit):
+            self.parse()
+
+    def test_startup_imports(self):
+        # fresh interpreter, since the test run itself has imported everything
+        code = (
+            'import sys, main; main.build_parser().parse_args(["fetch"]); '
+            'import api, cache, crawler, pipeline, store; '
+            'print(",".join(name for name in {} if name in sys.modules))'.format(HEAVY_MODULES)
+        )
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(main.__file__)))
+        self.assertEqual(output.decode().strip(), '')
@@ -0,0 +1,131 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import joblib
+import pandas
+from sklearn.tree import DecisionTreeRegressor
+
+import model
+from features import FeatureBuilder, HashingFeatureBuilder
+from test_features import make_issue
+
+
+def make_issue_json(issue_num, summary):
+    return {
+        'key': 'TEST-{}'.format(issue_num),
+        'fields': {
+            'summary': summary,
+            'issuetype': {'name': 'Bug'},
+            'created': '2017-10-23T14:09:09.683-0500',
+            'updated': '2017-10-23T14:09:09.683-0500',
+            'timeoriginalestimate': 7200,
+        },
+    }
+
+
+class TestModelArtifact(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'model.joblib')
+        data_frame = pandas.DataFrame([
+            make_issue(i, '2017-10-23T14:09:09.683-0500', summary='login bug' if i % 2 else 'report export',
+                       time_spent=3600 if i % 2 else 7200)
+            for i in range(20)
+        ])
+        features = FeatureBuilder()
+        estimator = DecisionTreeRegressor(random_state=0).fit(features.fit_transform(data_frame),
+                                                              data_frame['time_spent'])
+        self.artifact = model.ModelArtifact(features, estimator, {'rows': len(data_frame)})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_save_and_load(self):
+        self.artifact.save(self.path)
+        loaded = model.ModelArtifact.load(self.path)
+
+        self.assertEqual(loaded.version, model.ARTIFACT_VERSION)
+        self.assertEqual(loaded.schema_hash, model.SCHEMA_HASH)
+        self.assertEqual(loaded.metadata, {'rows': 20})
+        self.assertEqual(
+            loaded.features.feature_names(),
+            self.artifact.features.feature_names(),
+        )
+
+    def test_predict_issues_uses_saved_features(self):
+        self.artifact.save(self.path)
+        loaded = model.ModelArtifact.load(self.path)
+
+        predictions = loaded.predict_issues([
+            make_issue_json(100, 'login bug'),
+            make_issue_json(101, 'report export'),
+        ])
+
+        self.assertEqual(list(predictions.index), ['TEST-100', 'TEST-101'])
+        self.assertEqual(list(predictions), [3600, 7200])
+
+    def test_load_rejects_schema_mismatch(self):
+        payload = {
+            'version': model.ARTIFACT_VERSION,
+            'schema_hash': 'stale',
+            'features': self.artifact.features,
+            'estimator': self.artifact.estimator,
+            'metadata': {},
+        }
+        joblib.dump(payload, self.path)
+
+        with self.assertRaises(model.ModelArtifactError):
+            model.ModelArtifact.load(self.path)
+
+    def test_load_rejects_bare_estimator(self):
+        joblib.dump(self.artifact.estimator, self.path)
+
+        with self.assertRaises(model.ModelArtifactError):
+            model.ModelArtifact.load(self.path)
+
+
+class TestIncrementalModel(TestCase):
+
+    def make_rows(self, start, count, updated):
+        return pandas.DataFrame([
+            make_issue(i, updated, summary='login bug' if i % 2 else 'report export',
+                       time_spent=3600 if i % 2 else 7200)
+            for i in range(start, start + count)
+        ])
+
+    def make_artifact(self):
+        return model.ModelArtifact(HashingFeatureBuilder(n_features=64), model.IncrementalRegressor())
+
+    def test_update_trains_only_new_rows(self):
+        artifact = self.make_artifact()
+        history = self.make_rows(0, 20, '2017-10-23T14:09:09.683-0500')
+
+        self.assertEqual(artifact.update(history), 20)
+        self.assertEqual(artifact.metadata['trained_through'], pandas.Timestamp('2017-10-23T19:09:09.683Z'))
+
+        delta = self.make_rows(20, 5, '2017-10-25T10:00:00.000-0500')
+        self.assertEqual(artifact.update(pandas.concat([history, delta])), 5)
+        self.assertEqual(artifact.metadata['rows'], 25)
+        self.assertEqual(artifact.update(pandas.concat([history, delta])), 0)
+
+    def test_updated_model_survives_save(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = os.path.join(temp_dir.name, 'model.joblib')
+        artifact = self.make_artifact()
+        artifact.update(self.make_rows(0, 20, '2017-10-23T14:09:09.683-0500'))
+        artifact.save(path)
+
+        loaded = model.ModelArtifact.load(path)
+        self.assertTrue(loaded.supports_updates())
+        self.assertEqual(loaded.update(self.make_rows(20, 5, '2017-10-25T10:00:00.000-0500')), 5)
+        self.assertEqual(len(loaded.predict_issues([make_issue_json(100, 'login bug')])), 1)
+
+    def test_fitted_model_rejects_update(self):
+        artifact = model.ModelArtifact(FeatureBuilder(), DecisionTreeRegressor())
+
+        self.assertFalse(artifact.supports_updates())
+        with self.assertRaises(model.ModelArtifactError):
+            artifact.update(self.make_rows(0, 5, '2017-10-23T14:09:09.683-0500'))
@@ -0,0 +1,116 @@
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import api
+import pipeline
+from api import JirApi
+from history import WORKLOG, EventStore
+from store import IssueStore
+
+
+def make_issue(issue_num, issue_type='Bug'):
+    return {
+        'key': 'TEST-{}'.format(issue_num),
+        'fields': {
+            'summary': 'summary {}'.format(issue_num),
+            'issuetype': {'name': issue_type},
+            'created': '2017-10-23T14:09:09.683-0500',
+            'updated': '2017-10-2{}T14:09:09.683-0500'.format(issue_num % 10),
+        },
+    }
+
+
+class TestIngestionPipeline(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.temp_dir.name, 'state.json')
+        self.store = IssueStore(os.path.join(self.temp_dir.name, 'issues_store'))
+        self.jira = JirApi(basic_auth=False)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_pipeline(self):
+        return pipeline.IngestionPipeline(self.jira, self.store, chunk_size=2, state_path=self.state_path)
+
+    @mock.patch('api.JirApi.all_issues')
+    def test_run(self, mock_all_issues):
+        mock_all_issues.return_value = iter([
+            make_issue(1),
+            make_issue(2, issue_type='Epic'),
+            make_issue(3),
+            {'errorMessages': ['Issue does not exist or you do not have permission to see it.']},
+            make_issue(4),
+            make_issue(5),
+        ])
+        ingestion = self.make_pipeline()
+
+        self.assertEqual(ingestion.run(), 4)
+        self.assertEqual(ingestion.flushed_chunks, 3)
+        self.assertEqual(list(self.store.load().index), ['TEST-1', 'TEST-3', 'TEST-4', 'TEST-5'])
+        # a completed crawl leaves nothing to resume
+        self.assertNotIn('last_flushed_key', api.load_state_json(self.state_path))
+        self.assertEqual(self.jira.checkpoint()['last_key'], 'TEST-5')
+
+    @mock.patch('api.JirApi.all_issues')
+    def test_fetch_error_keeps_flushed_chunks(self, mock_all_issues):
+        def issues():
+            yield make_issue(1)
+            yield make_issue(2)
+            yield make_issue(3)
+            raise api.JiraApiError('Giving up')
+        mock_all_issues.return_value = issues()
+
+        with self.assertRaises(api.JiraApiError):
+            self.make_pipeline().run()
+        self.assertEqual(list(self.store.load().index), ['TEST-1', 'TEST-2', 'TEST-3'])
+        state = api.load_state_json(self.state_path)
+        self.assertEqual(pipeline.get_resume_issue(state), 4)
+
+    @mock.patch('api.JirApi.all_issues')
+    def test_out_of_order_issues_hold_checkpoint(self, mock_all_issues):
+        def issues():
+            # a changed issue after a cached issue above it
+            for issue_num in [1, 2, 4, 3]:
+                yield make_issue(issue_num)
+            raise api.JiraApiError('Giving up')
+        mock_all_issues.return_value = issues()
+
+        with self.assertRaises(api.JiraApiError):
+            self.make_pipeline().run()
+        self.assertEqual(len(self.store.load()), 4)
+        # the mark stays after the last chunk that arrived in order
+        state = api.load_state_json(self.state_path)
+        self.assertEqual(pipeline.get_resume_issue(state), 3)
+
+    @mock.patch('api.JirApi.all_issues')
+    def test_write_error_stops_pipeline(self, mock_all_issues):
+        mock_all_issues.return_value = (make_issue(issue_num) for issue_num in range(1, 10000))
+        self.store.upsert = mock.Mock(side_effect=OSError('disk full'))
+
+        with self.assertRaises(OSError):
+            self.make_pipeline().run()
+        self.assertFalse(os.path.exists(self.state_path))
+
+    @mock.patch('api.JirApi.all_issues')
+    def test_run_with_events(self, mock_all_issues):
+        issues = [make_issue(issue_num) for issue_num in range(1, 4)]
+        for issue in issues:
+            issue['changelog'] = {'total': 0, 'histories': []}
+            issue['fields']['worklog'] = {'total': 1, 'worklogs': [
+                {'id': issue['key'], 'author': {'name': 'alice'}, 'started': issue['fields']['created'],
+                 'timeSpentSeconds': 60},
+            ]}
+        mock_all_issues.return_value = iter(issues)
+        event_store = EventStore(os.path.join(self.temp_dir.name, 'events_store'))
+        ingestion = pipeline.IngestionPipeline(
+            self.jira, self.store, chunk_size=2, state_path=self.state_path, event_store=event_store)
+
+        self.assertEqual(ingestion.run(), 3)
+        self.assertEqual(event_store.load(WORKLOG)['worklog_id'].tolist(), ['TEST-1', 'TEST-2', 'TEST-3'])
+
+    def test_get_resume_issue(self):
+        self.assertIsNone(pipeline.get_resume_issue({}))
+        self.assertEqual(pipeline.get_resume_issue({'last_flushed_key': 'TEST-41'}), 42)
@@ -1,3 +1,5 @@
+import os
+import tempfile
 from unittest import TestCase
 
 import pandas
@@ -28,3 +30,46 @@ class TestPlotter(TestCase):
 
         self.assertEqual(expected_tally, actual_tally)
         self.assertEqual(expected_sprint_list, actual_sprint_list)
+
+    def test_downsample(self):
+        data_frame = pandas.DataFrame(
+            {'time_spent': range(10), 'original_estimate': [None] * 10},
+            index=range(100, 110),
+        )
+
+        result, bucket_size = plotter.downsample(data_frame, ['time_spent', 'original_estimate'], max_points=4)
+
+        self.assertEqual(bucket_size, 3)
+        self.assertEqual(list(result.index), [100, 103, 106, 109])
+        self.assertEqual(list(result['time_spent']), [1, 4, 7, 9])
+        self.assertEqual(plotter.downsample(data_frame, ['time_spent'], max_points=10)[1], 1)
+
+    def test_time_estimates_figure_uses_webgl_for_large_series(self):
+        data_frame = pandas.DataFrame({'time_spent': range(20000), 'original_estimate': range(20000)})
+
+        figure = plotter.time_estimates_figure(data_frame)
+
+        self.assertEqual(figure.data[0].type, 'scattergl')
+        self.assertEqual(len(figure.data[0].x), plotter.MAX_POINTS)
+        self.assertIn('mean per 4 issues', figure.layout.title.text)
+        small_figure = plotter.time_estimates_figure(data_frame.iloc[:10])
+        self.assertEqual(small_figure.data[0].type, 'scatter')
+
+    def test_render_report(self):
+        data_frame = pandas.DataFrame([
+            {'sprints': 'Sprint 1', 'issue_type': 'Bug', 'original_estimate': 3600, 'time_spent': 1800},
+            {'sprints': 'Sprint 2', 'issue_type': 'Task', 'original_estimate': 3600, 'time_spent': 7200},
+        ])
+        with tempfile.TemporaryDirectory() as output_dir:
+            paths = plotter.render_report(data_frame, output_dir)
+
+            self.assertEqual(
+                sorted(os.path.basename(path) for path in paths),
+                ['index.html', 'plotly.min.js'],
+            )
+            with open(os.path.join(output_dir, 'index.html')) as html_file:
+                content = html_file.read()
+            self.assertIn('<script src="plotly.min.js">', content)
+            self.assertIn('Bugs Open by Sprint', content)
+            self.assertIn('overestimated', content)
+            self.assertNotIn('cdn.plot.ly', content)
@@ -0,0 +1,132 @@
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import pandas
+
+import store
+from constants import HEADER
+
+
+def make_issue(issue_num, created, **values):
+    row = {field: None for field in HEADER}
+    row.update({
+        'key': 'TEST-{}'.format(issue_num),
+        'summary': 'summary {}'.format(issue_num),
+        'issue_type': 'Bug',
+        'status': 'Done',
+        'created_datetime': created,
+        'updated_datetime': created,
+        'time_spent': 3600,
+    })
+    row.update(values)
+    return row
+
+
+class TestIssueStore(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = store.IssueStore(os.path.join(self.temp_dir.name, 'issues_store'))
+        self.data_frame = pandas.DataFrame(
+            [
+                make_issue(1, '2017-10-23T14:09:09.683-0500'),
+                make_issue(2, '2017-10-30T10:00:00.000-0500', status='In Progress'),
+                make_issue(3, '2017-11-02T10:00:00.000-0500', time_spent=None),
+            ],
+            index=[1, 2, 3],
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_save_and_load(self):
+        self.assertFalse(self.store.exists())
+        self.assertTrue(self.store.load().empty)
+
+        self.store.save(self.data_frame)
+        result = self.store.load()
+
+        self.assertEqual(list(result.columns), HEADER)
+        self.assertEqual(list(result.index), ['TEST-1', 'TEST-2', 'TEST-3'])
+        self.assertEqual(result['status'].dtype.name, 'category')
+        self.assertTrue(pandas.api.types.is_datetime64_any_dtype(result['created_datetime']))
+        self.assertEqual(result.loc['TEST-1', 'created_datetime'], pandas.Timestamp('2017-10-23T19:09:09.683Z'))
+        self.assertTrue(pandas.isnull(result.loc['TEST-3', 'time_spent']))
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.store.path, 'project=TEST'))),
+            ['created_month=2017-10', 'created_month=2017-11'],
+        )
+
+    def test_load_projection_and_partitions(self):
+        self.store.save(self.data_frame)
+
+        result = self.store.load(columns=['status'], months=['2017-10'])
+        self.assertEqual(list(result.columns), ['key', 'status'])
+        self.assertEqual(list(result.index), ['TEST-1', 'TEST-2'])
+        self.assertTrue(self.store.load(projects=['OTHER']).empty)
+
+    def test_upsert(self):
+        self.store.save(self.data_frame)
+        november_files = os.listdir(os.path.join(self.store.path, 'project=TEST', 'created_month=2017-11'))
+
+        updates = pandas.DataFrame(
+            [make_issue(2, '2017-10-30T10:00:00.000-0500', status='Done'), make_issue(4, '2017-10-31T10:00:00.000-0500')],
+            index=[2, 4],
+        )
+        self.store.upsert(updates)
+        result = self.store.load()
+
+        self.assertEqual(list(result.index), ['TEST-1', 'TEST-2', 'TEST-3', 'TEST-4'])
+        self.assertEqual(result.loc['TEST-2', 'status'], 'Done')
+        self.assertEqual(result.loc['TEST-1', 'summary'], 'summary 1')
+        self.assertEqual(
+            os.listdir(os.path.join(self.store.path, 'project=TEST', 'created_month=2017-11')), november_files)
+
+    def test_load_existing(self):
+        self.store.save(self.data_frame)
+        updates = pandas.DataFrame(
+            [make_issue(2, '2017-10-30T10:00:00.000-0500', status='Done'), make_issue(4, '2017-10-31T10:00:00.000-0500')],
+            index=[2, 4],
+        )
+
+        result = self.store.load_existing(updates, columns=['status'])
+        self.assertEqual(list(result.index), ['TEST-2'])
+        self.assertEqual(result.loc['TEST-2', 'status'], 'In Progress')
+        self.assertTrue(self.store.load_existing(updates.iloc[:0]).empty)
+
+    def test_projects_share_store(self):
+        self.store.save(self.data_frame)
+        farm = pandas.DataFrame(
+            [make_issue(1, '2017-10-23T14:09:09.683-0500', key='FARM-1', summary='farm 1')],
+            index=['FARM-1'],
+        )
+        self.store.upsert(farm)
+
+        result = self.store.load()
+        self.assertEqual(list(result.index), ['FARM-1', 'TEST-1', 'TEST-2', 'TEST-3'])
+        self.assertEqual(result.loc['FARM-1', 'summary'], 'farm 1')
+        self.assertEqual(result.loc['TEST-1', 'summary'], 'summary 1')
+        self.assertEqual(list(self.store.load(projects=['FARM']).index), ['FARM-1'])
+
+    def test_migrate_csv(self):
+        csv_path = os.path.join(self.temp_dir.name, 'issues.csv')
+        self.data_frame.to_csv(csv_path)
+
+        result = self.store.migrate_csv(csv_path)
+        self.assertEqual(list(result.index), ['TEST-1', 'TEST-2', 'TEST-3'])
+        self.assertEqual(result.loc['TEST-2', 'status'], 'In Progress')
+        self.assertEqual(result.loc['TEST-1', 'time_spent'], 3600)
+
+    def test_migrate_schema(self):
+        # a store written before priority and rank were added to HEADER
+        with mock.patch.object(store, 'HEADER', [field for field in HEADER if field not in ('priority', 'rank')]):
+            self.store.save(self.data_frame)
+        self.data_frame.loc[2, 'priority'] = 'Blocker'
+
+        self.store.upsert(self.data_frame.loc[[2]])
+        result = store.IssueStore(self.store.path).load()
+
+        self.assertEqual(list(result.columns), HEADER)
+        self.assertEqual(result.loc['TEST-2', 'priority'], 'Blocker')
+        self.assertTrue(result.loc[['TEST-1', 'TEST-3'], 'priority'].isnull().all())
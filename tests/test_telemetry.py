@@ -0,0 +1,99 @@
+import json
+import os
+import pstats
+import tempfile
+import time
+from unittest import TestCase
+
+import telemetry
+
+
+class TestHistogram(TestCase):
+
+    def test_observe(self):
+        histogram = telemetry.Histogram(buckets=(0.1, 1.0))
+        for value in [0.05, 0.1, 0.5, 2.0]:
+            histogram.observe(value)
+
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.99), float('inf'))
+        self.assertEqual(histogram.as_dict()['buckets'], {'0.1': 2, '1.0': 3, '+Inf': 4})
+        self.assertIsNone(telemetry.Histogram().quantile(0.5))
+
+
+class TestTelemetry(TestCase):
+
+    def setUp(self):
+        self.telemetry = telemetry.Telemetry()
+
+    def test_stage(self):
+        with self.telemetry.stage('parse', rows=10):
+            pass
+        with self.telemetry.stage('parse') as stage:
+            stage.rows = 30
+        with self.assertRaises(KeyError):
+            with self.telemetry.stage('store', rows=5):
+                raise KeyError('failed stages are still timed')
+
+        stages = self.telemetry.as_dict()['stages']
+        self.assertEqual(sorted(stages), ['parse', 'store'])
+        self.assertEqual(stages['parse']['calls'], 2)
+        self.assertEqual(stages['parse']['rows'], 40)
+        self.assertGreater(stages['parse']['rows_per_sec'], 0)
+        self.assertEqual(stages['store']['calls'], 1)
+        self.assertGreater(self.telemetry.as_dict()['gauges']['peak_rss_bytes'], 0)
+
+    def test_to_prometheus(self):
+        self.telemetry.count('responses', status=200)
+        self.telemetry.count('responses', status=200)
+        self.telemetry.count('downloaded_bytes', 512)
+        self.telemetry.high_water('peak_rss_bytes', 100)
+        self.telemetry.high_water('peak_rss_bytes', 50)
+        self.telemetry.observe('request_seconds', 0.2, buckets=(0.1, 1.0))
+
+        lines = self.telemetry.to_prometheus().splitlines()
+        self.assertIn('# TYPE jira_responses_total counter', lines)
+        self.assertIn('jira_responses_total{status="200"} 2', lines)
+        self.assertIn('jira_downloaded_bytes_total 512', lines)
+        self.assertIn('jira_peak_rss_bytes 100', lines)
+        self.assertIn('# TYPE jira_request_seconds histogram', lines)
+        self.assertIn('jira_request_seconds_bucket{le="0.1"} 0', lines)
+        self.assertIn('jira_request_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn('jira_request_seconds_sum 0.2', lines)
+        self.assertIn('jira_request_seconds_count 1', lines)
+
+    def test_write(self):
+        self.telemetry.count('responses', status=404)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            json_path = os.path.join(temp_dir, 'metrics.json')
+            prom_path = os.path.join(temp_dir, 'metrics.prom')
+            self.telemetry.write(json_path)
+            self.telemetry.write(prom_path)
+            with open(json_path) as json_file:
+                self.assertEqual(json.load(json_file)['counters'], {'responses{status=404}': 1})
+            with open(prom_path) as prom_file:
+                self.assertIn('jira_responses_total{status="404"} 1', prom_file.read())
+
+    def test_profiling(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.telemetry.enable_profiling(['parse'], output_dir=temp_dir)
+            with self.telemetry.stage('parse'):
+                # nested stages are not profiled separately
+                with self.telemetry.stage('parse'):
+                    sorted(range(1000))
+            with self.telemetry.stage('store'):
+                pass
+            self.assertEqual(os.listdir(temp_dir), ['parse.prof'])
+            self.assertTrue(any('sorted' in name[2] for name in
+                                pstats.Stats(os.path.join(temp_dir, 'parse.prof')).stats))
+
+            self.telemetry.enable_profiling(['fit'], mode='sample', output_dir=temp_dir)
+            with self.telemetry.stage('fit'):
+                time.sleep(0.05)
+            with open(os.path.join(temp_dir, 'fit.folded')) as folded_file:
+                stacks = folded_file.read()
+            self.assertIn('test_telemetry.py:test_profiling', stacks)
+
+        with self.assertRaises(ValueError):
+            self.telemetry.enable_profiling(['fit'], mode='perf')
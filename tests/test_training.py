@@ -0,0 +1,68 @@
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import pandas
+from sklearn.dummy import DummyRegressor
+
+import training
+from features import FeatureBuilder
+from model import ModelArtifact, ModelArtifactError
+from test_features import make_issue
+
+
+def make_training_set(count):
+    return pandas.DataFrame([
+        make_issue(
+            issue_num,
+            '2017-{:02d}-{:02d}T10:00:00.000-0500'.format(issue_num % 12 + 1, issue_num % 28 + 1),
+            summary='login bug' if issue_num % 2 else 'report export',
+            original_estimate=3600 * (issue_num % 4 + 1),
+            time_spent=3600 * (issue_num % 4 + 1),
+        )
+        for issue_num in range(count)
+    ])
+
+
+class TestTraining(TestCase):
+
+    def test_time_split_holds_out_newest(self):
+        training_set = training.sort_by_created(make_training_set(20))
+
+        train_set, test_set = training.time_split(training_set, test_size=0.25)
+
+        self.assertEqual((len(train_set), len(test_set)), (15, 5))
+        self.assertLessEqual(
+            pandas.to_datetime(train_set['created_datetime'], format='ISO8601', utc=True).max(),
+            pandas.to_datetime(test_set['created_datetime'], format='ISO8601', utc=True).min(),
+        )
+
+    @mock.patch.object(training, 'SEARCH_ITERATIONS', 1)
+    @mock.patch.object(training, 'CV_SPLITS', 2)
+    def test_train_model(self):
+        model = training.train_model(make_training_set(60), n_jobs=1)
+
+        self.assertIn(model.metadata['estimator'], training.ESTIMATORS)
+        self.assertLess(model.metadata['test_mae_hours'], 1)
+        self.assertEqual(model.metadata['rows'], 60)
+        predictions = model.predict(make_training_set(4))
+        self.assertEqual(len(predictions), 4)
+
+    @mock.patch.object(training, 'SEARCH_ITERATIONS', 1)
+    @mock.patch.object(training, 'CV_SPLITS', 2)
+    def test_train_model_bounds_rows(self):
+        model = training.train_model(make_training_set(60), n_jobs=1, max_rows=30)
+
+        self.assertEqual(model.metadata['rows'], 30)
+
+    def test_update_incremental_model_keeps_full_model(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            model_path = os.path.join(temp_dir, 'model.joblib')
+            ModelArtifact(FeatureBuilder(), DummyRegressor()).save(model_path)
+
+            with self.assertRaises(ModelArtifactError):
+                training.update_incremental_model(make_training_set(10), model_path)
+            model = training.update_incremental_model(make_training_set(10), model_path, replace=True)
+
+        self.assertTrue(model.supports_updates())
+        self.assertEqual(model.metadata['rows'], 10)
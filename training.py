@@ -0,0 +1,164 @@
+import os
+
+import pandas
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import RandomizedSearchCV, TimeSeriesSplit
+
+from constants import MODEL_PATH
+from features import FeatureBuilder, HashingFeatureBuilder
+from model import IncrementalRegressor, ModelArtifact, ModelArtifactError
+from telemetry import stage
+
+# bounds on nightly training cost
+MAX_TRAINING_ROWS = 50000
+MAX_SEARCH_ROWS = 10000
+MAX_TEXT_FEATURES = 2000
+SEARCH_ITERATIONS = 8
+CV_SPLITS = 3
+ESTIMATORS = {
+    'gradient_boosting': (
+        GradientBoostingRegressor(random_state=100),
+        {
+            'loss': ['absolute_error', 'huber'],
+            'n_estimators': [100, 200],
+            'learning_rate': [0.03, 0.1, 0.3],
+            'max_depth': [2, 3, 5],
+            'subsample': [0.5, 0.8, 1.0],
+        },
+    ),
+    'random_forest': (
+        RandomForestRegressor(random_state=100),
+        {
+            'n_estimators': [100],
+            'max_depth': [10, 20],
+            'min_samples_leaf': [1, 5, 10],
+            'max_features': ['sqrt', 0.3],
+        },
+    ),
+}
+
+
+def update_or_create_model(data_frame, incremental=False, model_path=MODEL_PATH, n_jobs=-1, replace=False):
+    """
+    Updates or creates model based upon data in dataframe.
+    :param data_frame: pandas dataframe object
+    :param incremental: update the saved incremental model with issues changed since it was trained, creating
+        one if there is none, instead of retraining from scratch
+    :param model_path: model artifact to update
+    :param n_jobs: number of cores used by the hyperparameter search, -1 for all
+    :param replace: with incremental, replace a saved model that can not be updated with a new incremental one
+    :return: returns ModelArtifact
+    """
+    if incremental:
+        return update_incremental_model(data_frame, model_path, replace=replace)
+
+    training_set = create_training_subset(data_frame)
+    return train_model(training_set, n_jobs=n_jobs)
+
+
+def train_model(training_set, n_jobs=-1, test_size=0.2, max_rows=MAX_TRAINING_ROWS):
+    """
+    Picks the best time spent regressor by cross-validated hyperparameter search on the newest training issues,
+    reports its MAE on the most recently created issues, then refits it on every issue
+    :param training_set: pandas data frame of issues with time spent
+    :param n_jobs: number of cores used by the search, -1 for all
+    :param test_size: fraction of the newest issues held out for testing
+    :param max_rows: only the newest max_rows issues are trained on, to bound fit time and memory
+    :return: ModelArtifact
+    """
+    training_set = sort_by_created(training_set).iloc[-max_rows:]
+    train_set, test_set = time_split(training_set, test_size)
+
+    features = FeatureBuilder(max_features=MAX_TEXT_FEATURES)
+    with stage('features', rows=len(train_set)):
+        x_train = features.fit_transform(train_set)
+    print('Training on {} issues x {} features'.format(*x_train.shape))
+
+    best = None
+    for name, (estimator, param_distributions) in ESTIMATORS.items():
+        search = RandomizedSearchCV(
+            estimator,
+            param_distributions,
+            n_iter=SEARCH_ITERATIONS,
+            scoring='neg_mean_absolute_error',
+            cv=TimeSeriesSplit(n_splits=CV_SPLITS),
+            n_jobs=n_jobs,
+            random_state=100,
+        )
+        with stage('search', rows=min(len(train_set), MAX_SEARCH_ROWS)):
+            search.fit(x_train[-MAX_SEARCH_ROWS:], train_set['time_spent'].iloc[-MAX_SEARCH_ROWS:])
+        print('{}: CV MAE {:.2f} hours with {}'.format(name, -search.best_score_ / 3600, search.best_params_))
+        if best is None or search.best_score_ > best[1].best_score_:
+            best = (name, search)
+
+    name, search = best
+    test_mae = mean_absolute_error(test_set['time_spent'], search.predict(features.transform(test_set))) / 3600
+    print('{}: test MAE {:.2f} hours on the {} newest issues'.format(name, test_mae, len(test_set)))
+
+    features = FeatureBuilder(max_features=MAX_TEXT_FEATURES)
+    with stage('features', rows=len(training_set)):
+        x_all = features.fit_transform(training_set)
+    with stage('fit', rows=len(training_set)):
+        estimator = clone(search.best_estimator_).fit(x_all, training_set['time_spent'])
+    model = ModelArtifact(features, estimator, {
+        'estimator': name,
+        'params': search.best_params_,
+        'test_mae_hours': test_mae,
+    })
+    model.record_training(training_set)
+    return model
+
+
+def sort_by_created(data_frame):
+    created = pandas.to_datetime(data_frame['created_datetime'], utc=True, errors='coerce', format='ISO8601')
+    return data_frame.iloc[created.argsort(kind='stable')]
+
+
+def time_split(data_frame, test_size=0.2):
+    """
+    Splits issues sorted by created_datetime so the newest test_size of them are held out
+    :param data_frame: pandas data frame sorted by created_datetime
+    :param test_size: fraction of issues to hold out
+    :return: (train data frame, test data frame)
+    """
+    split = len(data_frame) - max(1, int(len(data_frame) * test_size))
+    return data_frame.iloc[:split], data_frame.iloc[split:]
+
+
+def update_incremental_model(data_frame, model_path=MODEL_PATH, replace=False):
+    """
+    Updates the saved incremental model in place with only the issues changed since it was trained
+    :param data_frame: pandas data frame of issues
+    :param model_path: model artifact to update
+    :param replace: replace a saved model that can not be updated, e.g. a full retrain, with a new incremental
+        model instead of raising ModelArtifactError
+    :return: ModelArtifact
+    """
+    model = None
+    if os.path.exists(model_path):
+        model = ModelArtifact.load(model_path)
+        if not model.supports_updates():
+            if not replace:
+                raise ModelArtifactError(
+                    '{} can not be updated incrementally. Pass --replace to overwrite it with a new incremental '
+                    'model, or --model-path to keep it.'.format(model_path))
+            print('{} can not be updated incrementally, training a new incremental model'.format(model_path))
+            model = None
+    if model is None:
+        model = ModelArtifact(HashingFeatureBuilder(), IncrementalRegressor())
+    print('Trained on {} new issues'.format(model.update(data_frame)))
+    if not model.metadata.get('rows'):
+        raise ValueError('No issues with time spent to train on.')
+    return model
+
+
+def create_training_subset(data_frame):
+    """
+    Strips out all rows that do not have an actual time spent value.
+    :param data_frame: pandas data frame
+    :return: training set data frame
+    """
+    training_set = data_frame.loc[data_frame['time_spent'].notnull()]
+    return training_set